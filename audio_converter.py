@@ -0,0 +1,205 @@
+import asyncio
+import base64
+import os
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import aiofiles
+from mutagen.flac import Picture
+from audio_editor import AudioEditor
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FFmpegError(Exception):
+    """خطای اجرای ffmpeg"""
+
+
+# ffmpeg's generic metadata keys for the editor's fields
+FFMPEG_TAG_KEYS = {
+    'title': 'title',
+    'artist': 'artist',
+    'album': 'album',
+    'genre': 'genre',
+    'year': 'date',
+    'track': 'track',
+    'albumartist': 'album_artist'
+}
+
+# Output formats that can be muxed to a pipe; 'cover' says how artwork is carried
+OUTPUT_FORMATS = {
+    'mp3': {'extension': '.mp3', 'muxer': 'mp3', 'codec': 'libmp3lame', 'bitrate': '320k', 'cover': 'stream'},
+    'opus': {'extension': '.opus', 'muxer': 'ogg', 'codec': 'libopus', 'bitrate': '160k', 'cover': 'comment'},
+    'ogg': {'extension': '.ogg', 'muxer': 'ogg', 'codec': 'libvorbis', 'bitrate': '192k', 'cover': 'comment'},
+    'flac': {'extension': '.flac', 'muxer': 'flac', 'codec': 'flac', 'bitrate': None, 'cover': 'stream'},
+}
+
+# MP4 keeps its index at the end of the file more often than not, so it
+# cannot be demuxed from a pipe and is handed to ffmpeg by path instead
+SEEKABLE_INPUTS = ('.m4a', '.mp4')
+
+# Vorbis comment covers travel on the command line; stay well below the argv limit
+MAX_COMMENT_COVER = 96 * 1024
+
+
+class FFmpegRunner:
+    """اجرای پردازه‌های ffmpeg با سقف همزمانی بر اساس تعداد هسته‌ها"""
+
+    def __init__(self, binary: str = 'ffmpeg', max_processes: int = None):
+        self.binary = binary
+        self.max_processes = max_processes or os.cpu_count() or 1
+        self.active = 0
+        self._slots = asyncio.Semaphore(self.max_processes)
+
+    async def stream(self, args: List[str], input_path: Optional[str] = None,
+                     chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """اجرای ffmpeg و برگرداندن خروجی stdout به صورت جریانی"""
+        async with self._slots:
+            self.active += 1
+            process = await asyncio.create_subprocess_exec(
+                self.binary, '-hide_banner', '-nostdin', '-loglevel', 'error', *args,
+                stdin=asyncio.subprocess.PIPE if input_path else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            feeder = asyncio.create_task(self._feed(process, input_path)) if input_path else None
+            # Drain stderr concurrently so a chatty encoder never blocks on it
+            errors = asyncio.create_task(process.stderr.read())
+
+            try:
+                while True:
+                    chunk = await process.stdout.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+
+                if feeder:
+                    await feeder
+                stderr = await errors
+                return_code = await process.wait()
+                if return_code != 0:
+                    raise FFmpegError(stderr.decode('utf-8', errors='replace').strip() or
+                                      f"ffmpeg exited with code {return_code}")
+
+            finally:
+                # Also reached when the consumer closes the stream early (a failed upload)
+                self.active -= 1
+                if process.returncode is None:
+                    try:
+                        process.kill()
+                    except ProcessLookupError:
+                        pass
+                    await process.wait()
+                for task in (feeder, errors):
+                    if task and not task.done():
+                        task.cancel()
+
+    async def _feed(self, process, input_path: str, chunk_size: int = 256 * 1024):
+        """نوشتن فایل ورودی در stdin پردازه"""
+        try:
+            async with aiofiles.open(input_path, 'rb') as f:
+                while True:
+                    chunk = await f.read(chunk_size)
+                    if not chunk:
+                        break
+                    process.stdin.write(chunk)
+                    await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg stopped reading; its exit status tells what happened
+            pass
+        finally:
+            if not process.stdin.is_closing():
+                process.stdin.close()
+
+
+class AudioConverter:
+    """تبدیل جریانی فرمت و بیت‌ریت فایل‌های صوتی"""
+
+    def __init__(self, audio_editor: AudioEditor = None, runner: FFmpegRunner = None):
+        self.audio_editor = audio_editor or AudioEditor()
+        self.runner = runner or FFmpegRunner()
+
+    def output_filename(self, filename: str, target: str) -> str:
+        """تعویض پسوند نام فایل با پسوند فرمت مقصد"""
+        return os.path.splitext(filename)[0] + OUTPUT_FORMATS[target]['extension']
+
+    def build_args(self, input_path: str, target: str, metadata: Dict[str, str],
+                   bitrate: str = None, cover_data: bytes = None) -> Tuple[List[str], Optional[str]]:
+        """ساخت آرگومان‌های ffmpeg؛ مسیر دوم فایلی است که باید در stdin نوشته شود"""
+        output_format = OUTPUT_FORMATS[target]
+        piped = os.path.splitext(input_path)[1].lower() not in SEEKABLE_INPUTS
+
+        args = ['-i', 'pipe:0' if piped else input_path, '-map', '0:a:0']
+
+        if output_format['cover'] == 'stream':
+            # Attached pictures in the source are copied as-is
+            args += ['-map', '0:v?', '-c:v', 'copy', '-disposition:v', 'attached_pic']
+        else:
+            args += ['-vn']
+
+        args += ['-c:a', output_format['codec']]
+        bitrate = bitrate or output_format['bitrate']
+        if bitrate:
+            args += ['-b:a', bitrate]
+
+        # Keep the source tags, then apply the edited ones on top
+        args += ['-map_metadata', '0']
+        for field, key in FFMPEG_TAG_KEYS.items():
+            value = metadata.get(field)
+            if value:
+                args += ['-metadata', f'{key}={value}']
+
+        if cover_data and output_format['cover'] == 'comment':
+            args += ['-metadata', f'METADATA_BLOCK_PICTURE={self._picture_comment(cover_data)}']
+
+        if output_format['muxer'] == 'mp3':
+            args += ['-id3v2_version', '3']
+
+        args += ['-f', output_format['muxer'], 'pipe:1']
+        return args, input_path if piped else None
+
+    async def convert_stream(self, input_path: str, target: str, metadata: Dict[str, str],
+                             bitrate: str = None) -> AsyncIterator[bytes]:
+        """تبدیل فایل و برگرداندن خروجی کدگذاری شده به صورت جریانی"""
+        if target not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {target}")
+
+        cover_data = None
+        if OUTPUT_FORMATS[target]['cover'] == 'comment':
+            loop = asyncio.get_running_loop()
+            cover_data = await loop.run_in_executor(None, self.audio_editor.get_cover_data, input_path)
+            if cover_data and len(cover_data) > MAX_COMMENT_COVER:
+                logger.info(f"Cover too large to embed in {target} output, skipping it")
+                cover_data = None
+
+        args, feed_path = self.build_args(input_path, target, metadata, bitrate, cover_data)
+        stream = self.runner.stream(args, feed_path)
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            # Closing this generator must reach ffmpeg's, so the process is killed and reaped now
+            await stream.aclose()
+
+    async def convert_file(self, input_path: str, output_path: str, target: str,
+                           metadata: Dict[str, str], bitrate: str = None) -> bool:
+        """تبدیل فایل و ذخیره خروجی روی دیسک"""
+        try:
+            async with aiofiles.open(output_path, 'wb') as f:
+                async for chunk in self.convert_stream(input_path, target, metadata, bitrate):
+                    await f.write(chunk)
+            return True
+
+        except Exception as e:
+            logger.error(f"Error converting {input_path} to {target}: {e}")
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            return False
+
+    def _picture_comment(self, cover_data: bytes) -> str:
+        """کدگذاری کاور به شکل METADATA_BLOCK_PICTURE برای Ogg"""
+        picture = Picture()
+        picture.type = 3  # Cover (front)
+        picture.mime = 'image/png' if cover_data.startswith(b'\x89PNG') else 'image/jpeg'
+        picture.desc = 'Cover'
+        picture.data = cover_data
+        return base64.b64encode(picture.write()).decode('ascii')
@@ -1,21 +1,47 @@
 import os
 import shutil
-from typing import Optional, Dict, Any, Union
+import struct
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Optional, Dict, Any, Union, List, Tuple
 from mutagen import File as MutagenFile
-from mutagen.id3 import ID3, APIC, TIT2, TPE1, TALB, TCON, TDRC, TRCK, TPE2
+from mutagen.id3 import ID3, APIC, TIT2, TPE1, TALB, TCON, TDRC, TRCK, TPE2, TBPM, TXXX
 from mutagen.mp3 import MP3
 from mutagen.flac import FLAC, Picture
-from mutagen.mp4 import MP4, MP4Cover
+from mutagen.mp4 import MP4, MP4Cover, MP4FreeForm
+from mutagen.wave import WAVE
 from PIL import Image
 import logging
+from mp3_frames import FrameIndex, build_info_frame, parse_header
+from loudness import analyze_album
+from mp3_gain import GAIN_STEP_DB, apply_gain_steps, format_undo, gain_range, parse_undo
+from silence import SILENCE_THRESHOLD_DB, analyze_silence, trim_bounds
+from tempo import estimate_bpm
+from memory_budget import MemoryBudget, MemoryBudgetExceeded
+from tag_layout import locate_cover, tag_size
+import tracing
 
 logger = logging.getLogger(__name__)
 
 class AudioEditor:
     """کلاس ویرایش فایل‌های صوتی و متادیتا"""
     
-    def __init__(self):
+    # Text fields handled by the per-format tag writers
+    TAG_FIELDS = ('title', 'artist', 'album', 'genre', 'year', 'track', 'albumartist')
+    
+    # Loudness tags, stored as TXXX / Vorbis comments / iTunes freeform atoms
+    REPLAYGAIN_FIELDS = ('replaygain_track_gain', 'replaygain_track_peak',
+                         'replaygain_album_gain', 'replaygain_album_peak')
+    
+    def __init__(self, memory_budget: MemoryBudget = None):
         self.supported_formats = ['.mp3', '.flac', '.wav', '.m4a', '.ogg', '.aac']
+        # Bounds the tags and covers held in memory at once across worker threads
+        self.memory_budget = memory_budget or MemoryBudget()
+    
+    def _holding(self, file_path: str, extra: int = 0):
+        """رزرو بودجه حافظه برای تگ‌های فایل (و payload اضافه) پیش از بارگذاری با mutagen"""
+        return self.memory_budget.reserve(tag_size(file_path) + extra)
         
     def load_file(self, file_path: str) -> Optional[MutagenFile]:
         """بارگذاری فایل صوتی"""
@@ -34,10 +60,19 @@ class AudioEditor:
             logger.error(f"Error loading file {file_path}: {e}")
             return None
     
+    @tracing.traced('parse')
     def get_metadata(self, file_path: str) -> Dict[str, Any]:
         """استخراج متادیتا از فایل صوتی"""
+        try:
+            with self._holding(file_path):
+                return self._read_metadata(file_path)
+        except MemoryBudgetExceeded as e:
+            logger.error(f"Error extracting metadata: {e}")
+            return {}
+    
+    def _read_metadata(self, file_path: str) -> Dict[str, Any]:
         audio_file = self.load_file(file_path)
-        if not audio_file:
+        if audio_file is None:
             return {}
         
         metadata = {
@@ -48,6 +83,7 @@ class AudioEditor:
             'year': '',
             'track': '',
             'albumartist': '',
+            'bpm': '',
             'duration': 0,
             'bitrate': 0,
             'has_cover': False
@@ -59,8 +95,8 @@ class AudioEditor:
                 metadata['duration'] = getattr(audio_file.info, 'length', 0)
                 metadata['bitrate'] = getattr(audio_file.info, 'bitrate', 0)
             
-            # Extract tags based on file type
-            if isinstance(audio_file, MP3):
+            # Extract tags based on file type (WAV files carry ID3 tags too)
+            if isinstance(audio_file, (MP3, WAVE)):
                 metadata.update(self._extract_mp3_tags(audio_file))
             elif isinstance(audio_file, FLAC):
                 metadata.update(self._extract_flac_tags(audio_file))
@@ -87,6 +123,7 @@ class AudioEditor:
             tags['year'] = str(audio_file.tags.get('TDRC', [''])[0])
             tags['track'] = str(audio_file.tags.get('TRCK', [''])[0])
             tags['albumartist'] = str(audio_file.tags.get('TPE2', [''])[0])
+            tags['bpm'] = str(audio_file.tags.get('TBPM', [''])[0])
             # Check for any APIC frame (cover art)
             has_apic = False
             for key in audio_file.tags.keys():
@@ -109,6 +146,7 @@ class AudioEditor:
             tags['year'] = audio_file.tags.get('DATE', [''])[0]
             tags['track'] = audio_file.tags.get('TRACKNUMBER', [''])[0]
             tags['albumartist'] = audio_file.tags.get('ALBUMARTIST', [''])[0]
+            tags['bpm'] = audio_file.tags.get('BPM', [''])[0]
             tags['has_cover'] = bool(audio_file.pictures)
         
         return tags
@@ -126,6 +164,8 @@ class AudioEditor:
             track_info = audio_file.tags.get('trkn', [(0, 0)])[0]
             tags['track'] = str(track_info[0]) if track_info[0] > 0 else ''
             tags['albumartist'] = audio_file.tags.get('aART', [''])[0]
+            tempo = audio_file.tags.get('tmpo', [0])[0]
+            tags['bpm'] = str(tempo) if tempo > 0 else ''
             tags['has_cover'] = bool(audio_file.tags.get('covr'))
         
         return tags
@@ -157,29 +197,32 @@ class AudioEditor:
         """به‌روزرسانی متادیتا فایل صوتی"""
         try:
             if output_path and output_path != file_path:
-                shutil.copy2(file_path, output_path)
+                with tracing.span('copy'):
+                    shutil.copy2(file_path, output_path)
                 target_path = output_path
             else:
                 target_path = file_path
             
-            audio_file = self.load_file(target_path)
-            if not audio_file:
-                return False
-            
-            # Update tags based on file type
-            if isinstance(audio_file, MP3):
-                return self._update_mp3_tags(audio_file, metadata, target_path)
-            elif isinstance(audio_file, FLAC):
-                return self._update_flac_tags(audio_file, metadata, target_path)
-            elif isinstance(audio_file, MP4):
-                return self._update_mp4_tags(audio_file, metadata, target_path)
-            else:
-                return self._update_generic_tags(audio_file, metadata, target_path)
+            with self._holding(target_path):
+                audio_file = self.load_file(target_path)
+                if audio_file is None:
+                    return False
+                
+                # Update tags based on file type
+                if isinstance(audio_file, (MP3, WAVE)):
+                    return self._update_mp3_tags(audio_file, metadata, target_path)
+                elif isinstance(audio_file, FLAC):
+                    return self._update_flac_tags(audio_file, metadata, target_path)
+                elif isinstance(audio_file, MP4):
+                    return self._update_mp4_tags(audio_file, metadata, target_path)
+                else:
+                    return self._update_generic_tags(audio_file, metadata, target_path)
                 
         except Exception as e:
             logger.error(f"Error updating metadata: {e}")
             return False
     
+    @tracing.traced('tag_write.id3')
     def _update_mp3_tags(self, audio_file: MP3, metadata: Dict[str, str], file_path: str) -> bool:
         """به‌روزرسانی تگ‌های MP3"""
         try:
@@ -200,6 +243,12 @@ class AudioEditor:
                 audio_file.tags['TRCK'] = TRCK(encoding=3, text=metadata['track'])
             if 'albumartist' in metadata and metadata['albumartist']:
                 audio_file.tags['TPE2'] = TPE2(encoding=3, text=metadata['albumartist'])
+            if 'bpm' in metadata and metadata['bpm']:
+                audio_file.tags['TBPM'] = TBPM(encoding=3, text=metadata['bpm'])
+            for field in self.REPLAYGAIN_FIELDS:
+                if metadata.get(field):
+                    desc = field.upper()
+                    audio_file.tags[f'TXXX:{desc}'] = TXXX(encoding=3, desc=desc, text=metadata[field])
             
             audio_file.save()
             return True
@@ -208,6 +257,7 @@ class AudioEditor:
             logger.error(f"Error updating MP3 tags: {e}")
             return False
     
+    @tracing.traced('tag_write.flac')
     def _update_flac_tags(self, audio_file: FLAC, metadata: Dict[str, str], file_path: str) -> bool:
         """به‌روزرسانی تگ‌های FLAC"""
         try:
@@ -228,6 +278,11 @@ class AudioEditor:
                 audio_file.tags['TRACKNUMBER'] = metadata['track']
             if 'albumartist' in metadata and metadata['albumartist']:
                 audio_file.tags['ALBUMARTIST'] = metadata['albumartist']
+            if 'bpm' in metadata and metadata['bpm']:
+                audio_file.tags['BPM'] = metadata['bpm']
+            for field in self.REPLAYGAIN_FIELDS:
+                if metadata.get(field):
+                    audio_file.tags[field.upper()] = metadata[field]
             
             audio_file.save()
             return True
@@ -236,6 +291,7 @@ class AudioEditor:
             logger.error(f"Error updating FLAC tags: {e}")
             return False
     
+    @tracing.traced('tag_write.mp4')
     def _update_mp4_tags(self, audio_file: MP4, metadata: Dict[str, str], file_path: str) -> bool:
         """به‌روزرسانی تگ‌های MP4"""
         try:
@@ -260,6 +316,16 @@ class AudioEditor:
                     pass
             if 'albumartist' in metadata and metadata['albumartist']:
                 audio_file.tags['aART'] = metadata['albumartist']
+            if 'bpm' in metadata and metadata['bpm']:
+                try:
+                    audio_file.tags['tmpo'] = [int(round(float(metadata['bpm'])))]
+                except ValueError:
+                    pass
+            for field in self.REPLAYGAIN_FIELDS:
+                if metadata.get(field):
+                    audio_file.tags[f'----:com.apple.iTunes:{field}'] = [
+                        MP4FreeForm(metadata[field].encode('utf-8'))
+                    ]
             
             audio_file.save()
             return True
@@ -268,6 +334,7 @@ class AudioEditor:
             logger.error(f"Error updating MP4 tags: {e}")
             return False
     
+    @tracing.traced('tag_write.generic')
     def _update_generic_tags(self, audio_file: MutagenFile, metadata: Dict[str, str], file_path: str) -> bool:
         """به‌روزرسانی تگ‌های عمومی"""
         try:
@@ -282,8 +349,10 @@ class AudioEditor:
                 'genre': 'GENRE',
                 'year': 'DATE',
                 'track': 'TRACKNUMBER',
-                'albumartist': 'ALBUMARTIST'
+                'albumartist': 'ALBUMARTIST',
+                'bpm': 'BPM'
             }
+            tag_mapping.update({field: field.upper() for field in self.REPLAYGAIN_FIELDS})
             
             for key, value in metadata.items():
                 if key in tag_mapping and value:
@@ -296,6 +365,7 @@ class AudioEditor:
             logger.error(f"Error updating generic tags: {e}")
             return False
     
+    @tracing.traced('cover_write')
     def add_cover_art(self, file_path: str, cover_path: str, output_path: str = None) -> bool:
         """اضافه کردن کاور آرت به فایل صوتی"""
         try:
@@ -305,27 +375,29 @@ class AudioEditor:
             else:
                 target_path = file_path
             
-            audio_file = self.load_file(target_path)
-            if not audio_file:
+            # The image is held twice while the tag is rendered: as read and inside the new frame
+            with self._holding(target_path, 2 * os.path.getsize(cover_path)):
+                audio_file = self.load_file(target_path)
+                if audio_file is None:
+                    return False
+                
+                # Read and process cover image
+                with open(cover_path, 'rb') as cover_file:
+                    cover_data = cover_file.read()
+                
+                # Get image format
+                with Image.open(cover_path) as img:
+                    img_format = img.format.lower()
+                
+                if isinstance(audio_file, (MP3, WAVE)):
+                    return self._add_mp3_cover(audio_file, cover_data, img_format, target_path)
+                elif isinstance(audio_file, FLAC):
+                    return self._add_flac_cover(audio_file, cover_data, img_format, target_path)
+                elif isinstance(audio_file, MP4):
+                    return self._add_mp4_cover(audio_file, cover_data, img_format, target_path)
+                
                 return False
             
-            # Read and process cover image
-            with open(cover_path, 'rb') as cover_file:
-                cover_data = cover_file.read()
-            
-            # Get image format
-            img = Image.open(cover_path)
-            img_format = img.format.lower()
-            
-            if isinstance(audio_file, MP3):
-                return self._add_mp3_cover(audio_file, cover_data, img_format, target_path)
-            elif isinstance(audio_file, FLAC):
-                return self._add_flac_cover(audio_file, cover_data, img_format, target_path)
-            elif isinstance(audio_file, MP4):
-                return self._add_mp4_cover(audio_file, cover_data, img_format, target_path)
-            
-            return False
-            
         except Exception as e:
             logger.error(f"Error adding cover art: {e}")
             return False
@@ -398,6 +470,7 @@ class AudioEditor:
             logger.error(f"Error adding MP4 cover: {e}")
             return False
     
+    @tracing.traced('cover_remove')
     def remove_cover_art(self, file_path: str, output_path: str = None) -> bool:
         """حذف کاور آرت از فایل صوتی"""
         try:
@@ -407,21 +480,22 @@ class AudioEditor:
             else:
                 target_path = file_path
             
-            audio_file = self.load_file(target_path)
-            if not audio_file:
-                return False
-            
-            if isinstance(audio_file, MP3):
-                if audio_file.tags:
-                    audio_file.tags.delall('APIC')
-                    audio_file.save()
-            elif isinstance(audio_file, FLAC):
-                audio_file.clear_pictures()
-                audio_file.save()
-            elif isinstance(audio_file, MP4):
-                if audio_file.tags and 'covr' in audio_file.tags:
-                    del audio_file.tags['covr']
+            with self._holding(target_path):
+                audio_file = self.load_file(target_path)
+                if audio_file is None:
+                    return False
+                
+                if isinstance(audio_file, (MP3, WAVE)):
+                    if audio_file.tags:
+                        audio_file.tags.delall('APIC')
+                        audio_file.save()
+                elif isinstance(audio_file, FLAC):
+                    audio_file.clear_pictures()
                     audio_file.save()
+                elif isinstance(audio_file, MP4):
+                    if audio_file.tags and 'covr' in audio_file.tags:
+                        del audio_file.tags['covr']
+                        audio_file.save()
             
             return True
             
@@ -432,35 +506,409 @@ class AudioEditor:
     def extract_cover_art(self, file_path: str, output_path: str) -> bool:
         """استخراج کاور آرت از فایل صوتی"""
         try:
-            audio_file = self.load_file(file_path)
-            if not audio_file:
-                return False
+            span = locate_cover(file_path)
+            if span:
+                # Copied file to file; the image never passes through process memory
+                with open(file_path, 'rb') as src, open(output_path, 'wb') as dst:
+                    self._copy_range(src, dst, *span)
+                return True
             
-            cover_data = None
+            cover_data = self.get_cover_data(file_path)
             
-            if isinstance(audio_file, MP3):
+            if cover_data:
+                with open(output_path, 'wb') as f:
+                    f.write(cover_data)
+                return True
+            
+            return False
+            
+        except Exception as e:
+            logger.error(f"Error extracting cover art: {e}")
+            return False
+    
+    def get_cover_data(self, file_path: str) -> Optional[bytes]:
+        """خواندن داده‌های تصویر کاور فایل صوتی"""
+        span = locate_cover(file_path)
+        if span:
+            # Only the image is read, not the tag around it
+            offset, length = span
+            with self.memory_budget.reserve(length), open(file_path, 'rb') as f:
+                f.seek(offset)
+                return f.read(length)
+        
+        with self._holding(file_path):
+            audio_file = self.load_file(file_path)
+            if audio_file is None:
+                return None
+            
+            if isinstance(audio_file, (MP3, WAVE)):
                 if audio_file.tags:
-                    apic = audio_file.tags.get('APIC:')
-                    if apic:
-                        cover_data = apic.data
+                    # Covers are keyed by description (e.g. 'APIC:Cover')
+                    apic_frames = audio_file.tags.getall('APIC')
+                    if apic_frames:
+                        return apic_frames[0].data
             elif isinstance(audio_file, FLAC):
                 if audio_file.pictures:
-                    cover_data = audio_file.pictures[0].data
+                    return audio_file.pictures[0].data
             elif isinstance(audio_file, MP4):
                 if audio_file.tags and 'covr' in audio_file.tags:
-                    cover_data = audio_file.tags['covr'][0]
+                    return bytes(audio_file.tags['covr'][0])
             
-            if cover_data:
-                with open(output_path, 'wb') as f:
-                    f.write(cover_data)
-                return True
+            return None
+    
+    def write_replaygain(self, file_paths: List[str], max_workers: int = None,
+                         ffmpeg_binary: str = 'ffmpeg') -> bool:
+        """محاسبه و نوشتن تگ‌های ReplayGain ترک و آلبوم برای مجموعه‌ای از فایل‌ها"""
+        try:
+            tags = analyze_album(file_paths, max_workers, ffmpeg_binary)
+            return all(self.update_metadata(file_path, tags[file_path]) for file_path in file_paths)
             
+        except Exception as e:
+            logger.error(f"Error writing ReplayGain tags: {e}")
             return False
+    
+    @tracing.traced('detect_bpm')
+    def detect_bpm(self, file_path: str, ffmpeg_binary: str = 'ffmpeg') -> Optional[str]:
+        """تخمین تمپو به صورت عدد صحیح، آماده برای تگ BPM"""
+        try:
+            bpm = estimate_bpm(file_path, ffmpeg_binary)
+            return str(int(round(bpm))) if bpm else None
             
         except Exception as e:
-            logger.error(f"Error extracting cover art: {e}")
+            logger.error(f"Error detecting BPM: {e}")
+            return None
+    
+    def write_bpm(self, file_paths: List[str], max_workers: int = None,
+                  ffmpeg_binary: str = 'ffmpeg') -> Dict[str, Optional[str]]:
+        """تشخیص و نوشتن تگ BPM برای مجموعه‌ای از فایل‌ها در یک process pool"""
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = dict(zip(file_paths, pool.map(partial(self.detect_bpm, ffmpeg_binary=ffmpeg_binary),
+                                                    file_paths)))
+        
+        for file_path, bpm in results.items():
+            if bpm and not self.update_metadata(file_path, {'bpm': bpm}):
+                results[file_path] = None
+        return results
+    
+    @tracing.traced('mp3_gain')
+    def adjust_mp3_gain(self, file_path: str, gain_db: float, output_path: str = None) -> Optional[float]:
+        """تغییر بلندی صدای MP3 بدون کدگذاری مجدد (در گام‌های 1.5 دسی‌بل)
+        
+        The change is limited so that no granule's global_gain leaves 0..255: a clamped granule
+        could not be restored by the undo tag. Returns the change actually applied.
+        """
+        try:
+            if output_path and output_path != file_path:
+                shutil.copy2(file_path, output_path)
+                target_path = output_path
+            else:
+                target_path = file_path
+            
+            with self._holding(target_path):
+                audio_file = self.load_file(target_path)
+                if not isinstance(audio_file, MP3):
+                    logger.error(f"Lossless gain is only supported for MP3: {file_path}")
+                    return None
+                
+                requested = int(round(gain_db / GAIN_STEP_DB))
+                limits = gain_range(target_path)
+                if limits is None:
+                    logger.error(f"No MPEG audio frames found in {file_path}")
+                    return None
+                lowest, highest = limits
+                steps = max(-lowest, min(requested, 255 - highest))
+                if steps != requested:
+                    logger.warning(f"Gain of {file_path} limited to {steps * GAIN_STEP_DB:+.1f} dB "
+                                   f"(asked {requested * GAIN_STEP_DB:+.1f} dB) to avoid clipping")
+                if steps == 0:
+                    return 0.0
+                
+                # Remember what to apply to get back to the original audio
+                undo_steps = -steps
+                if audio_file.tags and 'TXXX:MP3GAIN_UNDO' in audio_file.tags:
+                    undo_steps += parse_undo(str(audio_file.tags['TXXX:MP3GAIN_UNDO']))
+                
+                apply_gain_steps(target_path, steps)
+                
+                audio_file = self.load_file(target_path)
+                if audio_file.tags is None:
+                    audio_file.add_tags()
+                if undo_steps:
+                    audio_file.tags['TXXX:MP3GAIN_UNDO'] = TXXX(
+                        encoding=3, desc='MP3GAIN_UNDO', text=format_undo(undo_steps)
+                    )
+                else:
+                    audio_file.tags.delall('TXXX:MP3GAIN_UNDO')
+                audio_file.save()
+            
+            return steps * GAIN_STEP_DB
+            
+        except Exception as e:
+            logger.error(f"Error adjusting MP3 gain: {e}")
+            return None
+    
+    @tracing.traced('mp3_gain_undo')
+    def undo_mp3_gain(self, file_path: str, output_path: str = None) -> bool:
+        """بازگرداندن تغییر بلندی صدا با استفاده از تگ MP3GAIN_UNDO"""
+        try:
+            with self._holding(file_path):
+                audio_file = self.load_file(file_path)
+                if not isinstance(audio_file, MP3) or not audio_file.tags or \
+                        'TXXX:MP3GAIN_UNDO' not in audio_file.tags:
+                    return False
+                undo_steps = parse_undo(str(audio_file.tags['TXXX:MP3GAIN_UNDO']))
+            
+            # adjust_mp3_gain reserves the budget again for its own load
+            return self.adjust_mp3_gain(file_path, undo_steps * GAIN_STEP_DB, output_path) is not None
+            
+        except Exception as e:
+            logger.error(f"Error undoing MP3 gain: {e}")
             return False
     
+    @tracing.traced('trim_silence')
+    def trim_silence(self, file_path: str, output_path: str = None,
+                     threshold_db: float = SILENCE_THRESHOLD_DB, padding: float = 0.1,
+                     ffmpeg_binary: str = 'ffmpeg') -> Optional[Tuple[float, float]]:
+        """حذف سکوت ابتدا و انتهای فایل؛ مقدار حذف شده از ابتدا و انتها (ثانیه) را برمی‌گرداند"""
+        target_path = output_path or file_path
+        root, ext = os.path.splitext(target_path)
+        partial_path = f"{root}.trim_{os.getpid()}{ext}"
+        try:
+            audio_file = self.load_file(file_path)
+            if audio_file is None:
+                return None
+            
+            analysis = analyze_silence(file_path, threshold_db, ffmpeg_binary=ffmpeg_binary)
+            start, end = trim_bounds(analysis, padding)
+            if end <= start:
+                logger.error(f"File is entirely silent: {file_path}")
+                return None
+            
+            if start <= 0 and end >= analysis['duration']:
+                if target_path != file_path:
+                    shutil.copy2(file_path, target_path)
+                return 0.0, 0.0
+            
+            # MP3 and WAV are cut on frame/sample boundaries; other formats on packets
+            if isinstance(audio_file, (MP3, WAVE)):
+                span = [{'start': start, 'end': end}]
+                if isinstance(audio_file, MP3):
+                    segments = self._mp3_split_segments(file_path, span)
+                else:
+                    segments = self._wav_split_segments(file_path, span)
+                if not segments:
+                    return None
+                
+                _, prefix, segment_start, segment_end = segments[0]
+                with open(file_path, 'rb') as src, open(partial_path, 'wb') as dst:
+                    dst.write(prefix)
+                    dst.flush()
+                    self._copy_range(src, dst, segment_start, segment_end - segment_start)
+                if audio_file.tags:
+                    audio_file.tags.save(partial_path)
+            else:
+                subprocess.run([
+                    ffmpeg_binary, '-hide_banner', '-nostdin', '-loglevel', 'error', '-y',
+                    '-ss', f"{start:.3f}", '-to', f"{end:.3f}", '-i', file_path,
+                    '-map', '0', '-c', 'copy', '-map_metadata', '0', partial_path
+                ], check=True, capture_output=True)
+            
+            os.replace(partial_path, target_path)
+            return start, analysis['duration'] - end
+            
+        except Exception as e:
+            logger.error(f"Error trimming silence: {e}")
+            return None
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+    
+    def trim_silence_batch(self, file_paths: List[str], output_dir: str = None, max_workers: int = None,
+                           threshold_db: float = SILENCE_THRESHOLD_DB, padding: float = 0.1,
+                           ffmpeg_binary: str = 'ffmpeg') -> Dict[str, Optional[Tuple[float, float]]]:
+        """حذف سکوت مجموعه‌ای از فایل‌ها به صورت موازی در یک process pool"""
+        output_paths = [os.path.join(output_dir, os.path.basename(file_path)) if output_dir else None
+                        for file_path in file_paths]
+        trim = partial(self.trim_silence, threshold_db=threshold_db, padding=padding,
+                       ffmpeg_binary=ffmpeg_binary)
+        
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(trim, file_paths, output_paths))
+        
+        return dict(zip(file_paths, results))
+    
+    def split_tracks(self, file_path: str, tracks: List[Dict[str, Any]], output_dir: str,
+                     base_metadata: Dict[str, str] = None, template: str = "{track} - {title}",
+                     max_workers: int = None) -> List[str]:
+        """تقسیم بدون افت کیفیت فایل بلند به ترک‌های برچسب‌خورده"""
+        cover_path = None
+        try:
+            audio_file = self.load_file(file_path)
+            if audio_file is None:
+                return []
+
+            # Byte ranges are aligned to MPEG frames or PCM sample blocks
+            if isinstance(audio_file, MP3):
+                segments = self._mp3_split_segments(file_path, tracks)
+            elif isinstance(audio_file, WAVE):
+                segments = self._wav_split_segments(file_path, tracks)
+            else:
+                logger.error(f"Lossless splitting is not supported for: {file_path}")
+                return []
+
+            if not segments:
+                return []
+
+            # Carry the source cover over to every track
+            cover_path = os.path.join(output_dir, f".split_cover_{os.getpid()}_{id(segments)}")
+            if not self.extract_cover_art(file_path, cover_path):
+                cover_path = None
+
+            ext = os.path.splitext(file_path)[1].lower()
+            base = {key: value for key, value in (base_metadata or {}).items()
+                    if key in self.TAG_FIELDS}
+            jobs = []
+            for track, prefix, start, end in segments:
+                metadata = dict(base)
+                metadata.update({key: str(value) for key, value in track.items()
+                                 if key in self.TAG_FIELDS and value})
+                name_fields = {key: metadata.get(key, '') for key in self.TAG_FIELDS}
+                name_fields['track'] = metadata.get('track', '').zfill(2)
+                filename = self.generate_filename(name_fields, template) + ext
+                output_path = os.path.join(output_dir, filename)
+                jobs.append((file_path, output_path, prefix, start, end, metadata, cover_path))
+
+            # Every track reads a disjoint byte range, so the source is read once in total
+            workers = max_workers or min(8, len(jobs))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(lambda job: self._write_split_track(*job), jobs))
+
+            return [path for path in results if path]
+
+        except Exception as e:
+            logger.error(f"Error splitting tracks: {e}")
+            return []
+        finally:
+            if cover_path and os.path.exists(cover_path):
+                os.remove(cover_path)
+
+    def _mp3_split_segments(self, file_path: str, tracks: List[Dict[str, Any]]) -> List[tuple]:
+        """محاسبه بازه‌های هم‌تراز با فریم برای تقسیم MP3"""
+        index = FrameIndex(file_path)
+        if not len(index):
+            return []
+
+        marker = b'Xing' if index.vbr_marker in (b'Xing', b'VBRI') else b'Info'
+        segments = []
+        with open(file_path, 'rb') as f:
+            for track in tracks:
+                start, end, frame_count = index.byte_range(track['start'], track.get('end'))
+                if frame_count == 0:
+                    continue
+
+                # A fresh Info frame keeps durations right for each track
+                f.seek(start)
+                template = f.read(4)
+                header = parse_header(int.from_bytes(template, 'big'))
+                prefix = b''
+                if header:
+                    prefix = build_info_frame(template, header, frame_count, end - start, marker) or b''
+                segments.append((track, prefix, start, end))
+
+        return segments
+
+    def _wav_split_segments(self, file_path: str, tracks: List[Dict[str, Any]]) -> List[tuple]:
+        """محاسبه بازه‌های هم‌تراز با نمونه برای تقسیم WAV"""
+        fmt_chunk = None
+        data_offset = None
+        data_size = 0
+
+        with open(file_path, 'rb') as f:
+            riff = f.read(12)
+            if riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+                return []
+            while True:
+                chunk_head = f.read(8)
+                if len(chunk_head) < 8:
+                    break
+                chunk_id, size = struct.unpack('<4sI', chunk_head)
+                if chunk_id == b'fmt ':
+                    fmt_chunk = f.read(size)
+                    f.seek(size & 1, 1)
+                elif chunk_id == b'data':
+                    data_offset = f.tell()
+                    data_size = size
+                    break
+                else:
+                    f.seek(size + (size & 1), 1)
+
+        if not fmt_chunk or data_offset is None:
+            return []
+
+        # Streamed WAVs may carry a placeholder data size
+        data_size = min(data_size, os.path.getsize(file_path) - data_offset)
+        sample_rate = struct.unpack('<I', fmt_chunk[4:8])[0]
+        block_align = struct.unpack('<H', fmt_chunk[12:14])[0]
+        total_blocks = data_size // block_align
+
+        segments = []
+        for track in tracks:
+            first = min(int(round(track['start'] * sample_rate)), total_blocks)
+            last = total_blocks if track.get('end') is None else \
+                min(int(round(track['end'] * sample_rate)), total_blocks)
+            if last <= first:
+                continue
+            length = (last - first) * block_align
+            prefix = (b'RIFF' + struct.pack('<I', 4 + 8 + len(fmt_chunk) + 8 + length) + b'WAVE' +
+                      b'fmt ' + struct.pack('<I', len(fmt_chunk)) + fmt_chunk +
+                      b'data' + struct.pack('<I', length))
+            start = data_offset + first * block_align
+            segments.append((track, prefix, start, start + length))
+
+        return segments
+
+    def _write_split_track(self, file_path: str, output_path: str, prefix: bytes, start: int,
+                           end: int, metadata: Dict[str, str], cover_path: Optional[str]) -> Optional[str]:
+        """نوشتن یک ترک جدا شده و برچسب‌گذاری آن"""
+        try:
+            with open(file_path, 'rb') as src, open(output_path, 'wb') as dst:
+                dst.write(prefix)
+                dst.flush()
+                self._copy_range(src, dst, start, end - start)
+
+            if not self.update_metadata(output_path, metadata):
+                return None
+            if cover_path:
+                self.add_cover_art(output_path, cover_path)
+            return output_path
+
+        except Exception as e:
+            logger.error(f"Error writing split track {output_path}: {e}")
+            return None
+
+    def _copy_range(self, src, dst, offset: int, length: int, chunk_size: int = 1 << 20):
+        """کپی یک بازه بایتی بین دو فایل (در صورت امکان در سطح کرنل)"""
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while length > 0:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), length, offset)
+                    if copied == 0:
+                        return
+                    offset += copied
+                    length -= copied
+                return
+            except OSError:
+                # Not supported across these filesystems; fall back to plain I/O
+                pass
+
+        src.seek(offset)
+        while length > 0:
+            chunk = src.read(min(chunk_size, length))
+            if not chunk:
+                return
+            dst.write(chunk)
+            length -= len(chunk)
+
     def generate_filename(self, metadata: Dict[str, str], template: str = "{artist} - {title}") -> str:
         """تولید نام فایل بر اساس متادیتا"""
         try:
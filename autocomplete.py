@@ -0,0 +1,161 @@
+import bisect
+import json
+import os
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fields where users keep typing the same values
+AUTOCOMPLETE_FIELDS = ('artist', 'album', 'genre', 'albumartist')
+
+# Arabic code points that Persian keyboards and old tags mix in
+_PERSIAN_MAP = str.maketrans({
+    '\u064a': '\u06cc', '\u0649': '\u06cc',      # ي ى -> ی
+    '\u0643': '\u06a9',                          # ك -> ک
+    '\u0629': '\u0647', '\u06c0': '\u0647',      # ة ۀ -> ه
+    '\u200c': ' ',                               # zero-width non-joiner
+    '\u200e': '', '\u200f': '', '\u0640': '',    # direction marks, tatweel
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},
+})
+_SPACES = re.compile(r'\s+')
+
+# Cached prefix lookups per field
+_CACHE_SIZE = 1024
+
+
+def normalize(text: str) -> str:
+    """یکسان‌سازی متن برای جستجو (یونیکد، حروف عربی/فارسی، اعراب و فاصله‌ها)"""
+    text = unicodedata.normalize('NFKC', text).casefold().translate(_PERSIAN_MAP)
+    # Dropping combining marks removes Arabic diacritics and Latin accents alike
+    text = ''.join(char for char in unicodedata.normalize('NFD', text) if unicodedata.category(char) != 'Mn')
+    return _SPACES.sub(' ', text).strip()
+
+
+class _FieldIndex:
+    """ایندکس پیشوندی یک فیلد روی آرایه مرتب کلیدها"""
+
+    def __init__(self, entries: Dict[str, list] = None):
+        self.counts: Dict[str, int] = {}       # display value -> times entered
+        self.normalized: Dict[str, str] = {}   # display value -> normalized form
+        self.canonical: Dict[str, str] = {}    # normalized form -> most used display value
+        self.keys: List[str] = []              # sorted "word suffix\0display value"
+        self._cache: Dict[str, List[str]] = {}
+
+        # Saved entries carry their normalized form, so a warm start skips normalize()
+        for value, (count, normalized) in (entries or {}).items():
+            self.normalized[value] = normalized
+            self._count(value, int(count))
+        self.keys = sorted(key for value in self.counts for key in self._keys_for(value))
+
+    def _keys_for(self, value: str) -> List[str]:
+        # Every word start is a way in: "bea" finds "The Beatles"
+        words = self.normalized[value].split(' ')
+        return [' '.join(words[start:]) + '\0' + value for start in range(len(words))]
+
+    def _count(self, value: str, weight: int) -> bool:
+        normalized = self.normalized.get(value)
+        if normalized is None:
+            normalized = normalize(value)
+            if not normalized:
+                return False
+            self.normalized[value] = normalized
+        is_new = value not in self.counts
+        self.counts[value] = self.counts.get(value, 0) + weight
+
+        best = self.canonical.get(normalized)
+        if best is None or self.counts[value] > self.counts[best]:
+            self.canonical[normalized] = value
+        return is_new
+
+    def add(self, value: str, weight: int = 1):
+        if self._count(value, weight):
+            for key in self._keys_for(value):
+                bisect.insort(self.keys, key)
+        self._cache.clear()
+
+    def suggest(self, prefix: str, limit: int) -> List[str]:
+        prefix = normalize(prefix)
+        cached = self._cache.get(prefix)
+        if cached is None:
+            low = bisect.bisect_left(self.keys, prefix)
+            high = bisect.bisect_left(self.keys, prefix + '\U0010ffff', low)
+            # Spelling variants collapse onto their most used form
+            found = {self.canonical[self.normalized[key.split('\0', 1)[1]]] for key in self.keys[low:high]}
+            cached = sorted(found, key=lambda value: (-self.counts[value], value))
+            if len(self._cache) >= _CACHE_SIZE:
+                self._cache.clear()
+            self._cache[prefix] = cached
+        return cached[:limit]
+
+
+class AutocompleteIndex:
+    """پیشنهاد مقادیر پرتکرار فیلدها بر اساس ویرایش‌های گذشته"""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self._fields: Dict[str, _FieldIndex] = {field: _FieldIndex() for field in AUTOCOMPLETE_FIELDS}
+        self._lock = threading.Lock()
+        self.dirty = False      # values recorded since the last save
+        if path and os.path.exists(path):
+            self.load()
+
+    def record(self, field: str, value: str, weight: int = 1):
+        """ثبت یک مقدار وارد شده"""
+        if field in self._fields and value and value.strip():
+            with self._lock:
+                self._fields[field].add(value.strip(), weight)
+                self.dirty = True
+
+    def record_metadata(self, metadatas: Iterable[Dict[str, str]]):
+        """ثبت مقادیر مجموعه‌ای از متادیتاها (مثلاً کاتالوگ کتابخانه)"""
+        for metadata in metadatas:
+            for field in AUTOCOMPLETE_FIELDS:
+                self.record(field, metadata.get(field, ''))
+
+    def suggest(self, field: str, prefix: str = '', limit: int = 5) -> List[str]:
+        """پرتکرارترین مقادیری که یکی از کلمه‌هایشان با پیشوند داده شده شروع می‌شود"""
+        if field not in self._fields:
+            return []
+        with self._lock:
+            return self._fields[field].suggest(prefix, limit)
+
+    def __len__(self) -> int:
+        return sum(len(index.counts) for index in self._fields.values())
+
+    def load(self):
+        """بارگذاری ایندکس ذخیره شده"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # Keys are rebuilt with one sort per field rather than insertion by insertion
+            fields = {field: _FieldIndex(data.get(field)) for field in AUTOCOMPLETE_FIELDS}
+            with self._lock:
+                self._fields = fields
+
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading autocomplete index: {e}")
+
+    def save(self) -> bool:
+        """ذخیره ایندکس روی دیسک"""
+        if not self.path:
+            return False
+        try:
+            with self._lock:
+                data = {field: {value: [count, index.normalized[value]] for value, count in index.counts.items()}
+                        for field, index in self._fields.items()}
+                self.dirty = False
+            partial_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(partial_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(partial_path, self.path)
+            return True
+
+        except OSError as e:
+            logger.error(f"Error saving autocomplete index: {e}")
+            self.dirty = True
+            return False
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+بنچمارک AudioEditor روی فرمت‌ها، حجم‌ها و عملیات مختلف با مقایسه با baseline ذخیره شده
+
+Usage: python benchmark_audio_editor.py [--sizes 64k,8m,256m] [--formats mp3-cbr,flac] [--repeat 3]
+                                        [--baseline benchmark_baseline.json] [--save-baseline | --no-compare]
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import struct
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Optional
+import numpy as np
+from mutagen import File as MutagenFile
+from mutagen.ogg import OggPage
+from PIL import Image
+from audio_editor import AudioEditor
+
+# Bump when the fixture layout changes so cached fixtures are rebuilt
+FIXTURE_VERSION = 1
+
+SIZES = {
+    '64k': 64 * 1024,
+    '8m': 8 * 1024 * 1024,
+    '256m': 256 * 1024 * 1024,
+    '2g': 2 * 1024 * 1024 * 1024,
+}
+DEFAULT_SIZES = ('64k', '8m', '256m')
+COVER_SIDES = (300, 1200, 3000)
+
+# Audio beyond the first megabyte is a sparse hole: tag readers and writers never decode it
+REAL_AUDIO_BYTES = 1024 * 1024
+
+FIXTURE_TAGS = {'title': 'Benchmark Track', 'artist': 'Benchmark Artist', 'album': 'Benchmark Album',
+                'date': '2024', 'genre': 'Test', 'tracknumber': '1'}
+EDIT_TAGS = {'title': 'عنوان جدید', 'artist': 'هنرمند', 'album': 'آلبوم', 'genre': 'Pop',
+             'year': '2025', 'track': '7', 'albumartist': 'Various'}
+
+SAMPLE_RATE = 44100
+
+
+def _mp3_frame(bitrate_index: int, payload: bytes = b'') -> bytes:
+    """فریم MPEG-1 Layer III استریو 44.1kHz با داده صفر (سکوت)"""
+    bitrate = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)[bitrate_index] * 1000
+    length = 144 * bitrate // SAMPLE_RATE
+    header = bytes((0xFF, 0xFB, bitrate_index << 4, 0x64))
+    return (header + payload).ljust(length, b'\0')
+
+
+def build_mp3(path: str, size: int, vbr: bool):
+    frames = []
+    written = 0
+    indices = (9, 11, 13, 10, 12) if vbr else (9,)
+    while written < min(size, REAL_AUDIO_BYTES):
+        frame = _mp3_frame(indices[len(frames) % len(indices)])
+        frames.append(frame)
+        written += len(frame)
+    if vbr:
+        # Xing header in the first frame: total frame and byte counts for the whole file
+        average = sum(map(len, frames)) / len(frames)
+        total_frames = int(size / average)
+        xing = b'\0' * 32 + b'Xing' + struct.pack('>III', 0x3, total_frames, size)
+        frames.insert(0, _mp3_frame(9, xing))
+    with open(path, 'wb') as f:
+        f.writelines(frames)
+
+
+def build_flac(path: str, size: int):
+    # STREAMINFO for 16-bit stereo at roughly 60% compression
+    total_samples = int(size / (4 * 0.6))
+    packed = (SAMPLE_RATE << 44) | (1 << 41) | (15 << 36) | total_samples
+    streaminfo = struct.pack('>HH', 4096, 4096) + b'\0' * 6 + packed.to_bytes(8, 'big') + b'\0' * 16
+    with open(path, 'wb') as f:
+        f.write(b'fLaC' + bytes((0x80,)) + len(streaminfo).to_bytes(3, 'big') + streaminfo)
+        f.write(b'\xff\xf8' + b'\0' * (min(size, REAL_AUDIO_BYTES) - 2))
+
+
+def _atom(name: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I4s', 8 + len(payload), name) + payload
+
+
+def _full_atom(name: bytes, payload: bytes, flags: int = 0) -> bytes:
+    return _atom(name, struct.pack('>I', flags) + payload)
+
+
+def build_m4a(path: str, size: int):
+    duration = int(size * 8 / 256000)     # 256 kbps AAC
+    matrix = struct.pack('>9I', 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+    # AAC LC descriptor: decoder config (AudioSpecificConfig 44.1 kHz stereo) and SL config
+    decoder = bytes((0x40, 0x15)) + b'\0' * 3 + struct.pack('>II', 256000, 256000) + bytes((5, 2, 0x12, 0x10))
+    descriptor = struct.pack('>HB', 1, 0) + bytes((4, len(decoder))) + decoder + bytes((6, 1, 2))
+    esds = _full_atom(b'esds', bytes((3, len(descriptor))) + descriptor)
+    mp4a = _atom(b'mp4a', b'\0' * 6 + struct.pack('>H', 1) + b'\0' * 8 +
+                 struct.pack('>HHHHI', 2, 16, 0, 0, SAMPLE_RATE << 16) + esds)
+
+    def moov(chunk_offset: int) -> bytes:
+        stbl = _atom(b'stbl', b''.join((
+            _full_atom(b'stsd', struct.pack('>I', 1) + mp4a),
+            _full_atom(b'stts', struct.pack('>I', 0)),
+            _full_atom(b'stsc', struct.pack('>I', 0)),
+            _full_atom(b'stsz', struct.pack('>II', 0, 0)),
+            _full_atom(b'stco', struct.pack('>II', 1, chunk_offset)),
+        )))
+        minf = _atom(b'minf', _full_atom(b'smhd', b'\0' * 4) + _atom(
+            b'dinf', _full_atom(b'dref', struct.pack('>I', 1) + _full_atom(b'url ', b'', flags=1))) + stbl)
+        mdia = _atom(b'mdia', b''.join((
+            _full_atom(b'mdhd', struct.pack('>IIIIHH', 0, 0, SAMPLE_RATE, duration * SAMPLE_RATE, 0x55C4, 0)),
+            _full_atom(b'hdlr', b'\0' * 4 + b'soun' + b'\0' * 12 + b'SoundHandler\0'),
+            minf,
+        )))
+        tkhd = _full_atom(b'tkhd', struct.pack('>IIIII', 0, 0, 1, 0, duration * 1000) + b'\0' * 8 +
+                          struct.pack('>HHHH', 0, 0, 0x0100, 0) + matrix + b'\0' * 8, flags=7)
+        mvhd = _full_atom(b'mvhd', struct.pack('>IIIIIH', 0, 0, 1000, duration * 1000, 0x10000, 0x0100) +
+                          b'\0' * 10 + matrix + b'\0' * 24 + struct.pack('>I', 2))
+        return _atom(b'moov', mvhd + _atom(b'trak', tkhd + mdia))
+
+    ftyp = _atom(b'ftyp', b'M4A ' + struct.pack('>I', 0) + b'M4A mp42isom')
+    # moov before mdat ("fast start"), as Telegram clients and most encoders write it
+    header_size = len(ftyp) + len(moov(0)) + 8
+    data = b'\0' * (min(size, REAL_AUDIO_BYTES) - header_size)
+    with open(path, 'wb') as f:
+        f.write(ftyp + moov(header_size) + _atom(b'mdat', data))
+
+
+def _ogg_page(packets, sequence: int, position: int, first: bool = False, last: bool = False) -> bytes:
+    page = OggPage()
+    page.serial = 0x4D555349
+    page.sequence = sequence
+    page.position = position
+    page.packets = packets
+    page.first = first
+    page.last = last
+    return page.write()
+
+
+def _ogg_last_page(size: int) -> bytes:
+    # Granule position of the last page sets the length (about 160 kbps)
+    total_samples = int(size * 8 / 160000 * SAMPLE_RATE)
+    return _ogg_page([b'\0' * 1024], 10 ** 6, total_samples, last=True)
+
+
+def build_ogg(path: str, size: int):
+    identification = (b'\x01vorbis' + struct.pack('<IBIiii', 0, 2, SAMPLE_RATE, 0, 160000, 0) +
+                      bytes((0xB8, 1)))
+    vendor = b'benchmark'
+    comments = b'\x03vorbis' + struct.pack('<I', len(vendor)) + vendor + struct.pack('<I', 0) + b'\x01'
+    setup = b'\x05vorbis' + b'\0' * 512
+    pages = [_ogg_page([identification], 0, 0, first=True), _ogg_page([comments, setup], 1, 0)]
+    audio_budget = min(size, REAL_AUDIO_BYTES) - sum(map(len, pages)) - len(_ogg_last_page(size))
+    position = 0
+    while audio_budget > 5000:
+        position += 4096
+        pages.append(_ogg_page([b'\0' * 4000], len(pages), position))
+        audio_budget -= len(pages[-1])
+    with open(path, 'wb') as f:
+        f.writelines(pages)
+
+
+def _extend_m4a(path: str, size: int):
+    """بزرگ کردن mdat تا حجم نهایی (بعد از نوشتن تگ‌ها که محل mdat را جابه‌جا می‌کند)"""
+    with open(path, 'r+b') as f:
+        offset = 0
+        while True:
+            f.seek(offset)
+            length, name = struct.unpack('>I4s', f.read(8))
+            if name == b'mdat':
+                f.seek(offset)
+                f.write(struct.pack('>I', size - offset))
+                break
+            offset += length
+        f.truncate(size)
+
+
+def _extend_ogg(path: str, size: int):
+    last = _ogg_last_page(size)
+    with open(path, 'r+b') as f:
+        f.truncate(size - len(last))
+        f.seek(0, os.SEEK_END)
+        f.write(last)
+
+
+FORMATS = {
+    'mp3-cbr': ('.mp3', lambda path, size: build_mp3(path, size, vbr=False), os.truncate),
+    'mp3-vbr': ('.mp3', lambda path, size: build_mp3(path, size, vbr=True), os.truncate),
+    'flac': ('.flac', build_flac, os.truncate),
+    'm4a': ('.m4a', build_m4a, _extend_m4a),
+    'ogg': ('.ogg', build_ogg, _extend_ogg),
+}
+
+
+def build_fixture(directory: str, fmt: str, size_name: str) -> str:
+    """ساخت (یا استفاده از نسخه ساخته شده) فایل تست قطعی با تگ‌های اولیه"""
+    extension, build, extend = FORMATS[fmt]
+    path = os.path.join(directory, f"fixture-v{FIXTURE_VERSION}-{fmt}-{size_name}{extension}")
+    if os.path.exists(path):
+        return path
+    size = SIZES[size_name]
+    partial_path = path + '.partial'
+    build(partial_path, size)
+
+    # Tags go in while the file is small, so mutagen never has to move the sparse tail
+    audio = MutagenFile(partial_path, easy=True)
+    if audio.tags is None:
+        audio.add_tags()
+    audio.update(FIXTURE_TAGS)
+    audio.save()
+
+    if os.path.getsize(partial_path) < size:
+        extend(partial_path, size)
+    os.replace(partial_path, path)
+    return path
+
+
+def build_cover(directory: str, side: int) -> str:
+    """تصویر JPEG قطعی (گرادیان و نویز با seed ثابت)"""
+    path = os.path.join(directory, f"cover-v{FIXTURE_VERSION}-{side}.jpg")
+    if not os.path.exists(path):
+        rng = np.random.default_rng(side)
+        gradient = np.linspace(0, 255, side, dtype=np.float32)
+        pixels = np.stack([np.add.outer(gradient, gradient) / 2,
+                           np.tile(gradient, (side, 1)),
+                           np.tile(gradient[:, None], (1, side))], axis=-1)
+        pixels += rng.normal(0, 24, pixels.shape)
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), 'RGB').save(path, 'JPEG', quality=90)
+    return path
+
+
+class ResourceProbe:
+    """پیک RSS و بایت‌های خوانده/نوشته شده هر عملیات از /proc (در صورت وجود)"""
+
+    def __init__(self):
+        self.has_proc = os.path.exists('/proc/self/io') and os.path.exists('/proc/self/clear_refs')
+
+    @staticmethod
+    def _proc_io() -> Dict[str, int]:
+        counters = {}
+        with open('/proc/self/io') as f:
+            for line in f:
+                name, value = line.split(':')
+                counters[name] = int(value)
+        return counters
+
+    @staticmethod
+    def _peak_rss() -> int:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def start(self):
+        if self.has_proc:
+            try:
+                # "5" resets the peak resident set size of this process (Linux 4.0+)
+                with open('/proc/self/clear_refs', 'w') as f:
+                    f.write('5')
+            except OSError:
+                self.has_proc = False
+        self._io = self._proc_io() if self.has_proc else None
+
+    def stop(self) -> Dict[str, Optional[int]]:
+        if not self.has_proc:
+            # Without /proc only the lifetime peak is available, and no I/O counters
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return {'peak_rss': peak * (1 if sys.platform == 'darwin' else 1024),
+                    'read_bytes': None, 'written_bytes': None}
+        io = self._proc_io()
+        return {
+            'peak_rss': self._peak_rss(),
+            'read_bytes': io['rchar'] - self._io['rchar'],
+            'written_bytes': io['wchar'] - self._io['wchar'],
+        }
+
+
+def measure(operation: Callable[[], object], repeat: int, probe: ResourceProbe,
+            cleanup: Callable[[], None] = None, loops: int = 1) -> Dict:
+    """بهترین زمان از چند اجرا، بیشترین پیک حافظه و I/O آخرین اجرا"""
+    best = None
+    result = {}
+    for _ in range(repeat):
+        probe.start()
+        started = time.perf_counter()
+        for _ in range(loops):
+            outcome = operation()
+        elapsed = (time.perf_counter() - started) / loops
+        usage = probe.stop()
+        if cleanup:
+            cleanup()
+        if outcome is False:
+            raise RuntimeError("operation reported failure")
+        best = elapsed if best is None else min(best, elapsed)
+        result = {**usage, 'peak_rss': max(usage['peak_rss'], result.get('peak_rss', 0))}
+    result['seconds'] = best
+    return result
+
+
+def run_suite(fixtures_dir: str, formats, size_names, repeat: int = 3, report=print) -> Dict[str, Dict]:
+    """اجرای تمام حالت‌ها؛ کلید هر نتیجه: عملیات/فرمت/حجم[/کاور]"""
+    editor = AudioEditor()
+    probe = ResourceProbe()
+    results = {}
+    work_dir = os.path.join(fixtures_dir, 'work')
+    os.makedirs(work_dir, exist_ok=True)
+
+    def record(key, operation, cleanup=None, loops=1):
+        try:
+            results[key] = measure(operation, repeat, probe, cleanup, loops)
+            report(format_result(key, results[key]))
+        except Exception as e:
+            report(f"{key:<40} failed: {e}")
+
+    record('generate_filename', lambda: editor.generate_filename(EDIT_TAGS), loops=20000)
+    covers = {side: build_cover(fixtures_dir, side) for side in COVER_SIDES}
+
+    for fmt in formats:
+        extension = FORMATS[fmt][0]
+        output = os.path.join(work_dir, f"output{extension}")
+
+        def remove_output():
+            if os.path.exists(output):
+                os.remove(output)
+
+        for size_name in size_names:
+            source = build_fixture(fixtures_dir, fmt, size_name)
+            record(f"get_metadata/{fmt}/{size_name}", lambda: editor.get_metadata(source) or False)
+            record(f"update_metadata/{fmt}/{size_name}",
+                   lambda: editor.update_metadata(source, EDIT_TAGS, output), remove_output)
+            if fmt == 'ogg':
+                # AudioEditor has no cover writer for Ogg Vorbis
+                continue
+            for side, cover in covers.items():
+                record(f"add_cover_art/{fmt}/{size_name}/{side}px",
+                       lambda: editor.add_cover_art(source, cover, output), remove_output)
+    return results
+
+
+def _mb(value: Optional[int]) -> str:
+    return '-' if value is None else f"{value / (1024 * 1024):.1f}"
+
+
+def format_result(key: str, result: Dict, baseline: Dict = None) -> str:
+    line = (f"{key:<40} {result['seconds'] * 1000:10.3f} ms  peak {_mb(result['peak_rss']):>7} MB  "
+            f"read {_mb(result['read_bytes']):>8} MB  written {_mb(result['written_bytes']):>8} MB")
+    if baseline:
+        line += f"  ({(result['seconds'] / baseline['seconds'] - 1) * 100:+.0f}% time)"
+    return line
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float = 0.25,
+            min_seconds: float = 0.002, io_tolerance: float = 0.05, rss_slack: int = 8 * 1024 * 1024):
+    """فهرست افت‌ها نسبت به baseline
+
+    Time must be both `tolerance` slower and `min_seconds` slower, so timer noise on
+    microsecond operations is not a regression. I/O volume is nearly deterministic and gets a
+    tighter tolerance; peak RSS gets a fixed slack for allocator noise.
+    """
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if (current['seconds'] > base['seconds'] * (1 + tolerance)
+                and current['seconds'] - base['seconds'] > min_seconds):
+            regressions.append(f"{key}: {base['seconds'] * 1000:.3f} ms -> {current['seconds'] * 1000:.3f} ms")
+        for metric, allowed in (('peak_rss', lambda b: b * (1 + tolerance) + rss_slack),
+                                ('read_bytes', lambda b: b * (1 + io_tolerance) + 4096),
+                                ('written_bytes', lambda b: b * (1 + io_tolerance) + 4096)):
+            if current.get(metric) is None or base.get(metric) is None:
+                continue
+            if current[metric] > allowed(base[metric]):
+                regressions.append(f"{key}: {metric} {_mb(base[metric])} MB -> {_mb(current[metric])} MB")
+    return regressions
+
+
+def machine() -> Dict:
+    """مشخصات ماشینی که نتایج روی آن اندازه‌گیری شده‌اند (کنار baseline ذخیره می‌شود)"""
+    return {
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES),
+                        help=f"comma separated, from {', '.join(SIZES)}")
+    parser.add_argument('--formats', default=','.join(FORMATS), help=f"comma separated, from {', '.join(FORMATS)}")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--fixtures', default=os.path.join(tempfile.gettempdir(), 'musicbot-benchmark'),
+                        help="directory for the generated (sparse) fixtures, reused between runs")
+    parser.add_argument('--baseline', default='benchmark_baseline.json')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--save-baseline', action='store_true', help="store this run as the new baseline")
+    mode.add_argument('--no-compare', action='store_true', help="only print the results")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    sizes = [name for name in args.sizes.split(',') if name]
+    formats = [name for name in args.formats.split(',') if name]
+    unknown = [name for name in sizes if name not in SIZES] + [name for name in formats if name not in FORMATS]
+    if unknown:
+        parser.error(f"unknown size or format: {', '.join(unknown)}")
+
+    # A comparison run without a baseline could never fail; say so before spending minutes on the suite
+    baseline = None
+    if not (args.save_baseline or args.no_compare):
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save-baseline to create one "
+                  f"or --no-compare to only measure", file=sys.stderr)
+            return 2
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"Comparing against {args.baseline}, measured on {baseline['machine']}")
+
+    # Failures are reported per case; keep the editor's own error log out of the table
+    logging.basicConfig(level=logging.CRITICAL)
+    os.makedirs(args.fixtures, exist_ok=True)
+    results = run_suite(args.fixtures, formats, sizes, args.repeat)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'machine': machine(), 'results': results}, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+    if baseline is None:
+        return 0
+
+    regressions = compare(results, baseline['results'], args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) against {args.baseline}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"\n✅ No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
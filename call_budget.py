@@ -0,0 +1,53 @@
+import time
+from typing import Dict, Tuple
+
+# Buckets that have been idle long enough to be full again are forgotten past this many chats
+MAX_TRACKED_CHATS = 10000
+
+
+class CallBudget:
+    """بودجه درخواست‌های خروجی هر چت (سطل توکن)
+
+    Essential calls (menus, results) are always made and only recorded with `spend`.
+    Optional ones (progress edits, interim status text) ask `allow` first and are skipped
+    while the chat is over budget.
+    """
+
+    def __init__(self, per_minute: float = 20, burst: float = None, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.burst = burst if burst is not None else max(per_minute / 4, 1)
+        self.clock = clock
+        self._buckets: Dict[int, Tuple[float, float]] = {}   # chat id -> (tokens, last update)
+        self.calls: Dict[int, int] = {}
+        self.skipped = 0
+
+    def _tokens(self, chat_id: int) -> float:
+        now = self.clock()
+        tokens, updated = self._buckets.get(chat_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        self._buckets[chat_id] = (tokens, now)
+        return tokens
+
+    def spend(self, chat_id: int, cost: float = 1):
+        """ثبت یک درخواست ضروری (ممکن است بودجه را منفی کند)"""
+        tokens = self._tokens(chat_id)
+        self._buckets[chat_id] = (tokens - cost, self._buckets[chat_id][1])
+        self.calls[chat_id] = self.calls.get(chat_id, 0) + 1
+        if len(self._buckets) > MAX_TRACKED_CHATS:
+            self._prune()
+
+    def allow(self, chat_id: int, cost: float = 1) -> bool:
+        """اجازه برای یک درخواست اختیاری؛ در صورت اجازه هزینه آن کسر می‌شود"""
+        if self._tokens(chat_id) < cost:
+            self.skipped += 1
+            return False
+        self.spend(chat_id, cost)
+        return True
+
+    def _prune(self):
+        """حذف چت‌هایی که سطلشان دوباره پر شده است"""
+        now = self.clock()
+        for chat_id, (tokens, updated) in list(self._buckets.items()):
+            if tokens + (now - updated) * self.rate >= self.burst:
+                del self._buckets[chat_id]
+                self.calls.pop(chat_id, None)
@@ -26,10 +26,77 @@ class Config:
     # Directory settings
     TEMP_DIR = os.getenv('TEMP_DIR', 'temp')
     OUTPUT_DIR = os.getenv('OUTPUT_DIR', 'output')
+    CACHE_DIR = os.getenv('CACHE_DIR', 'cache')
+    # Disk space for cached waveform/spectrogram images; least recently used ones are deleted past it
+    THUMBNAIL_CACHE_SIZE = int(os.getenv('THUMBNAIL_CACHE_MB', 64)) * 1024 * 1024
+    
+    # Acoustic fingerprints of saved tracks, used to recognize re-uploads
+    FINGERPRINT_DB = os.getenv('FINGERPRINT_DB', os.path.join(CACHE_DIR, 'fingerprints.db'))
+    
+    # Downloads and saves in progress, resumed from their last checkpoint after a restart
+    JOB_DB = os.getenv('JOB_DB', os.path.join(CACHE_DIR, 'jobs.db'))
     
     # File settings
     MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', 2000)) * 1024 * 1024  # Convert MB to bytes
     
+    # Seconds without edits before the output is prepared in the background
+    RENDER_DEBOUNCE = float(os.getenv('RENDER_DEBOUNCE', 1.5))
+    # Only files up to this size are prepared in the background; 0 turns background renders off
+    RENDER_MAX_SIZE = int(os.getenv('RENDER_MAX_SIZE_MB', 50)) * 1024 * 1024
+    
+    # Keep one menu message per session and edit it in place instead of sending new ones
+    SINGLE_MESSAGE_UI = os.getenv('SINGLE_MESSAGE_UI', 'true').lower() in ('1', 'true', 'yes')
+    
+    # Outgoing requests per chat per minute; optional updates are skipped above it
+    CHAT_CALL_BUDGET = int(os.getenv('CHAT_CALL_BUDGET', 20))
+    
+    # Repeated taps on the same button within this many seconds are ignored
+    DUPLICATE_CLICK_WINDOW = float(os.getenv('DUPLICATE_CLICK_WINDOW', 2.0))
+    
+    # Local Prometheus endpoint (http://METRICS_HOST:METRICS_PORT/metrics); port 0 disables it
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', 9108))
+    # Final metrics are written here on shutdown, e.g. for node_exporter's textfile collector; empty = off
+    METRICS_TEXTFILE = os.getenv('METRICS_TEXTFILE', '')
+    
+    # Request traces (JSON lines): slow or failed ones are always kept, others sampled
+    TRACE_FILE = os.getenv('TRACE_FILE', os.path.join('logs', 'traces.jsonl'))
+    TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0.01))
+    TRACE_SLOW_SECONDS = float(os.getenv('TRACE_SLOW_SECONDS', 10))
+    
+    # Space reserved for temporary files (MB, shown in /stats; 0 = no quota) and how often its usage is measured
+    TEMP_QUOTA = int(os.getenv('TEMP_QUOTA_MB', 10240)) * 1024 * 1024
+    DISK_USAGE_INTERVAL = float(os.getenv('DISK_USAGE_INTERVAL', 30))
+    
+    # Autocomplete values entered since the last save are written this often (seconds; 0 = only on shutdown)
+    AUTOCOMPLETE_SAVE_INTERVAL = float(os.getenv('AUTOCOMPLETE_SAVE_INTERVAL', 60))
+    
+    # Event loop lag (seconds) at which the blocking handler's stack is logged; 0 disables the watchdog
+    LOOP_LAG_THRESHOLD = float(os.getenv('LOOP_LAG_THRESHOLD', 0.25))
+    
+    # Memory (MB) that tags and covers parsed by mutagen may hold at once; 0 = unlimited
+    MEMORY_BUDGET = int(os.getenv('MEMORY_BUDGET_MB', 256)) * 1024 * 1024
+    
+    # Idle editing sessions are closed and their files removed after this many seconds; 0 = never
+    SESSION_TTL = float(os.getenv('SESSION_TTL', 3600))
+    
+    # On SIGTERM, seconds to let running uploads and tag writes finish; the rest resume after the restart
+    SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', 60))
+    
+    # Number of files uploaded to Telegram at the same time
+    MAX_PARALLEL_UPLOADS = int(os.getenv('MAX_PARALLEL_UPLOADS', 4))
+    
+    # Format conversion (ffmpeg)
+    FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+    MAX_ENCODERS = int(os.getenv('MAX_ENCODERS', os.cpu_count() or 1))
+    
+    # Online metadata suggestions (disabled when no endpoint is set)
+    METADATA_API_URL = os.getenv('METADATA_API_URL', '')
+    METADATA_CACHE_TTL = int(os.getenv('METADATA_CACHE_TTL', 7 * 24)) * 3600  # Convert hours to seconds
+    
+    # Windows quieter than this (dBFS RMS) count as silence when trimming
+    SILENCE_THRESHOLD_DB = float(os.getenv('SILENCE_THRESHOLD_DB', -60))
+    
     # Supported audio formats
     SUPPORTED_AUDIO_FORMATS = [
         '.mp3', '.flac', '.wav', '.m4a', '.ogg', '.aac', '.wma'
@@ -45,6 +112,7 @@ class Config:
         """Create necessary directories if they don't exist"""
         os.makedirs(cls.TEMP_DIR, exist_ok=True)
         os.makedirs(cls.OUTPUT_DIR, exist_ok=True)
+        os.makedirs(cls.CACHE_DIR, exist_ok=True)
     
     @classmethod
     def validate_config(cls):
@@ -0,0 +1,127 @@
+import re
+import shlex
+from typing import Dict, List, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+# CUE sheets count time in CD frames: 75 per second
+CUE_FRAMES_PER_SECOND = 75
+
+_CUE_TIME = re.compile(r'^(\d+):(\d{1,2}):(\d{1,2})$')
+_TIMESTAMP = re.compile(r'(?<![\d:])(?:(\d{1,2}):)?(\d{1,3}):(\d{2})(?:\.(\d{1,3}))?(?![\d:])')
+_TRACK_PREFIX = re.compile(r'^\s*(?:\d{1,3}[.)]|\d{1,3}\s*[-–]|#\d+)\s*')
+_SEPARATORS = ' \t-–—|:.)]['
+
+
+def parse_cue_time(value: str) -> float:
+    """تبدیل زمان mm:ss:ff شیت CUE به ثانیه"""
+    match = _CUE_TIME.match(value.strip())
+    if not match:
+        raise ValueError(f"Invalid CUE time: {value}")
+    minutes, seconds, frames = (int(part) for part in match.groups())
+    return minutes * 60 + seconds + frames / CUE_FRAMES_PER_SECOND
+
+
+def parse_cue(text: str) -> List[Dict[str, Any]]:
+    """تجزیه شیت CUE به لیست ترک‌ها"""
+    album: Dict[str, str] = {}
+    tracks: List[Dict[str, Any]] = []
+    current = None
+
+    for line in text.lstrip('﻿').splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            parts = shlex.split(line, posix=True)
+        except ValueError:
+            parts = line.split()
+        if not parts:
+            continue
+
+        command = parts[0].upper()
+        args = parts[1:]
+        target = current if current is not None else album
+
+        if command == 'TRACK' and args:
+            current = {'track': str(int(args[0])) if args[0].isdigit() else args[0]}
+            tracks.append(current)
+        elif command == 'TITLE' and args:
+            target['title' if current is not None else 'album'] = args[0]
+        elif command == 'PERFORMER' and args:
+            target['artist' if current is not None else 'albumartist'] = args[0]
+        elif command == 'INDEX' and len(args) >= 2 and current is not None:
+            # INDEX 01 marks the audible start, INDEX 00 the pregap
+            if int(args[0]) == 1:
+                current['start'] = parse_cue_time(args[1])
+        elif command == 'REM' and len(args) >= 2:
+            key = args[0].upper()
+            if key == 'GENRE':
+                target['genre'] = args[1]
+            elif key == 'DATE':
+                target['year'] = args[1]
+
+    result = []
+    for track in tracks:
+        if 'start' not in track:
+            logger.error(f"CUE track {track.get('track')} has no INDEX 01")
+            continue
+        merged = dict(album)
+        merged.update(track)
+        merged.setdefault('artist', album.get('albumartist', ''))
+        result.append(merged)
+
+    return _finalize(result)
+
+
+def parse_timestamps(text: str) -> List[Dict[str, Any]]:
+    """تجزیه لیست زمان‌بندی متنی (مثلاً 01:02:03 Artist - Title)"""
+    tracks = []
+
+    for line in text.splitlines():
+        match = _TIMESTAMP.search(line)
+        if not match:
+            continue
+
+        hours, minutes, seconds, fraction = match.groups()
+        start = int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)
+        if fraction:
+            start += int(fraction) / (10 ** len(fraction))
+
+        # The label is whatever remains around the timestamp
+        before = _TRACK_PREFIX.sub('', line[:match.start()]).strip(_SEPARATORS)
+        after = line[match.end():].strip(_SEPARATORS)
+        label = after or before
+
+        track: Dict[str, Any] = {'start': float(start)}
+        if ' - ' in label:
+            artist, title = label.split(' - ', 1)
+            track['artist'] = artist.strip()
+            track['title'] = title.strip()
+        elif label:
+            track['title'] = label
+        tracks.append(track)
+
+    tracks.sort(key=lambda item: item['start'])
+    for number, track in enumerate(tracks, start=1):
+        track['track'] = str(number)
+
+    return _finalize(tracks)
+
+
+def parse_track_list(text: str) -> List[Dict[str, Any]]:
+    """تشخیص خودکار شیت CUE یا لیست زمان‌بندی و تجزیه آن"""
+    if re.search(r'^\s*TRACK\s+\d+', text, re.IGNORECASE | re.MULTILINE) and \
+            re.search(r'^\s*INDEX\s+01', text, re.IGNORECASE | re.MULTILINE):
+        return parse_cue(text)
+    return parse_timestamps(text)
+
+
+def _finalize(tracks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """حذف ترک‌های تکراری و محاسبه پایان هر ترک از شروع ترک بعدی"""
+    tracks = [track for index, track in enumerate(tracks)
+              if index == 0 or track['start'] > tracks[index - 1]['start']]
+    for index, track in enumerate(tracks):
+        track['end'] = tracks[index + 1]['start'] if index + 1 < len(tracks) else None
+    return tracks
@@ -0,0 +1,8 @@
+class FakeClock:
+    """ساعت قابل کنترل برای تست (به جای time.monotonic)"""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
@@ -0,0 +1,205 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from pcm_reader import PcmReader
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fingerprints are taken from a low-rate mono decode of the opening seconds
+SAMPLE_RATE = 11025
+FFT_SIZE = 1024
+HOP_SIZE = 512
+MAX_SECONDS = 120
+
+# Peak picking neighbourhood (frames, bins) and minimum level above the frame mean
+PEAK_TIME = 7
+PEAK_FREQ = 12
+PEAK_MARGIN_DB = 10.0
+
+# Every peak is paired with the next few peaks up to MAX_DELTA frames later
+FAN_OUT = 6
+MAX_DELTA = 63
+
+# Matches need this many hashes agreeing on one time offset
+MIN_SCORE = 20
+
+
+def _max_filter(values: np.ndarray, size: int, axis: int) -> np.ndarray:
+    """فیلتر بیشینه یک‌بعدی در امتداد یک محور (برای تشخیص قله‌ها)"""
+    pad = [(0, 0)] * values.ndim
+    pad[axis] = (size, size)
+    padded = np.pad(values, pad, mode='constant', constant_values=-np.inf)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * size + 1, axis=axis)
+    return windows.max(axis=-1)
+
+
+def spectral_peaks(file_path: str, ffmpeg_binary: str = 'ffmpeg') -> Tuple[np.ndarray, np.ndarray]:
+    """قله‌های طیفی (شماره فریم، شماره بین) از ابتدای فایل"""
+    reader = PcmReader(file_path, sample_rate=SAMPLE_RATE, mono=True, ffmpeg_binary=ffmpeg_binary)
+    window = np.hanning(FFT_SIZE).astype(np.float32)
+    limit = MAX_SECONDS * SAMPLE_RATE
+
+    spectra = []
+    pending = np.zeros(0, dtype=np.float32)
+    consumed = 0
+
+    for block in reader.blocks(SAMPLE_RATE * 10):
+        pending = np.concatenate([pending, block[:, 0]])
+        consumed += len(block)
+        frames = (len(pending) - FFT_SIZE) // HOP_SIZE + 1 if len(pending) >= FFT_SIZE else 0
+        if frames:
+            windows = np.lib.stride_tricks.sliding_window_view(pending, FFT_SIZE)[::HOP_SIZE][:frames]
+            magnitude = np.abs(np.fft.rfft(windows * window, axis=1)).astype(np.float32)
+            spectra.append(20 * np.log10(magnitude + 1e-6))
+            pending = pending[frames * HOP_SIZE:]
+        if consumed >= limit:
+            break
+
+    if not spectra:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    levels = np.concatenate(spectra)
+    # The top bins carry little besides encoder artifacts
+    levels = levels[:, :FFT_SIZE * 5 // 12]
+
+    neighbourhood = _max_filter(_max_filter(levels, PEAK_TIME, 0), PEAK_FREQ, 1)
+    floor = levels.mean(axis=1, keepdims=True) + PEAK_MARGIN_DB
+    frames, bins = np.nonzero((levels == neighbourhood) & (levels > floor))
+    return frames, bins
+
+
+def fingerprint(file_path: str, ffmpeg_binary: str = 'ffmpeg') -> Tuple[np.ndarray, np.ndarray]:
+    """ساخت هش‌های جفت قله‌ها (فرکانس اول، فرکانس دوم، فاصله زمانی) و زمان هر هش"""
+    frames, bins = spectral_peaks(file_path, ffmpeg_binary)
+    order = np.lexsort((bins, frames))
+    frames, bins = frames[order], bins[order]
+
+    hashes = []
+    offsets = []
+    for step in range(1, FAN_OUT + 1):
+        if len(frames) <= step:
+            break
+        delta = frames[step:] - frames[:-step]
+        valid = (delta > 0) & (delta <= MAX_DELTA)
+        # f1 (9 bits) | f2 (9 bits) | dt (6 bits)
+        hashes.append((bins[:-step][valid] << 15) | (bins[step:][valid] << 6) | delta[valid])
+        offsets.append(frames[:-step][valid])
+
+    if not hashes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(hashes).astype(np.int64), np.concatenate(offsets).astype(np.int64)
+
+
+class FingerprintIndex:
+    """ایندکس معکوس اثرانگشت‌های صوتی روی SQLite"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS tracks (
+                id INTEGER PRIMARY KEY,
+                metadata TEXT NOT NULL,
+                hash_count INTEGER NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS hashes (
+                hash INTEGER NOT NULL,
+                track_id INTEGER NOT NULL,
+                offset INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS hashes_by_hash ON hashes (hash);
+        """)
+        self._connection.commit()
+
+    def match(self, hashes: np.ndarray, offsets: np.ndarray, min_score: int = MIN_SCORE) -> Optional[Dict[str, Any]]:
+        """یافتن نزدیک‌ترین ترک شناخته شده"""
+        if not len(hashes):
+            return None
+        try:
+            with self._lock:
+                cursor = self._connection.cursor()
+                cursor.execute("CREATE TEMP TABLE IF NOT EXISTS query (hash INTEGER, offset INTEGER)")
+                cursor.execute("DELETE FROM query")
+                cursor.executemany("INSERT INTO query VALUES (?, ?)",
+                                   zip(hashes.tolist(), offsets.tolist()))
+                # Hashes of the same recording agree on one time shift
+                row = cursor.execute("""
+                    SELECT h.track_id, COUNT(*) AS score
+                    FROM query q JOIN hashes h ON h.hash = q.hash
+                    GROUP BY h.track_id, h.offset - q.offset
+                    ORDER BY score DESC
+                    LIMIT 1
+                """).fetchone()
+                if not row or row[1] < min_score:
+                    return None
+                track_id, score = row
+                metadata, hash_count = cursor.execute(
+                    "SELECT metadata, hash_count FROM tracks WHERE id = ?", (track_id,)
+                ).fetchone()
+
+            return {
+                'track_id': track_id,
+                'metadata': json.loads(metadata),
+                'score': score,
+                'confidence': score / max(min(len(hashes), hash_count), 1),
+            }
+
+        except Exception as e:
+            logger.error(f"Error matching fingerprint: {e}")
+            return None
+
+    def add(self, hashes: np.ndarray, offsets: np.ndarray, metadata: Dict[str, Any]) -> Optional[int]:
+        """افزودن ترک جدید به ایندکس"""
+        try:
+            with self._lock, self._connection:
+                cursor = self._connection.execute(
+                    "INSERT INTO tracks (metadata, hash_count, updated) VALUES (?, ?, ?)",
+                    (json.dumps(metadata, ensure_ascii=False), len(hashes), time.time())
+                )
+                track_id = cursor.lastrowid
+                self._connection.executemany(
+                    "INSERT INTO hashes VALUES (?, ?, ?)",
+                    zip(hashes.tolist(), [track_id] * len(hashes), offsets.tolist())
+                )
+            return track_id
+
+        except Exception as e:
+            logger.error(f"Error adding fingerprint: {e}")
+            return None
+
+    def update_metadata(self, track_id: int, metadata: Dict[str, Any]) -> bool:
+        """جایگزینی متادیتای یک ترک شناخته شده"""
+        try:
+            with self._lock, self._connection:
+                self._connection.execute(
+                    "UPDATE tracks SET metadata = ?, updated = ? WHERE id = ?",
+                    (json.dumps(metadata, ensure_ascii=False), time.time(), track_id)
+                )
+            return True
+
+        except Exception as e:
+            logger.error(f"Error updating fingerprint metadata: {e}")
+            return False
+
+    def catalog(self) -> List[Dict[str, Any]]:
+        """متادیتای همه ترک‌های شناخته شده"""
+        with self._lock:
+            rows = self._connection.execute("SELECT metadata FROM tracks").fetchall()
+        return [json.loads(metadata) for (metadata,) in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,141 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Jobs that were resumed this many times without finishing are given up on (they may be what crashes the bot)
+MAX_ATTEMPTS = 3
+
+
+class JobQueue:
+    """صف پایدار کارهای در جریان روی SQLite برای ادامه آن‌ها پس از راه‌اندازی مجدد
+
+    One row per piece of work a user is waiting for (receiving a file, saving an edit), with the
+    stage it reached and the checkpoint data needed to pick it up again: the message to download
+    from, files already on disk, the tags to write. Rows are deleted when the job finishes.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        # Checkpoints are small commits made from the event loop; WAL keeps them off fsync
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                chat_id INTEGER NOT NULL,
+                stage TEXT NOT NULL,
+                data TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+        """)
+        self._connection.commit()
+
+    def add(self, kind: str, user_id: int, chat_id: int, stage: str, **data) -> Optional[int]:
+        """ثبت کار جدید در مرحله اول آن"""
+        try:
+            now = time.time()
+            with self._lock, self._connection:
+                cursor = self._connection.execute(
+                    "INSERT INTO jobs (kind, user_id, chat_id, stage, data, created, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (kind, user_id, chat_id, stage, json.dumps(data, ensure_ascii=False), now, now)
+                )
+            return cursor.lastrowid
+
+        except Exception as e:
+            logger.error(f"Error adding {kind} job: {e}")
+            return None
+
+    def checkpoint(self, job_id: Optional[int], stage: str, **data) -> bool:
+        """ثبت رسیدن کار به مرحله بعد؛ data به داده‌های قبلی اضافه می‌شود"""
+        if job_id is None:
+            return False
+        try:
+            with self._lock, self._connection:
+                row = self._connection.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                if row is None:
+                    return False
+                merged = {**json.loads(row[0]), **data}
+                self._connection.execute(
+                    "UPDATE jobs SET stage = ?, data = ?, updated = ? WHERE id = ?",
+                    (stage, json.dumps(merged, ensure_ascii=False), time.time(), job_id)
+                )
+            return True
+
+        except Exception as e:
+            logger.error(f"Error checkpointing job {job_id}: {e}")
+            return False
+
+    def finish(self, job_id: Optional[int]) -> bool:
+        """حذف کار تمام شده (موفق یا با خطای گزارش شده به کاربر)"""
+        if job_id is None:
+            return False
+        try:
+            with self._lock, self._connection:
+                self._connection.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            return True
+
+        except Exception as e:
+            logger.error(f"Error finishing job {job_id}: {e}")
+            return False
+
+    def claim_pending(self, max_attempts: int = MAX_ATTEMPTS) -> List[Dict[str, Any]]:
+        """کارهای نیمه‌تمام برای ادامه، به ترتیب ثبت؛ کارهایی که بارها ناموفق بوده‌اند کنار گذاشته می‌شوند"""
+        try:
+            with self._lock, self._connection:
+                given_up = self._connection.execute(
+                    "SELECT id, kind, user_id, stage FROM jobs WHERE attempts >= ?", (max_attempts,)
+                ).fetchall()
+                for job_id, kind, user_id, stage in given_up:
+                    logger.error(f"Giving up {kind} job {job_id} of {user_id} at stage {stage} "
+                                 f"after {max_attempts} attempts")
+                self._connection.execute("DELETE FROM jobs WHERE attempts >= ?", (max_attempts,))
+                self._connection.execute("UPDATE jobs SET attempts = attempts + 1")
+                rows = self._connection.execute(
+                    "SELECT id, kind, user_id, chat_id, stage, data, attempts FROM jobs ORDER BY id"
+                ).fetchall()
+
+        except Exception as e:
+            logger.error(f"Error reading pending jobs: {e}")
+            return []
+
+        return [
+            {'id': job_id, 'kind': kind, 'user_id': user_id, 'chat_id': chat_id, 'stage': stage,
+             'data': json.loads(data), 'attempts': attempts}
+            for job_id, kind, user_id, chat_id, stage, data, attempts in rows
+        ]
+
+    def files(self) -> Set[str]:
+        """مسیر فایل‌هایی که کارهای نیمه‌تمام برای ادامه به آن‌ها نیاز دارند"""
+        with self._lock:
+            rows = self._connection.execute("SELECT data FROM jobs").fetchall()
+        paths = set()
+        for (data,) in rows:
+            data = json.loads(data)
+            paths.update(os.path.abspath(data[key]) for key in ('temp_file', 'output_path') if data.get(key))
+        return paths
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            try:
+                # Fold the WAL back into the database file, so it alone carries the queue
+                self._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error as e:
+                logger.error(f"Error checkpointing job queue: {e}")
+            self._connection.close()
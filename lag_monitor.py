@@ -0,0 +1,153 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Loop lag is milliseconds when healthy; a blocking tag write or copy shows up as whole seconds
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUANTILES = (0.5, 0.9, 0.99)
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _is_project_frame(frame: traceback.FrameSummary) -> bool:
+    filename = os.path.abspath(frame.filename)
+    return (filename.startswith(PROJECT_DIR + os.sep) and 'site-packages' not in filename
+            and filename != os.path.abspath(__file__))
+
+
+def blocking_frames(stack: List[traceback.FrameSummary]):
+    """(handler, خط مسدودکننده) از stack رشته event loop
+
+    Frames above asyncio's Handle._run belong to the callback the loop is running; the first
+    project frame there is the handler and the last one is the line that blocked.
+    """
+    start = 0
+    for index, frame in enumerate(stack):
+        if frame.filename.endswith(os.path.join('asyncio', 'events.py')) and frame.name == '_run':
+            start = index + 1
+    own = [frame for frame in stack[start:] if _is_project_frame(frame)]
+    if not own:
+        return None, stack[-1] if stack else None
+    return own[0], own[-1]
+
+
+class LagMonitor:
+    """اندازه‌گیری تأخیر زمان‌بندی event loop و ثبت stack هنگام مسدود شدن آن
+
+    A task on the loop sleeps for `interval` and records how late it woke up. A helper thread
+    watches the task's deadline; once the loop is `threshold` seconds late it samples the loop
+    thread's stack, which is still inside the blocking call at that moment.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25, history: int = 1000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.interval = interval
+        self.threshold = threshold
+        self.clock = clock
+        self.samples = deque(maxlen=history)
+        self.stalls = deque(maxlen=50)
+        self.max_lag = 0.0
+        self._lag_histogram = None
+        self._stall_counter = None
+        self._deadline = None
+        self._loop_thread = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def register(self, metrics):
+        """ثبت هیستوگرام، صدک‌ها و تعداد توقف‌ها در متریک‌ها"""
+        self._lag_histogram = metrics.histogram(
+            'musicbot_event_loop_lag_seconds', 'How late the event loop ran a scheduled wakeup', LAG_BUCKETS)
+        self._stall_counter = metrics.counter(
+            'musicbot_event_loop_stalls_total', 'Wakeups later than the blocking threshold')
+        metrics.labelled_gauge(
+            'musicbot_event_loop_lag_quantile_seconds', 'Event loop lag over recent wakeups',
+            lambda: {(('quantile', str(q)),): self.percentile(q) for q in QUANTILES})
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def start(self):
+        """شروع اندازه‌گیری روی loop جاری و رشته نگهبان"""
+        if self._task:
+            return
+        self._loop_thread = threading.get_ident()
+        self._stopped.clear()
+        self._deadline = self.clock() + self.interval
+        self._task = asyncio.get_running_loop().create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-lag-watchdog', daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _measure(self):
+        while True:
+            self._deadline = self.clock() + self.interval
+            await asyncio.sleep(self.interval)
+            self._record(max(self.clock() - self._deadline, 0.0))
+
+    def _record(self, lag: float):
+        self.samples.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+        if self._lag_histogram:
+            self._lag_histogram.observe(lag)
+        if lag >= self.threshold:
+            if self._stall_counter:
+                self._stall_counter.inc()
+            logger.warning(f"Event loop was blocked for {lag:.3f}s")
+
+    def _watch(self):
+        reported = None
+        # Poll faster than the threshold so the sample lands inside the blocking call
+        poll = min(self.interval, self.threshold / 2)
+        while not self._stopped.wait(poll):
+            deadline = self._deadline
+            late = self.clock() - deadline
+            if late >= self.threshold and deadline != reported:
+                reported = deadline
+                self._sample_stack(late)
+
+    def _sample_stack(self, late: float):
+        try:
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                return
+            stack = traceback.extract_stack(frame)
+            del frame
+            handler, line = blocking_frames(stack)
+            stall: Dict = {
+                'late': late,
+                'handler': handler.name if handler else None,
+                'location': f"{os.path.basename(line.filename)}:{line.lineno} in {line.name}" if line else None,
+                'stack': ''.join(traceback.format_list(stack[-12:])),
+            }
+            self.stalls.append(stall)
+            logger.warning(
+                f"Event loop blocked for {late:.3f}s+ in handler {stall['handler']} "
+                f"at {stall['location']}\n{stall['stack']}"
+            )
+        except Exception as e:
+            logger.error(f"Error sampling event loop stack: {e}")
@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+تست بار آفلاین: اجرای handlerهای MusicBot با کلاینت شبیه‌سازی شده تلگرام و هزاران کاربر همزمان
+
+Usage: python load_test.py [--users 1000] [--think 0.5] [--size 64k] [--latency 0.05]
+                           [--record stream.jsonl | --replay stream.jsonl] [--report report.json]
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+# config.py refuses to load without credentials; the simulated client never uses them
+for _name, _value in (('BOT_TOKEN', 'load-test'), ('API_ID', '1'), ('API_HASH', 'load-test')):
+    os.environ.setdefault(_name, _value)
+
+from telethon import events
+from telethon.errors import MessageNotModifiedError
+from telethon.tl.types import DocumentAttributeFilename
+from benchmark_audio_editor import FORMATS, SIZES, ResourceProbe, build_cover, build_fixture
+from config import Config
+from music_bot import MusicBot
+from session_state import MAIN_MENU
+from stats import RollingWindow
+
+# Realistic sessions: what users do after sending a file, weighted by how often they do it
+FLOWS = {
+    'retitle': [
+        ('document', None), ('callback', 'edit_metadata'), ('callback', 'edit_title'), ('text', 'Title {user}'),
+        ('callback', 'edit_metadata'), ('callback', 'edit_artist'), ('text', 'Artist {user}'),
+        ('callback', 'save_download'),
+    ],
+    'cover': [
+        ('document', None), ('callback', 'edit_cover'), ('callback', 'cover_add'), ('photo', None),
+        ('callback', 'save_download'),
+    ],
+    'rename': [
+        ('document', None), ('callback', 'change_filename'), ('text', '{{artist}} - {{title}} {user}'),
+        ('callback', 'save_download'),
+    ],
+    'browse_cancel': [
+        ('command', '/start'), ('document', None), ('callback', 'edit_metadata'), ('callback', 'back_main'),
+        ('callback', 'cancel'),
+    ],
+}
+FLOW_WEIGHTS = {'retitle': 0.5, 'cover': 0.2, 'rename': 0.2, 'browse_cancel': 0.1}
+
+MB = 1024 * 1024
+
+
+class FakeInputFile:
+    """فایل آپلود شده (معادل InputFile تلگرام)"""
+
+    def __init__(self, size: int, name: str):
+        self.size = size
+        self.name = name
+
+
+class FakeMedia:
+    """document یا photo ورودی که محتوای آن از یک فایل محلی خوانده می‌شود"""
+
+    def __init__(self, media_id: int, path: str, file_name: str = None):
+        self.id = media_id
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.attributes = [DocumentAttributeFilename(file_name)] if file_name else []
+
+
+class FakeMessage:
+    """پیام ارسال شده توسط ربات"""
+
+    def __init__(self, client: 'FakeClient', chat_id: int, message_id: int, text: str, buttons=None):
+        self.client = client
+        self.chat_id = chat_id
+        self.id = message_id
+        self.text = text
+        self.buttons = buttons
+
+    async def edit(self, text, buttons=None, **kwargs):
+        return await self.client.edit_message(self.chat_id, self.id, text, buttons=buttons)
+
+    async def delete(self):
+        await self.client.delete_messages(self.chat_id, [self.id])
+
+
+class FakeEvent:
+    """رویداد NewMessage یا CallbackQuery با همان فیلدهایی که MusicBot می‌خواند"""
+
+    def __init__(self, client: 'FakeClient', user_id: int, text: str = '', document: FakeMedia = None,
+                 photo: FakeMedia = None, data: bytes = None, message_id: int = None):
+        self.client = client
+        self.sender_id = user_id
+        self.chat_id = user_id
+        self.text = text
+        self.document = document
+        self.photo = photo
+        self.data = data
+        self.message_id = message_id
+        self.id = message_id
+
+    async def respond(self, text, buttons=None, **kwargs):
+        return await self.client.send_message(self.chat_id, text, buttons=buttons)
+
+    async def edit(self, text, buttons=None, **kwargs):
+        return await self.client.edit_message(self.chat_id, self.message_id, text, buttons=buttons)
+
+    async def answer(self, message=None, alert=False, **kwargs):
+        await self.client.api_call('answer_callback')
+        if alert:
+            self.client.alerts += 1
+
+
+class FakeClient:
+    """جایگزین TelegramClient با تأخیر و پهنای باند قابل تنظیم
+
+    Every API call costs `latency` seconds; transfers additionally take size / bandwidth and
+    report progress every `chunk_size` bytes, as Telethon does per uploaded or downloaded part.
+    """
+
+    def __init__(self, latency: float = 0.05, download_bandwidth: float = 10 * MB,
+                 upload_bandwidth: float = 5 * MB, chunk_size: int = 512 * 1024):
+        self.latency = latency
+        self.download_bandwidth = download_bandwidth
+        self.upload_bandwidth = upload_bandwidth
+        self.chunk_size = chunk_size
+        self.handlers: Dict[str, List] = defaultdict(list)
+        self.calls: Counter = Counter()
+        self.transferred: Counter = Counter()
+        self.messages: Dict[tuple, FakeMessage] = {}
+        self.received: Dict[tuple, FakeEvent] = {}     # (chat, message id) -> messages users sent
+        self.menus: Dict[int, int] = {}     # chat -> id of the last message with buttons
+        self.error_replies = 0
+        self.alerts = 0
+        self.files_sent = 0
+        self.connected = True
+        self._next_id = 1
+
+    def on(self, builder):
+        kind = 'callback' if builder is events.CallbackQuery else 'message'
+
+        def register(handler):
+            self.handlers[kind].append(handler)
+            return handler
+        return register
+
+    async def dispatch(self, kind: str, event: FakeEvent):
+        if event.document:
+            self.received[(event.chat_id, event.id)] = event
+        for handler in self.handlers[kind]:
+            await handler(event)
+
+    async def api_call(self, method: str):
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def _transfer(self, direction: str, size: int, bandwidth: float, progress_callback=None):
+        sent = 0
+        while sent < size:
+            part = min(self.chunk_size, size - sent)
+            await asyncio.sleep(part / bandwidth if bandwidth else 0)
+            sent += part
+            if progress_callback:
+                result = progress_callback(sent, size)
+                if asyncio.iscoroutine(result):
+                    await result
+        self.transferred[direction] += size
+
+    def _store(self, chat_id: int, text: str, buttons) -> FakeMessage:
+        message = FakeMessage(self, chat_id, self._next_id, text, buttons)
+        self._next_id += 1
+        self.messages[(chat_id, message.id)] = message
+        if buttons:
+            self.menus[chat_id] = message.id
+        if text and text.lstrip().startswith('❌'):
+            self.error_replies += 1
+        return message
+
+    async def send_message(self, chat_id, text, buttons=None, **kwargs):
+        await self.api_call('send_message')
+        return self._store(chat_id, text, buttons)
+
+    async def edit_message(self, chat_id, message_id, text, buttons=None, **kwargs):
+        await self.api_call('edit_message')
+        message = self.messages.get((chat_id, message_id))
+        if message is None:
+            raise ValueError(f"Message {message_id} not found in chat {chat_id}")
+        if message.text == text and message.buttons == buttons:
+            raise MessageNotModifiedError(request=None)
+        message.text, message.buttons = text, buttons
+        if buttons:
+            self.menus[chat_id] = message_id
+        if text and text.lstrip().startswith('❌'):
+            self.error_replies += 1
+        return message
+
+    async def delete_messages(self, chat_id, message_ids, **kwargs):
+        await self.api_call('delete_messages')
+        for message_id in message_ids:
+            self.messages.pop((chat_id, message_id), None)
+
+    async def download_media(self, media, file=None, progress_callback=None, **kwargs):
+        await self.api_call('download_media')
+        await self._transfer('download', media.size, self.download_bandwidth, progress_callback)
+        if file is bytes:
+            with open(media.path, 'rb') as f:
+                return f.read()
+        shutil.copyfile(media.path, file)
+        return file
+
+    async def upload_file(self, file, file_name=None, progress_callback=None, **kwargs):
+        await self.api_call('upload_file')
+        size = os.path.getsize(file) if isinstance(file, str) else len(file.getbuffer())
+        await self._transfer('upload', size, self.upload_bandwidth, progress_callback)
+        return FakeInputFile(size, file_name or os.path.basename(str(file)))
+
+    async def send_file(self, chat_id, file, caption='', progress_callback=None, **kwargs):
+        files = file if isinstance(file, list) else [file]
+        for item in files:
+            # Already uploaded handles are only referenced; paths and buffers are uploaded first
+            if not isinstance(item, FakeInputFile):
+                size = os.path.getsize(item) if isinstance(item, str) else len(item.getbuffer())
+                await self._transfer('upload', size, self.upload_bandwidth, progress_callback)
+        await self.api_call('send_file')
+        self.files_sent += len(files)
+        return self._store(chat_id, caption, None)
+
+    async def get_messages(self, chat_id, ids=None, **kwargs):
+        await self.api_call('get_messages')
+        event = self.received.get((chat_id, ids))
+        # Messages fetched again belong to this client, as after a restart
+        return FakeEvent(self, event.sender_id, document=event.document, message_id=event.id) if event else None
+
+    async def get_me(self):
+        return type('User', (), {'username': 'load_test_bot'})()
+
+    async def disconnect(self):
+        self.connected = False
+
+
+def load_test_config(workspace: str):
+    """تنظیمات ربات با پوشه‌های جداگانه تست بار (مسیرهای repo دست نمی‌خورند)"""
+    cache_dir = os.path.join(workspace, 'cache')
+    return type('LoadTestConfig', (Config,), {
+        'TEMP_DIR': os.path.join(workspace, 'temp'),
+        'OUTPUT_DIR': os.path.join(workspace, 'output'),
+        'CACHE_DIR': cache_dir,
+        'FINGERPRINT_DB': os.path.join(cache_dir, 'fingerprints.db'),
+        'JOB_DB': os.path.join(cache_dir, 'jobs.db'),
+        'METADATA_API_URL': '',
+        'TRACE_FILE': '',
+        'METRICS_PORT': 0,
+    })()
+
+
+def synthesize(users: int, seed: int = 1, think: float = 0.5, ramp: float = 10.0) -> List[Dict]:
+    """جریان قطعی به‌روزرسانی‌ها: هر کاربر یک جریان ویرایش با زمان فکر کردن نمایی
+
+    `delay` is the pause before an update, counted from the moment the bot finished handling
+    the same user's previous update (the user's arrival time for the first one).
+    """
+    rng = random.Random(seed)
+    names, weights = zip(*FLOW_WEIGHTS.items())
+    updates = []
+    for index in range(users):
+        user_id = 100000 + index
+        flow = rng.choices(names, weights)[0]
+        for step, (kind, payload) in enumerate(FLOWS[flow]):
+            delay = rng.uniform(0, ramp) if step == 0 else rng.expovariate(1 / think) if think else 0.0
+            update = {'user': user_id, 'flow': flow, 'delay': round(delay, 4), 'kind': kind}
+            if payload is not None:
+                update['data'] = payload.format(user=user_id)
+            updates.append(update)
+    return updates
+
+
+def write_stream(path: str, updates: List[Dict]):
+    with open(path, 'w', encoding='utf-8') as f:
+        for update in updates:
+            f.write(json.dumps(update, ensure_ascii=False) + '\n')
+
+
+def read_stream(path: str) -> List[Dict]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class LoadTest:
+    """اجرای یک جریان به‌روزرسانی روی MusicBot و جمع‌آوری نتایج"""
+
+    def __init__(self, bot: MusicBot, client: FakeClient, document_path: str, cover_path: str,
+                 speed: float = 1.0):
+        self.bot = bot
+        self.client = client
+        self.document_path = document_path
+        self.cover_path = cover_path
+        self.speed = speed
+        self.latencies: Dict[str, RollingWindow] = defaultdict(lambda: RollingWindow(1 << 20))
+        self.exceptions: Counter = Counter()
+        self.failed_steps: Counter = Counter()
+        self.covers_applied = 0
+        self.handled = 0
+        self.flows_completed = 0
+        self._media_id = 1
+
+    def make_event(self, update: Dict) -> FakeEvent:
+        user_id = update['user']
+        kind = update['kind']
+        if kind == 'document':
+            extension = os.path.splitext(self.document_path)[1]
+            document = FakeMedia(self._media_id, self.document_path, f"track_{user_id}{extension}")
+            self._media_id += 1
+            return FakeEvent(self.client, user_id, document=document, message_id=self._media_id)
+        if kind == 'photo':
+            self._media_id += 1
+            return FakeEvent(self.client, user_id, photo=FakeMedia(self._media_id, self.cover_path))
+        if kind == 'callback':
+            return FakeEvent(self.client, user_id, data=update['data'].encode(),
+                             message_id=self.client.menus.get(user_id))
+        return FakeEvent(self.client, user_id, text=update['data'])
+
+    async def run_user(self, updates: List[Dict]):
+        for update in updates:
+            await asyncio.sleep(update['delay'] / self.speed)
+            event = self.make_event(update)
+            started = time.perf_counter()
+            try:
+                await self.client.dispatch('callback' if update['kind'] == 'callback' else 'message', event)
+            except Exception as e:
+                self.exceptions[type(e).__name__] += 1
+            self.latencies[update['kind']].add(time.perf_counter() - started)
+            self.check_step(update)
+            self.handled += 1
+        self.flows_completed += 1
+
+    def check_step(self, update: Dict):
+        """بررسی نتیجه مراحلی که بدون خطا هم ممکن است کاری انجام نداده باشند"""
+        if update['kind'] != 'photo':
+            return
+        # The cover is on the file and the user is back at a menu with buttons
+        session = self.bot.user_sessions.get(update['user'])
+        menu = self.client.messages.get((update['user'], self.client.menus.get(update['user'])))
+        if (session and session['state'].name == MAIN_MENU and session['metadata'].get('has_cover')
+                and menu and menu.buttons):
+            self.covers_applied += 1
+        else:
+            self.failed_steps['photo'] += 1
+
+    async def run(self, updates: List[Dict]) -> Dict:
+        by_user: Dict[int, List[Dict]] = defaultdict(list)
+        for update in updates:
+            by_user[update['user']].append(update)
+
+        probe = ResourceProbe()
+        probe.start()
+        self.bot.lag_monitor.start()
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(self.run_user(user_updates) for user_updates in by_user.values()))
+        finally:
+            elapsed = time.perf_counter() - started
+            await self.bot.lag_monitor.stop()
+        usage = probe.stop()
+
+        # Renders still debouncing for sessions that were left open
+        for session in self.bot.user_sessions.values():
+            self.bot.discard_render(session)
+
+        return self.report(elapsed, len(by_user), usage)
+
+    def report(self, elapsed: float, users: int, usage: Dict) -> Dict:
+        all_latencies = RollingWindow(1 << 20)
+        latency = {}
+        for kind, window in sorted(self.latencies.items()):
+            all_latencies.values.extend(window.values)
+            latency[kind] = {f"p{int(q * 100)}": round(window.percentile(q), 4) for q in (0.5, 0.95, 0.99)}
+            latency[kind]['max'] = round(max(window.values), 4)
+            latency[kind]['count'] = len(window)
+        temp_dir = self.bot.config.TEMP_DIR
+        return {
+            'users': users,
+            'updates': self.handled,
+            'seconds': round(elapsed, 3),
+            'updates_per_second': round(self.handled / elapsed, 2) if elapsed else 0,
+            'flows_per_minute': round(self.flows_completed / elapsed * 60, 2) if elapsed else 0,
+            'latency': latency,
+            'p99_all': round(all_latencies.percentile(0.99), 4),
+            'exceptions': dict(self.exceptions),
+            'failed_steps': dict(self.failed_steps),
+            'covers_applied': self.covers_applied,
+            'error_replies': self.client.error_replies,
+            'alerts': self.client.alerts,
+            'files_sent': self.client.files_sent,
+            'api_calls': dict(self.client.calls),
+            'transferred_mb': {k: round(v / MB, 1) for k, v in self.client.transferred.items()},
+            'loop_lag_p99': round(self.bot.lag_monitor.percentile(0.99), 4),
+            'loop_lag_max': round(self.bot.lag_monitor.max_lag, 4),
+            'peak_rss_mb': round(usage['peak_rss'] / MB, 1),
+            'open_sessions': len(self.bot.user_sessions),
+            'temp_files_left': len(os.listdir(temp_dir)) if os.path.isdir(temp_dir) else 0,
+        }
+
+
+def print_report(report: Dict):
+    print(f"👥 {report['users']} users, {report['updates']} updates in {report['seconds']} s "
+          f"({report['updates_per_second']} updates/s, {report['flows_per_minute']} flows/min)")
+    print("⏱️ handler latency (s):")
+    for kind, values in report['latency'].items():
+        print(f"   {kind:<9} p50 {values['p50']:<8} p95 {values['p95']:<8} p99 {values['p99']:<8} "
+              f"max {values['max']:<8} ({values['count']})")
+    print(f"   all       p99 {report['p99_all']}")
+    print(f"🔄 event loop lag p99 {report['loop_lag_p99']} s, max {report['loop_lag_max']} s")
+    print(f"💾 peak RSS {report['peak_rss_mb']} MB, {report['open_sessions']} sessions and "
+          f"{report['temp_files_left']} temp files left")
+    print(f"📡 API calls {sum(report['api_calls'].values())} {report['api_calls']}, "
+          f"transferred {report['transferred_mb']} MB, {report['files_sent']} files sent")
+    print(f"🖼️ {report['covers_applied']} covers applied, failed steps {report['failed_steps'] or 0}")
+    print(f"❌ exceptions {report['exceptions'] or 0}, error replies {report['error_replies']}, "
+          f"alerts {report['alerts']}")
+
+
+async def run_load_test(updates: List[Dict], workspace: str, fmt: str = 'mp3-cbr', size: str = '64k',
+                        latency: float = 0.05, download_bandwidth: float = 10 * MB,
+                        upload_bandwidth: float = 5 * MB, speed: float = 1.0) -> Dict:
+    """ساخت ربات با کلاینت شبیه‌سازی شده و اجرای جریان"""
+    fixtures = os.path.join(workspace, 'fixtures')
+    os.makedirs(fixtures, exist_ok=True)
+    document_path = build_fixture(fixtures, fmt, size)
+    cover_path = build_cover(fixtures, 300)
+
+    client = FakeClient(latency, download_bandwidth, upload_bandwidth)
+    bot = MusicBot(client=client, config=load_test_config(workspace))
+    try:
+        return await LoadTest(bot, client, document_path, cover_path, speed).run(updates)
+    finally:
+        bot.render_pool.shutdown(wait=True)
+        await bot.metadata_lookup.close()
+        bot.fingerprint_index.close()
+        bot.jobs.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--think', type=float, default=0.5, help="mean pause between a user's steps (s)")
+    parser.add_argument('--ramp', type=float, default=10.0, help="users arrive uniformly over this many seconds")
+    parser.add_argument('--format', default='mp3-cbr', choices=list(FORMATS))
+    parser.add_argument('--size', default='64k', choices=list(SIZES))
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds per Telegram API call")
+    parser.add_argument('--download-mbps', type=float, default=80, help="per-transfer download bandwidth")
+    parser.add_argument('--upload-mbps', type=float, default=40, help="per-transfer upload bandwidth")
+    parser.add_argument('--speed', type=float, default=1.0, help="divide recorded pauses by this factor")
+    parser.add_argument('--record', help="write the synthesized stream to this JSONL file")
+    parser.add_argument('--replay', help="replay a recorded JSONL stream instead of synthesizing one")
+    parser.add_argument('--workspace', default=os.path.join(tempfile.gettempdir(), 'musicbot-load'))
+    parser.add_argument('--report', help="also write the report as JSON")
+    parser.add_argument('--verbose', action='store_true', help="keep the bot's own log output")
+    args = parser.parse_args()
+
+    updates = read_stream(args.replay) if args.replay else synthesize(args.users, args.seed, args.think, args.ramp)
+    if args.record:
+        write_stream(args.record, updates)
+        print(f"📝 {len(updates)} updates recorded to {args.record}")
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.CRITICAL)
+
+    # Leftovers of a previous run would skew the temp file count
+    for directory in ('temp', 'output'):
+        shutil.rmtree(os.path.join(args.workspace, directory), ignore_errors=True)
+
+    report = asyncio.run(run_load_test(
+        updates, args.workspace, args.format, args.size, args.latency,
+        args.download_mbps * MB / 8, args.upload_mbps * MB / 8, args.speed
+    ))
+    print_report(report)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0 if not report['exceptions'] and not report['failed_steps'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import threading
+from contextlib import contextmanager
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBudgetExceeded(Exception):
+    """payload بزرگ‌تر از کل بودجه حافظه، یا انتظار بیش از حد برای آزاد شدن آن"""
+
+
+class MemoryBudget:
+    """سقف مجموع حافظه‌ای که تگ‌ها و کاورها در یک لحظه در پروسه اشغال می‌کنند
+
+    mutagen parses a whole tag (covers included) into memory, so every operation that loads one
+    reserves its size first and waits while other threads hold the budget. Covers are extracted
+    straight from the file and never reserve anything. A limit of 0 only keeps count.
+    """
+
+    def __init__(self, limit: int = 0, timeout: float = 30.0):
+        self.limit = limit
+        self.timeout = timeout
+        self.in_use = 0
+        self.peak = 0
+        self.waits = 0
+        self._condition = threading.Condition()
+
+    def __getstate__(self):
+        # An AudioEditor sent to a worker process takes a fresh budget of the same size with it
+        return {'limit': self.limit, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @contextmanager
+    def reserve(self, size: int):
+        """نگه داشتن size بایت از بودجه تا پایان بلوک with"""
+        size = max(size, 0)
+        if self.limit and size > self.limit:
+            raise MemoryBudgetExceeded(f"{size} bytes exceed the memory budget of {self.limit} bytes")
+
+        with self._condition:
+            if self.limit and self.in_use + size > self.limit:
+                self.waits += 1
+                if not self._condition.wait_for(lambda: self.in_use + size <= self.limit, self.timeout):
+                    raise MemoryBudgetExceeded(f"Waited {self.timeout}s for {size} bytes of memory budget")
+            self.in_use += size
+            self.peak = max(self.peak, self.in_use)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_use -= size
+                self._condition.notify_all()
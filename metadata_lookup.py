@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional
+import aiofiles
+import aiohttp
+import numpy as np
+from stats import HitRatio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fields accepted from the service; anything else in a result is dropped
+SUGGESTION_FIELDS = ('title', 'artist', 'album', 'genre', 'year', 'track', 'albumartist')
+
+
+class MetadataLookup:
+    """کلاینت سرویس پیشنهاد متادیتا با اتصال پایدار، ادغام درخواست‌های یکسان و کش دیسکی
+
+    The service speaks a small JSON protocol:
+    GET  {base_url}/search?artist=...&title=...   -> {"results": [{field: value, ...}, ...]}
+    POST {base_url}/fingerprint {"hashes": [...]} -> same response shape
+    """
+
+    def __init__(self, base_url: str, cache_dir: str, ttl: float = 7 * 24 * 3600,
+                 timeout: float = 10.0, max_connections: int = 10):
+        self.base_url = base_url.rstrip('/')
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.requests = 0
+        self.cache_stats = HitRatio()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.base_url)
+
+    async def search(self, artist: str = '', title: str = '') -> List[Dict[str, str]]:
+        """جستجوی پیشنهادها بر اساس هنرمند و نام آهنگ"""
+        query = {'artist': artist.strip(), 'title': title.strip()}
+        if not self.enabled or not any(query.values()):
+            return []
+        key = self._cache_key('search', json.dumps(query, sort_keys=True, ensure_ascii=False))
+        return await self._query(key, 'GET', '/search', params=query)
+
+    async def search_fingerprint(self, hashes: np.ndarray) -> List[Dict[str, str]]:
+        """جستجوی پیشنهادها بر اساس اثرانگشت صوتی"""
+        if not self.enabled or not len(hashes):
+            return []
+        key = self._cache_key('fingerprint', np.asarray(hashes, dtype='<i8').tobytes())
+        return await self._query(key, 'POST', '/fingerprint', json={'hashes': hashes.tolist()})
+
+    async def _query(self, key: str, method: str, path: str, **kwargs) -> List[Dict[str, str]]:
+        """کش، سپس درخواست در جریان، سپس درخواست جدید"""
+        cached = await self._read_cache(key)
+        self.cache_stats.record(cached is not None)
+        if cached is not None:
+            return cached
+
+        # Identical queries in flight share one request
+        if key in self._pending:
+            return await asyncio.shield(self._pending[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            results = await self._fetch(method, path, **kwargs)
+            if results is not None:
+                await self._write_cache(key, results)
+            future.set_result(results or [])
+            return results or []
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieved here so a failure nobody shared is not reported as unhandled
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+            if not future.done():
+                future.cancel()
+
+    async def _fetch(self, method: str, path: str, **kwargs) -> Optional[List[Dict[str, str]]]:
+        """ارسال درخواست روی اتصال مشترک؛ None یعنی پاسخ قابل کش نیست"""
+        session = await self._get_session()
+        self.requests += 1
+        try:
+            async with session.request(method, self.base_url + path, **kwargs) as response:
+                if response.status != 200:
+                    logger.error(f"Metadata service returned {response.status} for {path}")
+                    return None
+                payload = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.error(f"Metadata service request failed: {e}")
+            return None
+
+        results = []
+        for item in payload.get('results', []) if isinstance(payload, dict) else []:
+            if isinstance(item, dict):
+                results.append({field: str(item[field]) for field in SUGGESTION_FIELDS if item.get(field)})
+        return [result for result in results if result]
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """ساخت تنبل نشست HTTP با اتصال‌های keep-alive"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'Accept': 'application/json'}
+            )
+        return self._session
+
+    def _cache_key(self, kind: str, query) -> str:
+        if isinstance(query, str):
+            query = query.encode('utf-8')
+        return f"{kind}_{hashlib.blake2b(query, digest_size=16).hexdigest()}"
+
+    async def _read_cache(self, key: str) -> Optional[List[Dict[str, str]]]:
+        """خواندن پاسخ کش شده در صورت معتبر بودن"""
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            async with aiofiles.open(path, 'r', encoding='utf-8') as f:
+                return json.loads(await f.read())
+        except (OSError, ValueError):
+            return None
+
+    async def _write_cache(self, key: str, results: List[Dict[str, str]]):
+        """ذخیره پاسخ در کش دیسکی"""
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        partial_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            async with aiofiles.open(partial_path, 'w', encoding='utf-8') as f:
+                await f.write(json.dumps(results, ensure_ascii=False))
+            os.replace(partial_path, path)
+        except OSError as e:
+            logger.error(f"Error writing metadata cache: {e}")
+
+    async def close(self):
+        """بستن اتصال‌های باز"""
+        if self._session and not self._session.closed:
+            await self._session.close()
@@ -0,0 +1,225 @@
+import asyncio
+import bisect
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Stage latencies range from a tag read (milliseconds) to a 2 GB upload (minutes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+THROUGHPUT_BUCKETS = tuple(2 ** power * 1024 for power in range(4, 16, 2))   # 16 KB/s .. 16 MB/s
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels, extra: str = '') -> str:
+    parts = [f'{name}="{value}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """شمارنده افزایشی با برچسب"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.values.items():
+            yield f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Gauge:
+    """مقدار لحظه‌ای که هنگام خواندن متریک‌ها محاسبه می‌شود"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], Dict[Labels, float]]):
+        self.name = name
+        self.help = help_text
+        self.read = read
+
+    def samples(self) -> Iterable[str]:
+        try:
+            values = self.read()
+        except Exception as e:
+            logger.error(f"Error reading gauge {self.name}: {e}")
+            return
+        for labels, value in values.items():
+            yield f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """هیستوگرام با مرزهای ثابت (سازگار با Prometheus)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.series: Dict[Labels, List] = {}    # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * (len(self.buckets) + 2)
+        # Counts are per bucket here and made cumulative only when scraped
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self) -> Iterable[str]:
+        for labels, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(series[-2])}"
+            yield f"{self.name}_count{_format_labels(labels)} {series[-1]}"
+
+
+def directory_usage(paths: Iterable[str]) -> Dict[Labels, float]:
+    """حجم فایل‌های هر پوشه و زیرپوشه‌های مستقیم آن"""
+    usage = {}
+    for path in paths:
+        total = 0
+        try:
+            for entry in os.scandir(path):
+                if entry.is_file(follow_symlinks=False):
+                    total += entry.stat().st_size
+                elif entry.is_dir(follow_symlinks=False):
+                    total += sum(sub.stat().st_size for sub in os.scandir(entry.path)
+                                 if sub.is_file(follow_symlinks=False))
+        except OSError:
+            pass
+        usage[(('dir', os.path.basename(os.path.normpath(path))),)] = total
+    return usage
+
+
+class Metrics:
+    """متریک‌های ربات و endpoint متنی Prometheus
+
+    Recording is a dict lookup and a bisect on the event loop thread; nothing is formatted or
+    aggregated until /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._metrics: List = []
+        self.stage_seconds = self.histogram(
+            'musicbot_stage_seconds', 'Duration of each processing stage')
+        self.transfer_bytes = self.counter(
+            'musicbot_transfer_bytes_total', 'Bytes downloaded from or uploaded to Telegram')
+        self.transfer_rate = self.histogram(
+            'musicbot_transfer_bytes_per_second', 'Throughput of each transfer', THROUGHPUT_BUCKETS)
+        self.updates = self.counter('musicbot_updates_total', 'Updates received by type')
+        self.errors = self.counter('musicbot_stage_errors_total', 'Stages that raised an exception')
+        # Called with (handler, stage, seconds) after every timed stage
+        self.stage_listeners: List[Callable[[str, str, float], None]] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, buckets=LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]) -> Gauge:
+        """گیج بدون برچسب؛ read هنگام خواندن متریک‌ها فراخوانی می‌شود"""
+        return self.labelled_gauge(name, help_text, lambda: {(): read()})
+
+    def labelled_gauge(self, name: str, help_text: str, read: Callable[[], Dict[Labels, float]]) -> Gauge:
+        metric = Gauge(name, help_text, read)
+        self._metrics.append(metric)
+        return metric
+
+    @contextmanager
+    def stage(self, handler: str, stage: str):
+        """زمان‌سنجی یک مرحله از یک handler"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            # Cancelled work (a superseded render) is timed but is not an error
+            self.errors.inc(handler=handler, stage=stage)
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            self.stage_seconds.observe(seconds, handler=handler, stage=stage)
+            for listener in self.stage_listeners:
+                listener(handler, stage, seconds)
+
+    def transfer(self, direction: str, size: int, seconds: float):
+        """ثبت یک انتقال کامل (download/upload)"""
+        self.transfer_bytes.inc(size, direction=direction)
+        if seconds > 0:
+            self.transfer_rate.observe(size / seconds, direction=direction)
+
+    def render(self) -> str:
+        """خروجی متنی با قالب Prometheus"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            # Headers are not needed; read them so the client sees a clean close
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, body = '200 OK', self.render().encode('utf-8')
+            else:
+                status, body = '404 Not Found', b'Not Found\n'
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.error(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int):
+        """راه‌اندازی endpoint محلی /metrics"""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        address = self._server.sockets[0].getsockname()
+        logger.info(f"Metrics available at http://{address[0]}:{address[1]}/metrics")
+        return self._server
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
@@ -0,0 +1,276 @@
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from typing import Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# MPEG version ids as encoded in the frame header
+MPEG_25 = 0
+MPEG_2 = 2
+MPEG_1 = 3
+
+_BITRATES = {
+    (MPEG_1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (MPEG_1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (MPEG_1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (MPEG_2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (MPEG_2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (MPEG_2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+_SAMPLE_RATES = {
+    MPEG_1: [44100, 48000, 32000],
+    MPEG_2: [22050, 24000, 16000],
+    MPEG_25: [11025, 12000, 8000],
+}
+
+FrameHeader = namedtuple(
+    'FrameHeader',
+    ['version', 'layer', 'protected', 'bitrate', 'sample_rate',
+     'padding', 'channel_mode', 'length', 'samples']
+)
+
+
+def parse_header(raw: int) -> Optional[FrameHeader]:
+    """تجزیه هدر ۳۲ بیتی فریم MPEG"""
+    if (raw >> 21) & 0x7FF != 0x7FF:
+        return None
+
+    version = (raw >> 19) & 0x3
+    layer_bits = (raw >> 17) & 0x3
+    bitrate_index = (raw >> 12) & 0xF
+    rate_index = (raw >> 10) & 0x3
+
+    # Reserved values and free-format streams are not supported
+    if version == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    layer = 4 - layer_bits
+    table_version = MPEG_1 if version == MPEG_1 else MPEG_2
+    bitrate = _BITRATES[(table_version, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (raw >> 9) & 0x1
+
+    if layer == 1:
+        length = (12 * bitrate // sample_rate + padding) * 4
+        samples = 384
+    elif layer == 2 or version == MPEG_1:
+        length = 144 * bitrate // sample_rate + padding
+        samples = 1152
+    else:
+        length = 72 * bitrate // sample_rate + padding
+        samples = 576
+
+    return FrameHeader(
+        version=version,
+        layer=layer,
+        protected=not (raw >> 16) & 0x1,
+        bitrate=bitrate,
+        sample_rate=sample_rate,
+        padding=padding,
+        channel_mode=(raw >> 6) & 0x3,
+        length=length,
+        samples=samples,
+    )
+
+
+def side_info_size(header: FrameHeader) -> int:
+    """اندازه side info فریم Layer III بر حسب بایت"""
+    mono = header.channel_mode == 3
+    if header.version == MPEG_1:
+        return 17 if mono else 32
+    return 9 if mono else 17
+
+
+def audio_start_offset(file_path: str) -> int:
+    """محاسبه محل شروع داده صوتی بعد از تگ ID3v2"""
+    offset = 0
+    with open(file_path, 'rb') as f:
+        # Some files carry more than one ID3v2 tag back to back
+        while True:
+            f.seek(offset)
+            head = f.read(10)
+            if len(head) < 10 or head[:3] != b'ID3':
+                return offset
+            size = 0
+            for byte in head[6:10]:
+                size = (size << 7) | (byte & 0x7F)
+            offset += 10 + size
+            if head[5] & 0x10:
+                offset += 10
+
+
+def audio_end_offset(file_path: str) -> int:
+    """محاسبه انتهای داده صوتی قبل از تگ‌های انتهایی (ID3v1 و APE)"""
+    end = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        if end >= 128:
+            f.seek(end - 128)
+            if f.read(3) == b'TAG':
+                end -= 128
+        if end >= 32:
+            f.seek(end - 32)
+            footer = f.read(32)
+            if footer[:8] == b'APETAGEX':
+                tag_size, flags = struct.unpack('<II', footer[12:20])
+                end -= tag_size
+                # Header flag: the tag also has a 32 byte header in front
+                if flags & 0x80000000:
+                    end -= 32
+    return max(end, 0)
+
+
+def iter_frame_chunks(file_path: str, start: Optional[int] = None, end: Optional[int] = None,
+                      chunk_size: int = 1 << 20) -> Iterator[Tuple[int, bytearray, List[Tuple[int, FrameHeader]]]]:
+    """خواندن فایل در تکه‌هایی شامل فریم‌های کامل (آفست تکه، داده، فریم‌ها)"""
+    if start is None:
+        start = audio_start_offset(file_path)
+    if end is None:
+        end = audio_end_offset(file_path)
+
+    with open(file_path, 'rb') as f:
+        offset = start
+        reference = None
+
+        while end - offset >= 4:
+            f.seek(offset)
+            chunk = bytearray(f.read(min(chunk_size, end - offset)))
+            frames = []
+            pos = 0
+
+            while len(chunk) - pos >= 4:
+                header = parse_header(int.from_bytes(chunk[pos:pos + 4], 'big'))
+                # Once locked on a stream, reject headers that change the layer or
+                # sample rate: they are almost always sync bytes inside audio data
+                if header and reference and (header.layer != reference.layer or
+                                             header.sample_rate != reference.sample_rate):
+                    header = None
+
+                if header is None:
+                    next_sync = chunk.find(b'\xff', pos + 1)
+                    pos = next_sync if next_sync != -1 else len(chunk)
+                    continue
+
+                # The frame continues in the next chunk (or is truncated at the end)
+                if pos + header.length > len(chunk):
+                    break
+
+                reference = reference or header
+                frames.append((pos, header))
+                pos += header.length
+
+            if frames:
+                yield offset, chunk, frames
+            if pos == 0:
+                return
+            offset += pos
+
+
+def iter_frames(file_path: str, start: Optional[int] = None, end: Optional[int] = None,
+                buffer_size: int = 1 << 20) -> Iterator[Tuple[int, FrameHeader]]:
+    """پیمایش فریم‌های MPEG فایل با خواندن بافر شده"""
+    for chunk_offset, _, frames in iter_frame_chunks(file_path, start, end, buffer_size):
+        for pos, header in frames:
+            yield chunk_offset + pos, header
+
+
+def read_vbr_tag(file_path: str, offset: int, header: FrameHeader) -> Optional[bytes]:
+    """تشخیص فریم Xing/Info/VBRI در ابتدای جریان"""
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        frame = f.read(header.length)
+
+    xing_at = 4 + (2 if header.protected else 0) + side_info_size(header)
+    if frame[xing_at:xing_at + 4] in (b'Xing', b'Info'):
+        return frame[xing_at:xing_at + 4]
+    if frame[36:40] == b'VBRI':
+        return b'VBRI'
+    return None
+
+
+def build_info_frame(template: bytes, header: FrameHeader, frame_count: int,
+                     byte_count: int, marker: bytes = b'Info') -> Optional[bytes]:
+    """ساخت فریم Xing/Info برای یک بخش جدا شده از فایل"""
+    xing_at = 4 + side_info_size(header)
+    if header.layer != 3 or header.length < xing_at + 16:
+        return None
+
+    # Reuse the first audio frame header without CRC protection so the
+    # zeroed side info does not need a checksum
+    first = template[0:2]
+    first = bytes([first[0], first[1] | 0x01])
+    frame = bytearray(header.length)
+    frame[0:2] = first
+    frame[2:4] = template[2:4]
+    frame[xing_at:xing_at + 4] = marker
+    frame[xing_at + 4:xing_at + 16] = struct.pack('>III', 0x3, frame_count, byte_count + header.length)
+    return bytes(frame)
+
+
+class FrameIndex:
+    """ایندکس فریم‌های MP3 برای نگاشت زمان به آفست بایتی"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.offsets = array('q')
+        self.sample_rate = 0
+        self.samples_per_frame = 0
+        self.vbr_marker = None
+        self.first_header = None
+        self.end = audio_end_offset(file_path)
+
+        frames = iter_frames(file_path, end=self.end)
+        for offset, header in frames:
+            if self.first_header is None:
+                self.first_header = header
+                self.sample_rate = header.sample_rate
+                self.samples_per_frame = header.samples
+                self.vbr_marker = read_vbr_tag(file_path, offset, header)
+                if self.vbr_marker:
+                    # The VBR header frame carries no audio
+                    continue
+            self.offsets.append(offset)
+
+        if not self.offsets:
+            logger.error(f"No MPEG frames found: {file_path}")
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    @property
+    def frame_duration(self) -> float:
+        if not self.sample_rate:
+            return 0.0
+        return self.samples_per_frame / self.sample_rate
+
+    @property
+    def duration(self) -> float:
+        return len(self.offsets) * self.frame_duration
+
+    def frame_at(self, seconds: float) -> int:
+        """شماره نزدیک‌ترین مرز فریم به زمان داده شده"""
+        if not self.frame_duration:
+            return 0
+        frame = int(round(seconds / self.frame_duration))
+        return min(max(frame, 0), len(self.offsets))
+
+    def offset_at_frame(self, frame: int) -> int:
+        """آفست بایتی شروع فریم (یا انتهای داده صوتی)"""
+        if frame >= len(self.offsets):
+            return self.end
+        return self.offsets[frame]
+
+    def byte_range(self, start: float, end: Optional[float] = None) -> Tuple[int, int, int]:
+        """بازه بایتی هم‌تراز با فریم برای بازه زمانی (شروع، پایان، تعداد فریم)"""
+        first = self.frame_at(start)
+        last = len(self.offsets) if end is None else self.frame_at(end)
+        last = max(last, first)
+        return self.offset_at_frame(first), self.offset_at_frame(last), last - first
+
+    def frame_for_offset(self, offset: int) -> int:
+        """شماره فریمی که آفست داده شده در آن قرار دارد"""
+        return max(bisect_left(self.offsets, offset + 1) - 1, 0)
@@ -0,0 +1,141 @@
+from typing import Dict, Optional, Tuple
+import numpy as np
+from mp3_frames import MPEG_1, FrameHeader, iter_frame_chunks, side_info_size
+import logging
+
+logger = logging.getLogger(__name__)
+
+# One global_gain step scales the decoded signal by 2^(1/4), i.e. 1.5 dB
+GAIN_STEP_DB = 1.5
+
+
+def gain_bit_offsets(header: FrameHeader) -> Tuple[int, ...]:
+    """محل بیت‌های global_gain هر گرانول/کانال نسبت به شروع side info"""
+    channels = 1 if header.channel_mode == 3 else 2
+    if header.version == MPEG_1:
+        # main_data_begin(9) + private bits(5 mono / 3 stereo) + scfsi(4 per channel),
+        # then two granules of 59 bits per channel
+        base = 9 + (5 if channels == 1 else 3) + 4 * channels
+        return tuple(base + (granule * channels + channel) * 59 + 21
+                     for granule in range(2) for channel in range(channels))
+    # MPEG-2/2.5: main_data_begin(8) + private bits(1 mono / 2 stereo),
+    # one granule of 63 bits per channel
+    base = 8 + (1 if channels == 1 else 2)
+    return tuple(base + channel * 63 + 21 for channel in range(channels))
+
+
+def crc16(data: bytes) -> int:
+    """CRC-16 فریم‌های MPEG (چندجمله‌ای 0x8005، مقدار اولیه 0xFFFF)"""
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x8005 if crc & 0x8000 else crc << 1) & 0xFFFF
+    return crc
+
+
+def _gain_fields(file_path: str, chunk_size: int):
+    """پیمایش جریانی فیلدهای global_gain
+
+    Yields per chunk: its offset, the chunk itself (writable), its frames, the protected frames,
+    the number of audio frames, and the byte index, bit shift, 16-bit word and value of every field.
+    """
+    layouts: Dict[tuple, np.ndarray] = {}
+    first_frame = True
+
+    for chunk_offset, chunk, frames in iter_frame_chunks(file_path, chunk_size=chunk_size):
+        starts = {}
+        protected = []
+
+        for pos, header in frames:
+            if header.layer != 3:
+                continue
+            side_start = pos + 4 + (2 if header.protected else 0)
+            # An Xing/Info frame carries no audio; leave it untouched
+            if first_frame:
+                first_frame = False
+                marker_at = side_start + side_info_size(header)
+                if chunk[marker_at:marker_at + 4] in (b'Xing', b'Info'):
+                    continue
+            key = (header.version == MPEG_1, header.channel_mode == 3)
+            if key not in layouts:
+                layouts[key] = np.array(gain_bit_offsets(header), dtype=np.int64)
+            starts.setdefault(key, []).append(side_start)
+            if header.protected:
+                protected.append((pos, header))
+
+        if not starts:
+            continue
+
+        # Absolute bit positions of every global_gain field in this chunk
+        bits = np.concatenate([
+            (np.array(side_starts, dtype=np.int64)[:, None] * 8 + layouts[key][None, :]).ravel()
+            for key, side_starts in starts.items()
+        ])
+        buffer = np.frombuffer(chunk, dtype=np.uint8)
+        byte = bits >> 3
+        shift = (8 - (bits & 7)).astype(np.int32)
+
+        # Each 8-bit field straddles at most two bytes
+        word = (buffer[byte].astype(np.int32) << 8) | buffer[byte + 1]
+        gain = (word >> shift) & 0xFF
+        audio_frames = sum(len(side_starts) for side_starts in starts.values())
+        yield chunk_offset, chunk, frames, protected, audio_frames, byte, shift, word, gain
+
+
+def gain_range(file_path: str, chunk_size: int = 1 << 20) -> Optional[Tuple[int, int]]:
+    """کمترین و بیشترین global_gain فایل (None برای فایل بدون فریم صوتی)"""
+    lowest, highest = None, None
+    for *_, gain in _gain_fields(file_path, chunk_size):
+        low, high = int(gain.min()), int(gain.max())
+        lowest = low if lowest is None else min(lowest, low)
+        highest = high if highest is None else max(highest, high)
+    return None if lowest is None else (lowest, highest)
+
+
+def apply_gain_steps(file_path: str, steps: int, chunk_size: int = 1 << 20) -> Dict[str, int]:
+    """تغییر global_gain همه گرانول‌ها در یک پیمایش جریانی، بدون کدگذاری مجدد
+
+    Fields pushed past 0 or 255 are clamped and counted in 'clipped'; callers that need an
+    exact undo limit `steps` with gain_range first.
+    """
+    stats = {'frames': 0, 'granules': 0, 'clipped': 0}
+    if steps == 0:
+        return stats
+
+    with open(file_path, 'r+b') as out:
+        for chunk_offset, chunk, frames, protected, audio_frames, byte, shift, word, gain in \
+                _gain_fields(file_path, chunk_size):
+            buffer = np.frombuffer(chunk, dtype=np.uint8)
+            adjusted = gain + steps
+            stats['clipped'] += int(np.count_nonzero((adjusted < 0) | (adjusted > 255)))
+            adjusted = np.clip(adjusted, 0, 255)
+            word = (word & ~(0xFF << shift)) | (adjusted << shift)
+            buffer[byte] = word >> 8
+            buffer[byte + 1] = word & 0xFF
+            stats['frames'] += audio_frames
+            stats['granules'] += len(byte)
+
+            # Side info changed, so protected frames need a new checksum
+            for pos, header in protected:
+                side_start = pos + 6
+                checked = bytes(chunk[pos + 2:pos + 4]) + bytes(chunk[side_start:side_start + side_info_size(header)])
+                chunk[pos + 4:pos + 6] = crc16(checked).to_bytes(2, 'big')
+
+            last_pos, last_header = frames[-1]
+            out.seek(chunk_offset)
+            out.write(chunk[:last_pos + last_header.length])
+
+    if stats['clipped']:
+        logger.warning(f"{stats['clipped']} granules clipped while changing gain of {file_path}")
+    return stats
+
+
+def format_undo(steps: int) -> str:
+    """قالب تگ MP3GAIN_UNDO (مانند mp3gain)"""
+    return f"{steps:+04d},{steps:+04d},N"
+
+
+def parse_undo(value: str) -> int:
+    """خواندن تعداد گام‌های بازگردانی از تگ MP3GAIN_UNDO"""
+    return int(value.split(',')[0])
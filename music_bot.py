@@ -1,12 +1,45 @@
 import os
+import io
 import asyncio
 import logging
-from typing import Dict, Optional
+import shutil
+import json
+import signal
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Set
 from telethon import TelegramClient, events, Button
+from telethon.errors import MessageNotModifiedError
 from telethon.tl.types import DocumentAttributeAudio, DocumentAttributeFilename
 import aiofiles
 from config import Config
 from audio_editor import AudioEditor
+from audio_converter import AudioConverter, FFmpegRunner, OUTPUT_FORMATS
+from cue_parser import parse_track_list
+from loudness import analyze_album
+from mp3_gain import GAIN_STEP_DB
+from stream_uploader import StreamUploader
+from waveform import ThumbnailCache, payload_hash
+from fingerprint import FingerprintIndex, fingerprint
+from metadata_lookup import MetadataLookup
+from autocomplete import AUTOCOMPLETE_FIELDS, AutocompleteIndex
+from progress import ProgressReporter, format_size
+from call_budget import CallBudget
+from router import Router
+from session_guard import DuplicateFilter, SessionLocks
+from metrics import Metrics, directory_usage
+from stats import LiveStats
+from lag_monitor import LagMonitor
+from memory_budget import MemoryBudget
+from job_queue import JobQueue
+from profiler import MAX_DURATION as MAX_PROFILE_SECONDS, SamplingProfiler
+import tracing
+from session_state import (
+    SessionState, InvalidTransition, MAIN_MENU, EDITING_FIELD, EDITING_FILENAME,
+    WAITING_TRACKLIST, WAITING_COVER, SAVING
+)
 
 # Setup logging
 logging.basicConfig(
@@ -15,59 +48,213 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Session entries kept across a restart; fingerprints are computed again and prompts restart from the menu
+PERSISTED_SESSION_KEYS = ('temp_file', 'original_filename', 'metadata', 'custom_filename', 'gain_applied',
+                          'message_id', 'menu_message_id')
+
 class MusicBot:
     """ربات ویرایش فایل‌های صوتی با Telethon"""
     
-    def __init__(self):
-        self.config = Config()
+    def __init__(self, client=None, config: Config = None):
+        self.config = config or Config()
         self.config.validate_config()
         
-        # Initialize Telethon client
-        self.client = TelegramClient(
+        # Initialize Telethon client (load_test.py passes a simulated one)
+        self.client = client or TelegramClient(
             'music_bot_session',
             self.config.API_ID,
             self.config.API_HASH
         )
         
-        # Initialize audio editor
-        self.audio_editor = AudioEditor()
+        # Initialize audio editor; tags and covers loaded at once share one memory budget
+        self.audio_editor = AudioEditor(MemoryBudget(self.config.MEMORY_BUDGET))
+        
+        # Format conversion pipes ffmpeg output straight into the upload
+        self.audio_converter = AudioConverter(
+            self.audio_editor,
+            FFmpegRunner(self.config.FFMPEG_BINARY, self.config.MAX_ENCODERS)
+        )
+        self.stream_uploader = StreamUploader(self.client)
+        
+        # Waveform/spectrogram images are rendered once per distinct file
+        self.thumbnail_cache = ThumbnailCache(
+            os.path.join(self.config.CACHE_DIR, 'thumbnails'),
+            self.config.FFMPEG_BINARY,
+            max_bytes=self.config.THUMBNAIL_CACHE_SIZE
+        )
+        
+        # Recordings saved in earlier sessions, matched by acoustic fingerprint
+        self.fingerprint_index = FingerprintIndex(self.config.FINGERPRINT_DB)
+        
+        # Downloads and saves in progress survive restarts; resume_jobs picks them up
+        self.jobs = JobQueue(self.config.JOB_DB)
+        self.resume_task: Optional[asyncio.Task] = None
+        
+        # Values typed in earlier edits, offered again when the same field is edited
+        self.autocomplete = AutocompleteIndex(os.path.join(self.config.CACHE_DIR, 'autocomplete.json'))
+        if not len(self.autocomplete):
+            self.autocomplete.record_metadata(self.fingerprint_index.catalog())
+        
+        # Online metadata suggestions share one keep-alive connection pool
+        self.metadata_lookup = MetadataLookup(
+            self.config.METADATA_API_URL,
+            os.path.join(self.config.CACHE_DIR, 'metadata'),
+            ttl=self.config.METADATA_CACHE_TTL,
+            timeout=5.0
+        )
+        
+        # Outputs are prepared in the background while the user is still editing
+        self.render_pool = ThreadPoolExecutor(max_workers=2)
+        self.save_latencies = deque(maxlen=200)
+        
+        # Outgoing requests per chat; progress and other optional edits yield when it runs out
+        self.call_budget = CallBudget(self.config.CHAT_CALL_BUDGET)
+        
+        # Handlers of one user run one at a time; repeated taps of a button are dropped
+        self.session_locks = SessionLocks()
+        self.duplicate_clicks = DuplicateFilter(self.config.DUPLICATE_CLICK_WINDOW)
+        self.failed_taps = set()        # (user, message) of taps that ended with an error reply
         
-        # User sessions for tracking editing state
+        # User sessions for tracking editing state; idle ones are closed by _expire_sessions
         self.user_sessions: Dict[int, Dict] = {}
+        self.session_sweep_task: Optional[asyncio.Task] = None
+        
+        # Handlers still running; shutdown() lets them finish before the process exits
+        self.inflight: Set[asyncio.Task] = set()
+        self.draining = False
+        self.shutdown_task: Optional[asyncio.Task] = None
+        
+        # Stage timings and load, served in Prometheus format
+        self.metrics = Metrics()
+        
+        # In-memory counters and rolling latency windows behind /stats
+        self.stats = LiveStats()
+        self.stats.caches['metadata'] = self.metadata_lookup.cache_stats
+        self.stats.caches['thumbnail'] = self.thumbnail_cache.cache_stats
+        self.metrics.stage_listeners.append(self.stats.observe_stage)
+        self.disk_usage_task: Optional[asyncio.Task] = None
+        self.autocomplete_task: Optional[asyncio.Task] = None
+        self._register_gauges()
+        
+        # Watchdog for synchronous work that stalls the event loop for every user
+        self.lag_monitor = LagMonitor(threshold=self.config.LOOP_LAG_THRESHOLD)
+        self.lag_monitor.register(self.metrics)
+        self.profile_task: Optional[asyncio.Task] = None
+        
+        # Timelines of single requests, kept when slow or failed
+        if self.config.TRACE_FILE:
+            tracing.configure(
+                self.config.TRACE_FILE,
+                sample_rate=self.config.TRACE_SAMPLE_RATE,
+                slow_seconds=self.config.TRACE_SLOW_SECONDS
+            )
         
         # Register event handlers
         self._register_handlers()
     
     def _register_handlers(self):
         """ثبت handlers برای رویدادهای مختلف"""
-        
-        @self.client.on(events.NewMessage(pattern='/start'))
-        async def start_handler(event):
-            await self.handle_start(event)
-        
-        @self.client.on(events.NewMessage(pattern='/help'))
-        async def help_handler(event):
-            await self.handle_help(event)
-        
-        @self.client.on(events.NewMessage(pattern='/cancel'))
-        async def cancel_handler(event):
-            await self.handle_cancel(event)
-        
-        @self.client.on(events.NewMessage(func=lambda e: e.document))
-        async def document_handler(event):
-            await self.handle_document(event)
-        
-        @self.client.on(events.NewMessage(func=lambda e: e.photo))
-        async def photo_handler(event):
-            await self.handle_photo(event)
+        self.router = self._build_router()
+        
+        # One handler per update type; the router picks the method from its tables
+        @self.client.on(events.NewMessage)
+        async def message_handler(event):
+            self.metrics.updates.inc(type='message')
+            with self._in_flight(), tracing.trace('message', user=event.sender_id):
+                async with self.session_locks.hold(event.sender_id):
+                    self._cancel_suggestions(self.user_sessions.get(event.sender_id))
+                    try:
+                        await self.router.dispatch_message(event)
+                    finally:
+                        self._touch_session(event.sender_id)
         
         @self.client.on(events.CallbackQuery)
         async def callback_handler(event):
-            await self.handle_callback(event)
+            self.metrics.updates.inc(type='callback')
+            with self._in_flight(), \
+                    tracing.trace('callback', user=event.sender_id, payload=event.data.decode('utf-8', 'replace')):
+                try:
+                    await self.handle_callback(event)
+                finally:
+                    self._touch_session(event.sender_id)
+    
+    @contextmanager
+    def _in_flight(self):
+        task = asyncio.current_task()
+        self.inflight.add(task)
+        try:
+            yield
+        finally:
+            self.inflight.discard(task)
+    
+    def _tap_failed(self, event):
+        """ثبت اینکه لمس در حال اجرا با پیام خطا تمام شده است"""
+        self.failed_taps.add((event.sender_id, event.message_id))
+    
+    def _register_gauges(self):
+        """گیج‌هایی که هنگام خواندن متریک‌ها محاسبه می‌شوند"""
+        self.metrics.gauge('musicbot_active_sessions', 'Open editing sessions',
+                           lambda: len(self.user_sessions))
+        self.metrics.labelled_gauge('musicbot_queue_depth', 'Work waiting to run', lambda: {
+            (('queue', 'session_locks'),): self.session_locks.waiting(),
+            (('queue', 'renders'),): self.stats.running['render'],
+        })
+        # Refreshed in the background by _refresh_disk_usage; a scrape never walks the directories
+        self.metrics.labelled_gauge('musicbot_disk_usage_bytes', 'Size of working directories',
+                                    lambda: self.stats.disk_usage)
+        budget = self.audio_editor.memory_budget
+        self.metrics.labelled_gauge('musicbot_memory_budget_bytes', 'Tag and cover memory reserved', lambda: {
+            (('kind', 'in_use'),): budget.in_use,
+            (('kind', 'peak'),): budget.peak,
+            (('kind', 'limit'),): budget.limit,
+        })
+        self.metrics.gauge('musicbot_draining', 'Shutting down, new files refused',
+                           lambda: int(self.draining))
+    
+    def _build_router(self) -> Router:
+        """جدول مسیریابی دستورها، انواع پیام و callbackها"""
+        router = Router()
+        
+        router.command('/start', self.handle_start)
+        router.command('/help', self.handle_help)
+        router.command('/cancel', self.handle_cancel)
+        router.command('/profile', self.handle_profile)
+        router.command('/stats', self.handle_stats)
+        router.message('document', self.handle_document)
+        router.message('photo', self.handle_photo)
+        router.message('text', self.handle_text)
+        
+        callbacks = {
+            'edit_metadata': self.show_metadata_menu,
+            'edit_cover': self.show_cover_menu,
+            'change_filename': self.start_filename_change,
+            'split_tracks': self.start_track_split,
+            'convert_menu': self.show_convert_menu,
+            'replaygain': self.analyze_loudness,
+            'detect_bpm': self.detect_tempo,
+            'known_metadata': self.apply_known_metadata,
+            'trim_silence': self.trim_file_silence,
+            'waveform': self.show_waveform,
+            'apply_gain': self.apply_lossless_gain,
+            'undo_gain': self.undo_lossless_gain,
+            'save_download': self.save_and_download,
+            'cancel': self.handle_cancel_callback,
+            'back_main': self.return_to_main_menu,
+        }
+        for payload, handler in callbacks.items():
+            router.callback(payload, handler)
+        
+        prefixes = {
+            'edit_': self.start_metadata_edit,
+            'cover_': self.handle_cover_action,
+            'convert_': self.convert_and_send,
+            'ac_': self.apply_autocomplete,
+            'suggest_': self.apply_suggestion,
+        }
+        for prefix, handler in prefixes.items():
+            router.callback_prefix(prefix, handler)
         
-        @self.client.on(events.NewMessage(func=lambda e: e.text and not e.text.startswith('/')))
-        async def text_handler(event):
-            await self.handle_text(event)
+        return router
     
     async def handle_start(self, event):
         """پردازش دستور /start"""
@@ -135,24 +322,177 @@ class MusicBot:
         user_id = event.sender_id
         
         if user_id in self.user_sessions:
-            # Clean up user session
-            session = self.user_sessions[user_id]
-            if 'temp_file' in session and os.path.exists(session['temp_file']):
-                os.remove(session['temp_file'])
-            
-            del self.user_sessions[user_id]
+            self._close_session(user_id)
             await event.respond("✅ عملیات لغو شد.")
         else:
             await event.respond("❌ هیچ عملیاتی در حال انجام نیست.")
     
-    async def handle_document(self, event):
-        """پردازش فایل‌های ارسالی"""
+    async def handle_profile(self, event):
+        """پروفایل ربات در حال اجرا به مدت N ثانیه (فقط مدیر): /profile 30"""
+        if not self.config.ADMIN_USER_ID or event.sender_id != self.config.ADMIN_USER_ID:
+            return
+        
+        args = event.text.split()
+        try:
+            duration = int(args[1]) if len(args) > 1 else 30
+        except ValueError:
+            await event.respond("❌ مدت را به ثانیه وارد کنید، مثلاً: /profile 30")
+            return
+        duration = max(1, min(duration, MAX_PROFILE_SECONDS))
+        
+        if self.profile_task and not self.profile_task.done():
+            await event.respond("⏳ یک پروفایل دیگر در حال اجراست.")
+            return
+        
+        await event.respond(f"🔬 نمونه‌برداری از ربات به مدت {duration} ثانیه...")
+        # Runs outside the admin's session lock so the bot stays usable while sampling
+        self.profile_task = asyncio.create_task(self._run_profile(event.chat_id, duration))
+    
+    async def _run_profile(self, chat_id: int, duration: int):
+        """نمونه‌برداری در رشته جداگانه و ارسال فایل collapsed-stack"""
+        profiler = SamplingProfiler()
+        try:
+            loop = asyncio.get_running_loop()
+            # A private thread, so the sampler never waits behind encodes in the shared pools
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                await loop.run_in_executor(pool, profiler.run, duration)
+            
+            if not profiler.stacks:
+                await self.client.send_message(chat_id, "ℹ️ در این مدت هیچ رشته‌ای مشغول نبود.")
+                return
+            
+            report = io.BytesIO(profiler.collapsed().encode('utf-8'))
+            report.name = f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+            top = '\n'.join(f"{count} × {label}" for label, count in profiler.top())
+            await self.client.send_file(
+                chat_id,
+                report,
+                force_document=True,
+                caption=f"🔬 {profiler.samples} نمونه در {duration} ثانیه\n\n{top}"[:1000]
+            )
+        except Exception as e:
+            logger.error(f"Error profiling bot: {e}")
+            await self.client.send_message(chat_id, "❌ خطا در پروفایل ربات.")
+    
+    async def handle_stats(self, event):
+        """آمار لحظه‌ای ربات (فقط مدیر)"""
+        if not self.config.ADMIN_USER_ID or event.sender_id != self.config.ADMIN_USER_ID:
+            return
+        
+        stats = self.stats
+        lines = [
+            "📊 **آمار ربات**",
+            "",
+            f"👥 جلسه‌های فعال: {len(self.user_sessions)}",
+            f"⏳ در صف: {self.session_locks.waiting()} | "
+            f"در حال اجرا: دانلود {stats.running['download']}، آماده‌سازی {stats.running['render']}، "
+            f"آپلود {stats.running['upload']}، ffmpeg {self.audio_converter.runner.active}",
+            "",
+            "⏱️ **زمان مراحل (p50 / p95)**",
+        ]
+        for group, title in (('download', 'دانلود'), ('edit', 'ویرایش'), ('upload', 'آپلود')):
+            window = stats.latencies.get(group)
+            if window:
+                lines.append(f"• {title}: {window.percentile(0.5):.2f}s / {window.percentile(0.95):.2f}s "
+                             f"({len(window)} نمونه)")
+            else:
+                lines.append(f"• {title}: بدون داده")
+        
+        lines += ["", "🎯 **نرخ برخورد کش**"]
+        for name, cache in stats.caches.items():
+            lines.append(f"• {name}: {cache.ratio:.0%} ({cache.hits}/{cache.hits + cache.misses})")
+        
+        temp_used = stats.disk_bytes(os.path.basename(os.path.normpath(self.config.TEMP_DIR)))
+        quota = self.config.TEMP_QUOTA
+        checked = f"{time.time() - stats.disk_checked:.0f}s پیش" if stats.disk_checked else "هنوز محاسبه نشده"
+        usage = f"{format_size(temp_used)} از {format_size(quota)} ({temp_used / quota:.0%})" if quota \
+            else format_size(temp_used)
+        lines += ["", f"💾 فضای موقت: {usage} — {checked}"]
+        budget = self.audio_editor.memory_budget
+        limit = format_size(budget.limit) if budget.limit else "نامحدود"
+        lines.append(f"🧠 حافظه تگ و کاور: {format_size(budget.in_use)} از {limit} "
+                     f"(بیشینه {format_size(budget.peak)}، {budget.waits} انتظار)")
+        
+        top_users = stats.top_users()
+        if top_users:
+            lines += ["", "🏆 **بیشترین حجم پردازش شده**"]
+            lines += [f"{rank}. `{user_id}`: {format_size(size)}"
+                      for rank, (user_id, size) in enumerate(top_users, 1)]
+        
+        await event.respond('\n'.join(lines))
+    
+    async def _save_autocomplete(self):
+        """ذخیره دوره‌ای مقادیر جدید تکمیل خودکار در رشته جداگانه"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.config.AUTOCOMPLETE_SAVE_INTERVAL)
+            if self.autocomplete.dirty:
+                await loop.run_in_executor(None, self.autocomplete.save)
+    
+    async def _refresh_disk_usage(self):
+        """محاسبه دوره‌ای حجم پوشه‌های کاری در رشته جداگانه"""
+        loop = asyncio.get_running_loop()
+        directories = (self.config.TEMP_DIR, self.config.OUTPUT_DIR)
+        while True:
+            try:
+                self.stats.set_disk_usage(await loop.run_in_executor(None, directory_usage, directories))
+            except Exception as e:
+                logger.error(f"Error measuring disk usage: {e}")
+            await asyncio.sleep(self.config.DISK_USAGE_INTERVAL)
+    
+    def _touch_session(self, user_id: int):
+        session = self.user_sessions.get(user_id)
+        if session is not None:
+            session['last_active'] = time.monotonic()
+    
+    def _close_session(self, user_id: int):
+        """پایان جلسه کاربر: لغو آماده‌سازی و حذف فایل موقت"""
+        session = self.user_sessions.pop(user_id, None)
+        if session is None:
+            return
+        self.discard_render(session)
+        self._cancel_suggestions(session)
+        if 'temp_file' in session and os.path.exists(session['temp_file']):
+            os.remove(session['temp_file'])
+    
+    def expire_sessions(self, now: float = None) -> int:
+        """بستن جلسه‌هایی که بیش از SESSION_TTL بی‌فعالیت مانده‌اند"""
+        now = time.monotonic() if now is None else now
+        expired = [
+            user_id for user_id, session in self.user_sessions.items()
+            if now - session.get('last_active', now) > self.config.SESSION_TTL
+            # A handler of this user is running or waiting; it touches the session when done
+            and not self.session_locks.locked(user_id)
+            and session['state'].name != SAVING
+        ]
+        for user_id in expired:
+            self._close_session(user_id)
+        if expired:
+            logger.info(f"Closed {len(expired)} idle sessions, {len(self.user_sessions)} still open")
+        return len(expired)
+    
+    async def _expire_sessions(self):
+        """بررسی دوره‌ای جلسه‌های بی‌فعالیت"""
+        while True:
+            await asyncio.sleep(min(self.config.SESSION_TTL / 4, 60))
+            try:
+                self.expire_sessions()
+            except Exception as e:
+                logger.error(f"Error expiring sessions: {e}")
+    
+    async def handle_document(self, event, resumed: bool = False):
+        """پردازش فایل‌های ارسالی (resumed: ادامه کار نیمه‌تمام پس از راه‌اندازی مجدد)"""
         user_id = event.sender_id
         document = event.document
         
         if not document:
             return
         
+        # Shutting down: work accepted now could not finish; the file is sent again after the restart
+        if self.draining and not resumed:
+            await event.respond("🔄 ربات در حال به‌روزرسانی است. لطفاً چند لحظه دیگر فایل را دوباره ارسال کنید.")
+            return
+        
         # Check file size
         if document.size > self.config.MAX_FILE_SIZE:
             await event.respond(f"❌ حجم فایل بیش از حد مجاز است. حداکثر: {self.config.MAX_FILE_SIZE // (1024*1024)}MB")
@@ -176,6 +516,14 @@ class MusicBot:
         
         # Check file extension
         file_ext = os.path.splitext(file_name)[1].lower()
+        
+        # A CUE sheet or track list sent while the user is splitting a mix
+        session = self.user_sessions.get(user_id)
+        if file_ext in ('.cue', '.txt') and session and session['state'].accepts('tracklist'):
+            data = await self.client.download_media(document, bytes)
+            await self.split_into_tracks(event, self._decode_text(data))
+            return
+        
         if file_ext not in self.config.SUPPORTED_AUDIO_FORMATS and not is_audio:
             await event.respond(
                 f"❌ فرمت فایل پشتیبانی نمی‌شود.\n"
@@ -183,30 +531,73 @@ class MusicBot:
             )
             return
         
+        # A new file replaces whatever the user was editing before
+        self._close_session(user_id)
+        
         # Send processing message
         processing_msg = await event.respond("⏳ در حال دانلود و پردازش فایل...")
         
+        # Recorded until the menu is shown, so a restart picks the file up again
+        temp_file_path = os.path.join(self.config.TEMP_DIR, f"temp_{user_id}_{file_name}")
+        job_id = self.jobs.add('document', user_id, event.chat_id, 'download',
+                               message_id=event.id, temp_file=temp_file_path)
+        
         try:
-            # Download file
-            temp_file_path = os.path.join(self.config.TEMP_DIR, f"temp_{user_id}_{file_name}")
-            await self.client.download_media(document, temp_file_path)
+            reporter = ProgressReporter(processing_msg, "⏳ در حال دانلود فایل...",
+                                        allow=lambda: self.call_budget.allow(event.chat_id))
+            if resumed and os.path.exists(temp_file_path) and os.path.getsize(temp_file_path) == document.size:
+                # Downloaded completely before the restart
+                logger.info(f"Reusing {temp_file_path} downloaded before the restart")
+            else:
+                # Download file
+                started = time.perf_counter()
+                try:
+                    with self.metrics.stage('document', 'download'), \
+                            tracing.span('download', bytes=document.size), self.stats.job('download'):
+                        await self.client.download_media(document, temp_file_path, progress_callback=reporter.update)
+                finally:
+                    await reporter.finish()
+                self.metrics.transfer('download', document.size, time.perf_counter() - started)
+                self.stats.processed(user_id, document.size)
+            self.jobs.checkpoint(job_id, 'parse')
+            if reporter.api_calls and self.call_budget.allow(event.chat_id):
+                await processing_msg.edit("⏳ در حال پردازش فایل...")
+                reporter.api_calls += 1
             
             # Extract metadata
-            metadata = self.audio_editor.get_metadata(temp_file_path)
+            loop = asyncio.get_running_loop()
+            with self.metrics.stage('document', 'parse'):
+                metadata = await loop.run_in_executor(None, tracing.bind(self.audio_editor.get_metadata), temp_file_path)
+            
+            # Recordings seen before fill in the tags this copy is missing
+            with self.metrics.stage('document', 'fingerprint'), tracing.span('fingerprint'):
+                track_fingerprint, known_track = await self.identify_track(temp_file_path)
+            if known_track:
+                for field in self.audio_editor.TAG_FIELDS:
+                    if not metadata.get(field) and known_track['metadata'].get(field):
+                        metadata[field] = known_track['metadata'][field]
             
             # Create user session
             self.user_sessions[user_id] = {
                 'temp_file': temp_file_path,
                 'original_filename': file_name,
+                'chat_id': event.chat_id,
+                'message_id': event.id,
                 'metadata': metadata,
-                'editing_state': 'main_menu'
+                'state': SessionState(),
+                'fingerprint': track_fingerprint,
+                'known_track': known_track,
+                'api_calls': reporter.api_calls,
+                'last_active': time.monotonic()
             }
             
             # Show main menu
             await self.show_main_menu(event, processing_msg)
+            self.jobs.finish(job_id)
             
         except Exception as e:
             logger.error(f"Error processing file: {e}")
+            self.jobs.finish(job_id)
             await processing_msg.edit("❌ خطا در پردازش فایل. لطفاً دوباره تلاش کنید.")
             
             # Clean up
@@ -215,8 +606,8 @@ class MusicBot:
             if os.path.exists(temp_file_path):
                 os.remove(temp_file_path)
     
-    async def show_main_menu(self, event, message_to_edit=None):
-        """نمایش منوی اصلی ویرایش"""
+    async def show_main_menu(self, event, message_to_edit=None, notice: str = None):
+        """نمایش منوی اصلی ویرایش (notice: پیام تأیید بالای منو)"""
         user_id = event.sender_id
         
         if user_id not in self.user_sessions:
@@ -236,9 +627,10 @@ class MusicBot:
 🎭 **ژانر:** {metadata.get('genre', 'نامشخص')}
 📅 **سال:** {metadata.get('year', 'نامشخص')}
 🔢 **ترک:** {metadata.get('track', 'نامشخص')}
+🥁 **BPM:** {metadata.get('bpm') or 'نامشخص'}
 ⏱️ **مدت:** {int(metadata.get('duration', 0))} ثانیه
 🖼️ **کاور:** {'✅ دارد' if metadata.get('has_cover') else '❌ ندارد'}
-
+{'🔁 **این ترک قبلاً ویرایش شده است.**' if session.get('known_track') else ''}
 **چه کاری می‌خواهید انجام دهید؟**
         """
         
@@ -247,14 +639,61 @@ class MusicBot:
             [Button.inline("✏️ ویرایش متادیتا", b"edit_metadata")],
             [Button.inline("🖼️ ویرایش کاور", b"edit_cover")],
             [Button.inline("📁 تغییر نام فایل", b"change_filename")],
+            [Button.inline("✂️ تقسیم به ترک‌ها", b"split_tracks")],
+            [Button.inline("🔄 تبدیل فرمت", b"convert_menu")],
+            [Button.inline("🔇 حذف سکوت ابتدا و انتها", b"trim_silence")],
+            [Button.inline("🔊 محاسبه ReplayGain", b"replaygain")],
+            [Button.inline("📊 شکل موج و طیف‌نگار", b"waveform")],
             [Button.inline("💾 ذخیره و دانلود", b"save_download")],
             [Button.inline("❌ لغو", b"cancel")]
         ]
         
+        if session.get('known_track'):
+            buttons.insert(0, [Button.inline("📋 استفاده از متادیتای قبلی", b"known_metadata")])
+        
+        # Lossless gain needs an MP3 and a measured ReplayGain value
+        if session['temp_file'].lower().endswith('.mp3'):
+            if metadata.get('replaygain_track_gain'):
+                buttons.insert(-2, [Button.inline("🎚️ اعمال بهره (بدون افت کیفیت)", b"apply_gain")])
+            if session.get('gain_applied'):
+                buttons.insert(-2, [Button.inline("↩️ بازگردانی بهره", b"undo_gain")])
+        
+        # Confirmations ride along with the menu instead of costing a message of their own
+        if notice:
+            info_text = f"\n{notice}\n{info_text}"
+        
+        if message_to_edit is None and self.config.SINGLE_MESSAGE_UI and session.get('menu_message_id'):
+            try:
+                await self.client.edit_message(
+                    event.chat_id, session['menu_message_id'], info_text, buttons=buttons
+                )
+                self.call_budget.spend(event.chat_id)
+                return
+            except MessageNotModifiedError:
+                return
+            except Exception as e:
+                # Deleted or no longer editable: fall back to a new menu message
+                logger.error(f"Error editing menu message: {e}")
+        
         if message_to_edit:
             await message_to_edit.edit(info_text, buttons=buttons)
+            # Callback events carry the message id separately from the query id
+            session['menu_message_id'] = getattr(message_to_edit, 'message_id', None) or message_to_edit.id
         else:
-            await event.respond(info_text, buttons=buttons)
+            message = await event.respond(info_text, buttons=buttons)
+            session['menu_message_id'] = message.id
+        self.call_budget.spend(event.chat_id)
+    
+    async def show_status(self, event, text: str):
+        """نمایش پیام وضعیت؛ در حالت تک‌پیامی روی همان پیام منو"""
+        session = self.user_sessions.get(event.sender_id, {})
+        self.call_budget.spend(event.chat_id)
+        if self.config.SINGLE_MESSAGE_UI and session.get('menu_message_id'):
+            try:
+                return await self.client.edit_message(event.chat_id, session['menu_message_id'], text)
+            except Exception as e:
+                logger.error(f"Error editing menu message: {e}")
+        return await event.respond(text)
     
     async def handle_callback(self, event):
         """پردازش callback query ها"""
@@ -265,29 +704,53 @@ class MusicBot:
             await event.answer("❌ لطفاً ابتدا فایل صوتی ارسال کنید.", alert=True)
             return
         
-        session = self.user_sessions[user_id]
+        # A second tap while the first is running (or just finished) does nothing
+        scope = (user_id, event.message_id)
+        if not self.duplicate_clicks.claim(scope, data):
+            logger.info(f"Dropped duplicate {data!r} from {user_id} "
+                        f"({self.duplicate_clicks.total_dropped} duplicates dropped so far)")
+            await event.answer("⏳ در حال انجام...")
+            return
         
-        if data == "edit_metadata":
-            await self.show_metadata_menu(event)
-        elif data == "edit_cover":
-            await self.show_cover_menu(event)
-        elif data == "change_filename":
-            await self.start_filename_change(event)
-        elif data == "save_download":
-            await self.save_and_download(event)
-        elif data == "cancel":
-            await self.handle_cancel_callback(event)
-        elif data == "back_main":
-            await self.show_main_menu(event, event.query.message)
-        elif data.startswith("edit_"):
-            await self.start_metadata_edit(event, data)
-        elif data.startswith("cover_"):
-            await self.handle_cover_action(event, data)
+        # Only a tap that did its work opens the duplicate window; a retry after an error is a new request
+        succeeded = False
+        try:
+            async with self.session_locks.hold(user_id):
+                # The session may have ended while this tap waited for the lock
+                session = self.user_sessions.get(user_id)
+                if session is None:
+                    await event.answer("❌ لطفاً ابتدا فایل صوتی ارسال کنید.", alert=True)
+                    return
+                
+                # The file is already being written and sent; nothing can change it now
+                if session['state'].name == SAVING:
+                    await event.answer("⏳ در حال ذخیره فایل...")
+                    return
+                
+                self._cancel_suggestions(session)
+                try:
+                    await self.router.dispatch_callback(event, data)
+                except InvalidTransition as e:
+                    logger.error(f"Rejected callback {data!r} for {user_id}: {e}")
+                    await event.answer("❌ این عملیات در وضعیت فعلی امکان‌پذیر نیست.", alert=True)
+                    return
+                succeeded = scope not in self.failed_taps
+        finally:
+            self.failed_taps.discard(scope)
+            self.duplicate_clicks.release(scope, data, succeeded)
         
         await event.answer()
     
+    async def return_to_main_menu(self, event):
+        """بازگشت به منوی اصلی و رها کردن ورودی در انتظار"""
+        self.user_sessions[event.sender_id]['state'].to(MAIN_MENU)
+        await self.show_main_menu(event, event)
+    
     async def show_metadata_menu(self, event):
         """نمایش منوی ویرایش متادیتا"""
+        user_id = event.sender_id
+        session = self.user_sessions[user_id]
+        session['state'].to(MAIN_MENU)
         text = "✏️ **کدام قسمت را می‌خواهید ویرایش کنید؟**"
         
         buttons = [
@@ -297,16 +760,98 @@ class MusicBot:
             [Button.inline("🎭 ژانر (Genre)", b"edit_genre")],
             [Button.inline("📅 سال انتشار (Year)", b"edit_year")],
             [Button.inline("🔢 شماره ترک (Track)", b"edit_track")],
+            [Button.inline("🥁 تمپو (BPM)", b"edit_bpm")],
+            [Button.inline("🔍 تشخیص خودکار BPM", b"detect_bpm")],
             [Button.inline("🔙 بازگشت", b"back_main")]
         ]
         
+        # One-tap suggestions from the metadata service; the menu never waits for a lookup
+        if session.get('suggestions_for') == self._suggestion_query(session):
+            await event.edit(*self._with_suggestions(text, buttons, session['suggestions']))
+            return
+        
         await event.edit(text, buttons=buttons)
+        if self.metadata_lookup.enabled:
+            session['suggest_task'] = asyncio.create_task(self._show_suggestions(event, session, text, buttons))
+    
+    async def _show_suggestions(self, event, session: Dict, text: str, buttons):
+        """افزودن پیشنهادها به منوی متادیتای نمایش داده شده، پس از رسیدن پاسخ سرویس"""
+        suggestions = await self.fetch_suggestions(session)
+        session.pop('suggest_task', None)
+        # Skipped edits are not lost: the next open shows the stored suggestions right away
+        if not suggestions or not self.call_budget.allow(event.chat_id):
+            return
+        try:
+            await event.edit(*self._with_suggestions(text, buttons, suggestions))
+        except Exception as e:
+            logger.error(f"Error adding metadata suggestions to the menu: {e}")
+    
+    def _cancel_suggestions(self, session: Optional[Dict]):
+        """رها کردن جستجوی پیشنهاد وقتی کاربر از منوی متادیتا رفته است"""
+        task = session and session.pop('suggest_task', None)
+        if task:
+            task.cancel()
+    
+    def _with_suggestions(self, text: str, buttons, suggestions):
+        if not suggestions:
+            return text, buttons
+        text += "\n\n💡 **پیشنهادها** (برای اعمال همه فیلدها لمس کنید):"
+        return text, [[Button.inline(f"💡 {self._suggestion_label(suggestion)}", f"suggest_{index}".encode())]
+                      for index, suggestion in enumerate(suggestions)] + buttons
+    
+    @staticmethod
+    def _suggestion_query(session: Dict):
+        metadata = session['metadata']
+        return metadata.get('artist', ''), metadata.get('title', '')
+    
+    async def fetch_suggestions(self, session: Dict, limit: int = 3):
+        """دریافت پیشنهاد متادیتا بر اساس نام و هنرمند یا اثرانگشت"""
+        if not self.metadata_lookup.enabled:
+            return []
+        
+        query = self._suggestion_query(session)
+        try:
+            suggestions = await self.metadata_lookup.search(*query)
+            if not suggestions and session.get('fingerprint'):
+                suggestions = await self.metadata_lookup.search_fingerprint(session['fingerprint'][0])
+            # Reused until the artist or title changes
+            session['suggestions_for'] = query
+            
+        except Exception as e:
+            logger.error(f"Error fetching metadata suggestions: {e}")
+            suggestions = []
+        
+        session['suggestions'] = suggestions[:limit]
+        return session['suggestions']
+    
+    def _suggestion_label(self, suggestion: Dict[str, str]) -> str:
+        """متن کوتاه دکمه پیشنهاد"""
+        label = " - ".join(value for value in (suggestion.get('artist'), suggestion.get('title')) if value)
+        if suggestion.get('year'):
+            label += f" ({suggestion['year']})"
+        return label[:60] or suggestion.get('album', '?')[:60]
+    
+    async def apply_suggestion(self, event, payload):
+        """اعمال یک پیشنهاد متادیتا"""
+        user_id = event.sender_id
+        session = self.user_sessions[user_id]
+        
+        index = int(payload.split('_', 1)[1])
+        suggestions = session.get('suggestions', [])
+        if index >= len(suggestions):
+            await event.respond("❌ این پیشنهاد دیگر در دسترس نیست.")
+            return
+        
+        session['metadata'].update(suggestions[index])
+        self.schedule_render(user_id)
+        await self.show_main_menu(event, event)
     
     async def show_cover_menu(self, event):
         """نمایش منوی ویرایش کاور"""
         user_id = event.sender_id
         session = self.user_sessions[user_id]
         has_cover = session['metadata'].get('has_cover', False)
+        session['state'].to(MAIN_MENU)
         
         text = "🖼️ **ویرایش کاور آلبوم**"
         
@@ -336,7 +881,8 @@ class MusicBot:
             'edit_album': ('album', 'نام آلبوم'),
             'edit_genre': ('genre', 'ژانر'),
             'edit_year': ('year', 'سال انتشار'),
-            'edit_track': ('track', 'شماره ترک')
+            'edit_track': ('track', 'شماره ترک'),
+            'edit_bpm': ('bpm', 'تمپو (BPM)')
         }
         
         if edit_type not in field_map:
@@ -345,7 +891,7 @@ class MusicBot:
         field, field_name = field_map[edit_type]
         current_value = session['metadata'].get(field, 'تنظیم نشده')
         
-        session['editing_state'] = f'editing_{field}'
+        session['state'].to(EDITING_FIELD, field)
         
         text = f"""
 ✏️ **ویرایش {field_name}**
@@ -357,13 +903,35 @@ class MusicBot:
         
         buttons = [[Button.inline("❌ لغو", b"edit_metadata")]]
         
+        # Frequent values from earlier edits, closest to the current value first
+        if field in AUTOCOMPLETE_FIELDS:
+            current = session['metadata'].get(field, '')
+            suggestions = self.autocomplete.suggest(field, current) if current else []
+            suggestions = suggestions or self.autocomplete.suggest(field)
+            session['autocomplete'] = suggestions
+            buttons = [[Button.inline(f"✨ {value}"[:60], f"ac_{index}".encode())]
+                       for index, value in enumerate(suggestions)] + buttons
+        
         await event.edit(text, buttons=buttons)
     
+    async def apply_autocomplete(self, event, payload):
+        """انتخاب یکی از مقادیر پیشنهادی برای فیلد در حال ویرایش"""
+        user_id = event.sender_id
+        session = self.user_sessions[user_id]
+        
+        state = session['state']
+        index = int(payload.split('_', 1)[1])
+        suggestions = session.get('autocomplete', [])
+        if state.name != EDITING_FIELD or index >= len(suggestions):
+            return
+        
+        await self.update_metadata_field(event, state.field, suggestions[index])
+    
     async def start_filename_change(self, event):
         """شروع تغییر نام فایل"""
         user_id = event.sender_id
         session = self.user_sessions[user_id]
-        session['editing_state'] = 'editing_filename'
+        session['state'].to(EDITING_FILENAME)
         
         current_name = session.get('custom_filename', session['original_filename'])
         
@@ -392,13 +960,422 @@ class MusicBot:
         
         await event.edit(text, buttons=buttons)
     
+    async def start_track_split(self, event):
+        """شروع تقسیم فایل بلند به ترک‌ها"""
+        user_id = event.sender_id
+        session = self.user_sessions[user_id]
+        session['state'].to(WAITING_TRACKLIST)
+        
+        text = """
+✂️ **تقسیم فایل به ترک‌ها**
+
+فایل **CUE** را ارسال کنید یا لیست زمان‌بندی را بفرستید، مثلاً:
+
+`00:00 Artist - Intro`
+`03:25 Artist - Second Track`
+`1:02:10 Final Track`
+
+ترک‌ها بدون افت کیفیت جدا شده و با اطلاعات هر ترک برچسب‌گذاری می‌شوند.
+        """
+        
+        buttons = [[Button.inline("❌ لغو", b"back_main")]]
+        
+        await event.edit(text, buttons=buttons)
+    
+    async def split_into_tracks(self, event, text):
+        """تقسیم فایل بر اساس شیت CUE یا لیست زمان‌بندی و ارسال ترک‌ها"""
+        user_id = event.sender_id
+        session = self.user_sessions[user_id]
+        
+        tracks = parse_track_list(text)
+        if not tracks:
+            await event.respond("❌ زمان‌بندی معتبری پیدا نشد. لطفاً شیت CUE یا لیست زمان‌ها را دوباره ارسال کنید.")
+            return
+        
+        session['state'].to(MAIN_MENU)
+        processing_msg = await event.respond(f"⏳ در حال تقسیم فایل به {len(tracks)} ترک...")
+        output_dir = os.path.join(self.config.OUTPUT_DIR, f"split_{user_id}")
+        
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            
+            # Splitting reads the whole source, keep it off the event loop
+            loop = asyncio.get_running_loop()
+            track_paths = await loop.run_in_executor(
+                None,
+                self.audio_editor.split_tracks,
+                session['temp_file'],
+                tracks,
+                output_dir,
+                session['metadata']
+            )
+            
+            if not track_paths:
+                await processing_msg.edit("❌ خطا در تقسیم فایل. این قابلیت برای MP3 و WAV در دسترس است.")
+                return
+            
+            await processing_msg.edit(f"⏳ در حال ارسال {len(track_paths)} ترک...")
+            
+            # Upload all tracks concurrently, then post them in track order
+            semaphore = asyncio.Semaphore(self.config.MAX_PARALLEL_UPLOADS)
+            
+            async def upload(path):
+                async with semaphore:
+                    return await self.client.upload_file(path)
+            
+            uploaded = await asyncio.gather(*(upload(path) for path in track_paths))
+            
+            for path, handle in zip(track_paths, uploaded):
+                track_filename = os.path.basename(path)
+                await self.client.send_file(
+                    event.chat_id,
+                    handle,
+                    attributes=[DocumentAttributeFilename(track_filename)],
+                    force_document=True
+                )
+            
+            await processing_msg.delete()
+            await self.show_main_menu(event)
+            
+        except Exception as e:
+            logger.error(f"Error splitting tracks: {e}")
+            await processing_msg.edit("❌ خطا در تقسیم فایل.")
+        
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+    
+    async def show_convert_menu(self, event):
+        """نمایش منوی تبدیل فرمت"""
+        text = "🔄 **فرمت و کیفیت خروجی را انتخاب کنید:**"
+        
+        buttons = [
+            [Button.inline("MP3 320k", b"convert_mp3_320k"),
+             Button.inline("MP3 192k", b"convert_mp3_192k"),
+             Button.inline("MP3 128k", b"convert_mp3_128k")],
+            [Button.inline("Opus 160k", b"convert_opus_160k"),
+             Button.inline("Opus 96k", b"convert_opus_96k")],
+            [Button.inline("OGG 192k", b"convert_ogg_192k"),
+             Button.inline("FLAC", b"convert_flac")],
+            [Button.inline("🔙 بازگشت", b"back_main")]
+        ]
+        
+        await event.edit(text, buttons=buttons)
+    
+    async def convert_and_send(self, event, payload):
+        """تبدیل فرمت و ارسال همزمان خروجی در حین کدگذاری"""
+        user_id = event.sender_id
+        session = self.user_sessions[user_id]
+        
+        parts = payload.split('_')
+        target = parts[1] if len(parts) > 1 else ''
+        bitrate = parts[2] if len(parts) > 2 else None
+        if target not in OUTPUT_FORMATS:
+            return
+        
+        if 'custom_filename' in session:
+            base_name = session['custom_filename']
+        else:
+            base_name = self.audio_editor.generate_filename(session['metadata'], "{artist} - {title}")
+        output_filename = self.audio_converter.output_filename(base_name, target)
+        
+        processing_msg = await event.respond(f"⏳ در حال تبدیل به {target.upper()} و ارسال...")
+        
+        try:
+            chunks = self.audio_converter.convert_stream(
+                session['temp_file'],
+                target,
+                session['metadata'],
+                bitrate
+            )
+            uploaded = await self.stream_uploader.upload(chunks, output_filename)
+            
+            await self.client.send_file(
+                event.chat_id,
+                uploaded,
+                caption=f"✅ فایل تبدیل شده آماده است!\n📁 **نام:** {output_filename}",
+                attributes=[DocumentAttributeFilename(output_filename)],
+                force_document=True
+            )
+            await processing_msg.delete()
+            
+        except Exception as e:
+            logger.error(f"Error converting file: {e}")
+            self._tap_failed(event)
+            await processing_msg.edit("❌ خطا در تبدیل فرمت فایل.")
+    
+    async def analyze_loudness(self, event):
+        """تحلیل بلندی صدا و افزودن تگ‌های ReplayGain به متادیتا"""
+        user_id = event.sender_id
+        session = self.user_sessions[user_id]
+        temp_file = session['temp_file']
+        
+        processing_msg = await event.respond("⏳ در حال تحلیل بلندی صدا...")
+        
+        try:
+            # Decoding and filtering run in a worker process
+            loop = asyncio.get_running_loop()
+            tags = await loop.run_in_executor(
+                None, analyze_album, [temp_file], 1, self.config.FFMPEG_BINARY
+            )
+            
+            # Written to the file together with the other tags on save
+            session['metadata'].update(tags[temp_file])
+            self.schedule_render(user_id)
+            
+            await processing_msg.edit(
+                f"✅ تحلیل انجام شد.\n"
+                f"🔊 **بهره ReplayGain:** {tags[temp_file]['replaygain_track_gain']}\n"
+                f"📈 **پیک:** {tags[temp_file]['replaygain_track_peak']}"
+            )
+            await self.show_main_menu(event)
+            
+        except Exception as e:
+            logger.error(f"Error analyzing loudness: {e}")
+            self._tap_failed(event)
+            await processing_msg.edit("❌ خطا در تحلیل بلندی صدا.")
+    
+    async def identify_track(self, file_path: str):
+        """محاسبه اثرانگشت فایل و جستجوی آن در ترک‌های شناخته شده"""
+        try:
+            loop = asyncio.get_running_loop()
+            hashes, offsets = await loop.run_in_executor(
+                None, fingerprint, file_path, self.config.FFMPEG_BINARY
+            )
+            known_track = await loop.run_in_executor(None, self.fingerprint_index.match, hashes, offsets)
+            return (hashes, offsets), known_track
+            
+        except Exception as e:
+            logger.error(f"Error fingerprinting file: {e}")
+            return None, None
+    
+    async def apply_known_metadata(self, event):
+        """جایگزینی متادیتا با متادیتای ذخیره شده برای همین ترک"""
+        user_id = event.sender_id
+        session = self.user_sessions[user_id]
+        
+        known = session['known_track']['metadata']
+        session['metadata'].update({field: known[field] for field in self.audio_editor.TAG_FIELDS
+                                    if known.get(field)})
+        self.schedule_render(user_id)
+        await self.show_main_menu(event, event)
+    
+    def remember_track(self, session: Dict):
+        """ذخیره متادیتای نهایی در ایندکس اثرانگشت برای آپلودهای بعدی"""
+        if not session.get('fingerprint') or not len(session['fingerprint'][0]):
+            return
+        metadata = {field: session['metadata'].get(field, '') for field in self.audio_editor.TAG_FIELDS}
+        if session.get('known_track'):
+            self.fingerprint_index.update_metadata(session['known_track']['track_id'], metadata)
+        else:
+            hashes, offsets = session['fingerprint']
+            self.fingerprint_index.add(hashes, offsets, metadata)
+    
+    async def detect_tempo(self, event):
+        """تشخیص خودکار تمپو و افزودن آن به متادیتا"""
+        user_id = event.sender_id
+        session = self.user_sessions[user_id]
+        
+        processing_msg = await event.respond("⏳ در حال تشخیص تمپو...")
+        
+        try:
+            loop = asyncio.get_running_loop()
+            bpm = await loop.run_in_executor(
+                None, tracing.bind(self.audio_editor.detect_bpm), session['temp_file'], self.config.FFMPEG_BINARY
+            )
+            if not bpm:
+                await processing_msg.edit("❌ تمپوی این فایل قابل تشخیص نیست.")
+                return
+            
+            # Written to the file together with the other tags on save
+            session['metadata']['bpm'] = bpm
+            self.schedule_render(user_id)
+            
+            await processing_msg.edit(f"✅ تمپو: **{bpm} BPM**")
+            await self.show_main_menu(event)
+            
+        except Exception as e:
+            logger.error(f"Error detecting tempo: {e}")
+            self._tap_failed(event)
+            await processing_msg.edit("❌ خطا در تشخیص تمپو.")
+    
+    async def trim_file_silence(self, event):
+        """حذف سکوت ابتدا و انتهای فایل جلسه"""
+        user_id = event.sender_id
+        session = self.user_sessions[user_id]
+        temp_file = session['temp_file']
+        
+        processing_msg = await event.respond("⏳ در حال جستجوی سکوت...")
+        
+        try:
+            loop = asyncio.get_running_loop()
+            trimmed = await loop.run_in_executor(
+                None, tracing.bind(self.audio_editor.trim_silence), temp_file, None,
+                self.config.SILENCE_THRESHOLD_DB, 0.1, self.config.FFMPEG_BINARY
+            )
+            if trimmed is None:
+                self._tap_failed(event)
+                await processing_msg.edit("❌ خطا در حذف سکوت.")
+                return
+            
+            head, tail = trimmed
+            if not head and not tail:
+                await processing_msg.edit("ℹ️ سکوتی در ابتدا یا انتهای فایل پیدا نشد.")
+                return
+            
+            metadata = await loop.run_in_executor(None, tracing.bind(self.audio_editor.get_metadata), temp_file)
+            session['metadata']['duration'] = metadata.get('duration', session['metadata'].get('duration', 0))
+            self._audio_changed(user_id, session)
+            
+            await processing_msg.edit(
+                f"✅ سکوت حذف شد.\n"
+                f"⏮️ **ابتدا:** {head:.1f} ثانیه\n"
+                f"⏭️ **انتها:** {tail:.1f} ثانیه"
+            )
+            await self.show_main_menu(event)
+            
+        except Exception as e:
+            logger.error(f"Error trimming silence: {e}")
+            self._tap_failed(event)
+            await processing_msg.edit("❌ خطا در حذف سکوت.")
+    
+    async def show_waveform(self, event):
+        """ارسال تصویر شکل موج و طیف‌نگار فایل"""
+        user_id = event.sender_id
+        session = self.user_sessions[user_id]
+        temp_file = session['temp_file']
+        
+        processing_msg = await event.respond("⏳ در حال رسم شکل موج...")
+        
+        try:
+            loop = asyncio.get_running_loop()
+            if 'payload_hash' not in session:
+                session['payload_hash'] = await loop.run_in_executor(None, payload_hash, temp_file)
+            
+            images = await asyncio.gather(*[
+                loop.run_in_executor(None, self.thumbnail_cache.get, temp_file, kind, session['payload_hash'])
+                for kind in ('waveform', 'spectrogram')
+            ])
+            if not all(images):
+                self._tap_failed(event)
+                await processing_msg.edit("❌ خطا در رسم شکل موج.")
+                return
+            
+            files = []
+            for kind, data in zip(('waveform', 'spectrogram'), images):
+                image = io.BytesIO(data)
+                image.name = f"{kind}.png"
+                files.append(image)
+            
+            await self.client.send_file(
+                event.chat_id,
+                files,
+                caption="📊 شکل موج (قرمز: بخش‌های کلیپ شده) و طیف‌نگار"
+            )
+            await processing_msg.delete()
+            
+        except Exception as e:
+            logger.error(f"Error rendering waveform: {e}")
+            self._tap_failed(event)
+            await processing_msg.edit("❌ خطا در رسم شکل موج.")
+    
+    async def apply_lossless_gain(self, event):
+        """اعمال بهره ReplayGain روی فریم‌های MP3 بدون کدگذاری مجدد"""
+        user_id = event.sender_id
+        session = self.user_sessions[user_id]
+        metadata = session['metadata']
+        
+        processing_msg = await event.respond("⏳ در حال اعمال بهره...")
+        
+        try:
+            gain_db = float(metadata['replaygain_track_gain'].split()[0])
+            loop = asyncio.get_running_loop()
+            applied = await loop.run_in_executor(
+                None, tracing.bind(self.audio_editor.adjust_mp3_gain), session['temp_file'], gain_db
+            )
+            if applied is None:
+                self._tap_failed(event)
+                await processing_msg.edit("❌ خطا در اعمال بهره.")
+                return
+            if not applied:
+                # Either below one 1.5 dB step, or every step would clip part of the file
+                await processing_msg.edit(
+                    "ℹ️ تغییر لازم کمتر از یک گام 1.5 دسی‌بلی است." if abs(gain_db) < GAIN_STEP_DB / 2
+                    else "ℹ️ تغییر بلندی صدا بدون کلیپ شدن بخشی از فایل ممکن نیست."
+                )
+                return
+            
+            self._shift_replaygain(metadata, applied)
+            session['gain_applied'] = session.get('gain_applied', 0.0) + applied
+            self._audio_changed(user_id, session)
+            
+            # Limited so that no part of the file clips
+            limited = "" if abs(applied - gain_db) < GAIN_STEP_DB else " (محدود شده برای جلوگیری از کلیپ)"
+            await processing_msg.edit(f"✅ بلندی صدا {applied:+.1f} دسی‌بل تغییر کرد{limited}.")
+            await self.show_main_menu(event)
+            
+        except Exception as e:
+            logger.error(f"Error applying gain: {e}")
+            self._tap_failed(event)
+            await processing_msg.edit("❌ خطا در اعمال بهره.")
+    
+    async def undo_lossless_gain(self, event):
+        """بازگرداندن بهره اعمال شده با تگ MP3GAIN_UNDO"""
+        user_id = event.sender_id
+        session = self.user_sessions[user_id]
+        
+        processing_msg = await event.respond("⏳ در حال بازگردانی بهره...")
+        
+        try:
+            loop = asyncio.get_running_loop()
+            if not await loop.run_in_executor(None, tracing.bind(self.audio_editor.undo_mp3_gain), session['temp_file']):
+                self._tap_failed(event)
+                await processing_msg.edit("❌ خطا در بازگردانی بهره.")
+                return
+            
+            self._shift_replaygain(session['metadata'], -session.pop('gain_applied', 0.0))
+            self._audio_changed(user_id, session)
+            
+            await processing_msg.edit("✅ بلندی صدا به حالت اولیه بازگشت.")
+            await self.show_main_menu(event)
+            
+        except Exception as e:
+            logger.error(f"Error undoing gain: {e}")
+            self._tap_failed(event)
+            await processing_msg.edit("❌ خطا در بازگردانی بهره.")
+    
+    def _audio_changed(self, user_id: int, session: Dict):
+        """پس از تغییر خود صدا (حذف سکوت، تغییر بهره): تحلیل‌های کش شده دیگر معتبر نیستند"""
+        session.pop('payload_hash', None)
+        self.schedule_render(user_id)
+    
+    def _shift_replaygain(self, metadata: Dict, applied_db: float):
+        """به‌روزرسانی تگ‌های ReplayGain پس از تغییر بلندی خود فایل"""
+        for scope in ('track', 'album'):
+            gain_key = f'replaygain_{scope}_gain'
+            peak_key = f'replaygain_{scope}_peak'
+            if metadata.get(gain_key):
+                gain = float(metadata[gain_key].split()[0]) - applied_db
+                metadata[gain_key] = f"{gain:+.2f} dB"
+            if metadata.get(peak_key):
+                peak = float(metadata[peak_key]) * 10 ** (applied_db / 20)
+                metadata[peak_key] = f"{peak:.6f}"
+    
+    def _decode_text(self, data: bytes) -> str:
+        """تبدیل محتوای فایل متنی با کدگذاری‌های رایج"""
+        for encoding in ('utf-8-sig', 'cp1256'):
+            try:
+                return data.decode(encoding)
+            except UnicodeDecodeError:
+                continue
+        return data.decode('latin-1')
+    
     async def handle_cover_action(self, event, action):
         """پردازش عملیات کاور"""
         user_id = event.sender_id
         session = self.user_sessions[user_id]
         
         if action == "cover_add" or action == "cover_replace":
-            session['editing_state'] = 'waiting_cover'
+            session['state'].to(WAITING_COVER)
             session['cover_action'] = action
             text = "🖼️ لطفاً تصویر کاور جدید را ارسال کنید."
             buttons = [[Button.inline("❌ لغو", b"edit_cover")]]
@@ -418,16 +1395,15 @@ class MusicBot:
             return
         
         session = self.user_sessions[user_id]
-        state = session.get('editing_state', '')
+        state = session['state']
         text = event.text.strip()
         
-        if state.startswith('editing_'):
-            field = state.replace('editing_', '')
-            
-            if field == 'filename':
-                await self.update_filename(event, text)
-            else:
-                await self.update_metadata_field(event, field, text)
+        if state.name == EDITING_FIELD:
+            await self.update_metadata_field(event, state.field, text)
+        elif state.name == EDITING_FILENAME:
+            await self.update_filename(event, text)
+        elif state.name == WAITING_TRACKLIST:
+            await self.split_into_tracks(event, text)
     
     async def update_metadata_field(self, event, field, value):
         """به‌روزرسانی فیلد متادیتا"""
@@ -436,7 +1412,13 @@ class MusicBot:
         
         # Update metadata
         session['metadata'][field] = value
-        session['editing_state'] = 'main_menu'
+        session['state'].to(MAIN_MENU)
+        session.pop('autocomplete', None)
+        self.schedule_render(user_id)
+        
+        # Written to disk by _save_autocomplete, not once per edit
+        if field in AUTOCOMPLETE_FIELDS:
+            self.autocomplete.record(field, value)
         
         field_names = {
             'title': 'نام آهنگ',
@@ -444,13 +1426,13 @@ class MusicBot:
             'album': 'نام آلبوم',
             'genre': 'ژانر',
             'year': 'سال انتشار',
-            'track': 'شماره ترک'
+            'track': 'شماره ترک',
+            'bpm': 'تمپو (BPM)'
         }
         
         field_name = field_names.get(field, field)
         
-        await event.respond(f"✅ {field_name} به '{value}' تغییر یافت.")
-        await self.show_main_menu(event)
+        await self.show_main_menu(event, notice=f"✅ {field_name} به '{value}' تغییر یافت.")
     
     async def update_filename(self, event, template):
         """به‌روزرسانی نام فایل"""
@@ -467,10 +1449,10 @@ class MusicBot:
                 filename += original_ext
             
             session['custom_filename'] = filename
-            session['editing_state'] = 'main_menu'
+            session['state'].to(MAIN_MENU)
+            self.schedule_render(user_id)
             
-            await event.respond(f"✅ نام فایل به '{filename}' تغییر یافت.")
-            await self.show_main_menu(event)
+            await self.show_main_menu(event, notice=f"✅ نام فایل به '{filename}' تغییر یافت.")
             
         except Exception as e:
             logger.error(f"Error updating filename: {e}")
@@ -484,7 +1466,10 @@ class MusicBot:
         try:
             cover_path = os.path.join(self.config.TEMP_DIR, f"cover_{user_id}.jpg")
             
-            if self.audio_editor.extract_cover_art(session['temp_file'], cover_path):
+            loop = asyncio.get_running_loop()
+            if await loop.run_in_executor(
+                None, tracing.bind(self.audio_editor.extract_cover_art), session['temp_file'], cover_path
+            ):
                 await self.client.send_file(
                     event.chat_id,
                     cover_path,
@@ -496,6 +1481,7 @@ class MusicBot:
                 
         except Exception as e:
             logger.error(f"Error extracting cover: {e}")
+            self._tap_failed(event)
             await event.respond("❌ خطا در استخراج کاور.")
         
         await self.show_cover_menu(event)
@@ -506,14 +1492,18 @@ class MusicBot:
         session = self.user_sessions[user_id]
         
         try:
-            if self.audio_editor.remove_cover_art(session['temp_file']):
+            loop = asyncio.get_running_loop()
+            if await loop.run_in_executor(None, tracing.bind(self.audio_editor.remove_cover_art), session['temp_file']):
                 session['metadata']['has_cover'] = False
+                self.schedule_render(user_id)
                 await event.respond("✅ کاور با موفقیت حذف شد.")
             else:
+                self._tap_failed(event)
                 await event.respond("❌ خطا در حذف کاور.")
                 
         except Exception as e:
             logger.error(f"Error removing cover: {e}")
+            self._tap_failed(event)
             await event.respond("❌ خطا در حذف کاور.")
         
         await self.show_cover_menu(event)
@@ -523,62 +1513,343 @@ class MusicBot:
         user_id = event.sender_id
         session = self.user_sessions[user_id]
         
+        clicked = time.perf_counter()
+        session['state'].to(SAVING)
         processing_msg = await event.respond("⏳ در حال ذخیره تغییرات...")
+        job_id = None
         
         try:
-            # Generate output filename
-            if 'custom_filename' in session:
-                output_filename = session['custom_filename']
-            else:
-                output_filename = self.audio_editor.generate_filename(
-                    session['metadata'],
-                    "{artist} - {title}"
-                )
-                original_ext = os.path.splitext(session['original_filename'])[1]
-                if not output_filename.endswith(original_ext):
-                    output_filename += original_ext
+            output_filename = self._output_filename(session)
+            caption = f"✅ فایل ویرایش شده آماده است!\n📁 **نام:** {output_filename}"
+            # Users saving files with the same tags must not share (and delete) one output file;
+            # Telegram shows output_filename from the attribute below
+            output_path = os.path.join(self.config.OUTPUT_DIR, f"{user_id}_{output_filename}")
             
-            output_path = os.path.join(self.config.OUTPUT_DIR, output_filename)
+            # Everything a restart needs to write and send this output again
+            job_id = self.jobs.add('save', user_id, event.chat_id, 'tag_write',
+                                   temp_file=session['temp_file'], metadata=session['metadata'],
+                                   output_filename=output_filename, output_path=output_path)
             
-            # Update metadata
-            if self.audio_editor.update_metadata(
-                session['temp_file'],
-                session['metadata'],
-                output_path
-            ):
+            # An output prepared in the background is sent as-is if nothing changed since
+            with self.metrics.stage('save', 'render_wait'), tracing.span('render_wait'):
+                rendered = await self.take_render(session, output_filename)
+            if rendered:
+                self._record_save_latency(clicked, 'speculative')
+                with self.metrics.stage('save', 'send_prepared'), tracing.span('send_prepared'):
+                    await self.client.send_file(
+                        event.chat_id,
+                        rendered['input_file'],
+                        caption=caption,
+                        attributes=[DocumentAttributeFilename(output_filename)]
+                    )
+                self.stats.processed(user_id, os.path.getsize(rendered['path']))
+                self._remove_file(rendered['path'])
+                saved = True
+            else:
+                loop = asyncio.get_running_loop()
+                with self.metrics.stage('save', 'tag_write'):
+                    # A copy: the session's tags must not change under the writer thread
+                    saved = await loop.run_in_executor(
+                        None, tracing.bind(self.audio_editor.update_metadata),
+                        session['temp_file'], dict(session['metadata']), output_path
+                    )
+                if saved:
+                    self.jobs.checkpoint(job_id, 'upload')
+            
+            if saved and not rendered:
+                first_byte = []
+                upload_parts = tracing.PartTimer('upload.part')
+                reporter = ProgressReporter(processing_msg, "⏳ در حال آپلود فایل...",
+                                            allow=lambda: self.call_budget.allow(event.chat_id))
+                
+                def on_progress(sent, total):
+                    if not first_byte:
+                        first_byte.append(True)
+                        self._record_save_latency(clicked, 'cold')
+                    upload_parts(sent, total)
+                    reporter.update(sent, total)
+                
                 # Send the file
-                await self.client.send_file(
-                    event.chat_id,
-                    output_path,
-                    caption=f"✅ فایل ویرایش شده آماده است!\n📁 **نام:** {output_filename}",
-                    attributes=[DocumentAttributeFilename(output_filename)]
-                )
+                started = time.perf_counter()
+                try:
+                    with self.metrics.stage('save', 'upload'), tracing.span('upload'), self.stats.job('upload'):
+                        await self.client.send_file(
+                            event.chat_id,
+                            output_path,
+                            caption=caption,
+                            attributes=[DocumentAttributeFilename(output_filename)],
+                            progress_callback=on_progress
+                        )
+                finally:
+                    session['api_calls'] = session.get('api_calls', 0) + await reporter.finish()
+                self.metrics.transfer('upload', os.path.getsize(output_path), time.perf_counter() - started)
+                self.stats.processed(user_id, os.path.getsize(output_path))
                 
                 # Clean up
                 os.remove(output_path)
+            
+            if saved:
                 await processing_msg.delete()
                 
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self.remember_track, session)
+                logger.info(f"Session of {user_id} used {session.get('api_calls', 0)} progress edits")
+                
                 # Reset session
                 if os.path.exists(session['temp_file']):
                     os.remove(session['temp_file'])
                 del self.user_sessions[user_id]
+                self.jobs.finish(job_id)
                 
             else:
+                self.jobs.finish(job_id)
+                session['state'].to(MAIN_MENU)
+                self._tap_failed(event)
                 await processing_msg.edit("❌ خطا در ذخیره فایل.")
                 
         except Exception as e:
             logger.error(f"Error saving file: {e}")
+            self.jobs.finish(job_id)
+            session['state'].to(MAIN_MENU)
+            self._tap_failed(event)
             await processing_msg.edit("❌ خطا در پردازش فایل.")
     
+    async def resume_jobs(self):
+        """ادامه دریافت‌ها و ذخیره‌هایی که پیش از راه‌اندازی مجدد نیمه‌تمام مانده‌اند"""
+        jobs = self.jobs.claim_pending()
+        if jobs:
+            logger.info(f"Resuming {len(jobs)} unfinished jobs")
+        await asyncio.gather(*(self._resume_job(job) for job in jobs))
+    
+    async def _resume_job(self, job: Dict):
+        """ادامه یک کار از آخرین مرحله ثبت شده، پشت قفل جلسه همان کاربر"""
+        chat_id = job['chat_id']
+        async with self.session_locks.hold(job['user_id']):
+            try:
+                if job['kind'] == 'document':
+                    message = await self.client.get_messages(chat_id, ids=job['data']['message_id'])
+                    # The new attempt records a job of its own
+                    self.jobs.finish(job['id'])
+                    if not message or not message.document:
+                        await self.client.send_message(
+                            chat_id, "❌ دریافت فایل شما با راه‌اندازی مجدد ربات قطع شد. لطفاً دوباره ارسال کنید.")
+                        return
+                    await self.client.send_message(
+                        chat_id, "♻️ ربات دوباره راه‌اندازی شد؛ پردازش فایل شما ادامه پیدا می‌کند.")
+                    await self.handle_document(message, resumed=True)
+                elif job['kind'] == 'save':
+                    await self._resume_save(job)
+                elif job['kind'] == 'session':
+                    await self._resume_session(job)
+                else:
+                    logger.error(f"Unknown job kind {job['kind']!r}, dropping job {job['id']}")
+                    self.jobs.finish(job['id'])
+            except Exception as e:
+                logger.error(f"Error resuming {job['kind']} job {job['id']}: {e}")
+                self.jobs.finish(job['id'])
+                await self.client.send_message(chat_id, "❌ ادامه کار نیمه‌تمام شما ممکن نشد. لطفاً دوباره تلاش کنید.")
+    
+    async def _resume_save(self, job: Dict):
+        """نوشتن دوباره تگ‌ها (در صورت نیاز) و ارسال خروجی ذخیره‌ای که قطع شده بود"""
+        data = job['data']
+        chat_id = job['chat_id']
+        output_path = data['output_path']
+        
+        tagged = job['stage'] == 'upload' and os.path.exists(output_path)
+        if not tagged and not os.path.exists(data['temp_file']):
+            self.jobs.finish(job['id'])
+            await self.client.send_message(
+                chat_id, "❌ فایل شما پس از راه‌اندازی مجدد ربات در دسترس نیست. لطفاً دوباره ارسال کنید.")
+            return
+        
+        processing_msg = await self.client.send_message(
+            chat_id, "♻️ ربات دوباره راه‌اندازی شد؛ ذخیره فایل شما ادامه پیدا می‌کند...")
+        if not tagged:
+            loop = asyncio.get_running_loop()
+            with self.metrics.stage('save', 'tag_write'):
+                saved = await loop.run_in_executor(
+                    None, self.audio_editor.update_metadata, data['temp_file'], data['metadata'], output_path
+                )
+            if not saved:
+                self.jobs.finish(job['id'])
+                await processing_msg.edit("❌ خطا در ذخیره فایل.")
+                return
+            self.jobs.checkpoint(job['id'], 'upload')
+        
+        reporter = ProgressReporter(processing_msg, "⏳ در حال آپلود فایل...",
+                                    allow=lambda: self.call_budget.allow(chat_id))
+        try:
+            with self.metrics.stage('save', 'upload'), self.stats.job('upload'):
+                await self.client.send_file(
+                    chat_id,
+                    output_path,
+                    caption=f"✅ فایل ویرایش شده آماده است!\n📁 **نام:** {data['output_filename']}",
+                    attributes=[DocumentAttributeFilename(data['output_filename'])],
+                    progress_callback=reporter.update
+                )
+        finally:
+            await reporter.finish()
+        self.stats.processed(job['user_id'], os.path.getsize(output_path))
+        await processing_msg.delete()
+        
+        for path in (output_path, data['temp_file']):
+            self._remove_file(path)
+        self.jobs.finish(job['id'])
+    
+    async def _resume_session(self, job: Dict):
+        """بازگرداندن جلسه ویرایشی که هنگام خاموش شدن ربات باز بود و نمایش دوباره منوی آن"""
+        data = job['data']
+        user_id = job['user_id']
+        chat_id = job['chat_id']
+        self.jobs.finish(job['id'])
+        
+        # A file received again after the restart already opened a newer session
+        if user_id in self.user_sessions:
+            if self.user_sessions[user_id]['temp_file'] != data['temp_file']:
+                self._remove_file(data['temp_file'])
+            return
+        
+        message = await self.client.get_messages(chat_id, ids=data.get('message_id'))
+        if not message or not os.path.exists(data['temp_file']):
+            self._remove_file(data['temp_file'])
+            await self.client.send_message(
+                chat_id, "❌ ویرایش شما با راه‌اندازی مجدد ربات قطع شد. لطفاً فایل را دوباره ارسال کنید.")
+            return
+        
+        track_fingerprint, known_track = await self.identify_track(data['temp_file'])
+        self.user_sessions[user_id] = {
+            **data,
+            'chat_id': chat_id,
+            'state': SessionState(),
+            'fingerprint': track_fingerprint,
+            'known_track': known_track,
+            'api_calls': 0,
+            'last_active': time.monotonic()
+        }
+        # The user's own message stands in for the event; the old menu is edited in place
+        await self.show_main_menu(message, notice="♻️ ربات دوباره راه‌اندازی شد؛ ویرایش شما ادامه پیدا می‌کند.")
+    
+    def _output_filename(self, session: Dict) -> str:
+        """نام فایل خروجی بر اساس نام دلخواه یا متادیتا"""
+        if 'custom_filename' in session:
+            return session['custom_filename']
+        
+        output_filename = self.audio_editor.generate_filename(
+            session['metadata'],
+            "{artist} - {title}"
+        )
+        original_ext = os.path.splitext(session['original_filename'])[1]
+        if not output_filename.endswith(original_ext):
+            output_filename += original_ext
+        return output_filename
+    
+    def _render_key(self, session: Dict, output_filename: str) -> str:
+        """کلید ورودی‌های فایل خروجی؛ هر تغییری در آن‌ها خروجی آماده را باطل می‌کند"""
+        stat = os.stat(session['temp_file'])
+        return json.dumps([session['metadata'], output_filename, stat.st_mtime_ns, stat.st_size],
+                          sort_keys=True, default=str)
+    
+    def schedule_render(self, user_id: int):
+        """شروع (یا شروع مجدد) آماده‌سازی فایل خروجی پس از مکث در ویرایش"""
+        session = self.user_sessions.get(user_id)
+        if not session:
+            return
+        self.discard_render(session)
+        # Each settled edit costs a full copy and upload; big files wait for the save instead
+        try:
+            if os.path.getsize(session['temp_file']) > self.config.RENDER_MAX_SIZE:
+                return
+        except OSError:
+            return
+        session['render_task'] = asyncio.create_task(self._render_output(user_id, session))
+    
+    def discard_render(self, session: Dict):
+        """لغو آماده‌سازی در جریان و حذف خروجی آماده قبلی"""
+        task = session.pop('render_task', None)
+        if task and not task.done():
+            task.cancel()
+        rendered = session.pop('rendered', None)
+        if rendered:
+            self._remove_file(rendered['path'])
+    
+    async def _render_output(self, user_id: int, session: Dict):
+        """نوشتن تگ‌ها روی نسخه خروجی و آپلود آن در پس‌زمینه"""
+        # Debounce: a burst of edits only renders once
+        session['render_started'] = False
+        await asyncio.sleep(self.config.RENDER_DEBOUNCE)
+        session['render_started'] = True
+        
+        output_filename = self._output_filename(session)
+        key = self._render_key(session, output_filename)
+        ext = os.path.splitext(session['temp_file'])[1]
+        render_path = os.path.join(self.config.OUTPUT_DIR, f".render_{user_id}_{time.monotonic_ns()}{ext}")
+        started = time.perf_counter()
+        
+        job = self.render_pool.submit(
+            self.audio_editor.update_metadata, session['temp_file'], dict(session['metadata']), render_path
+        )
+        try:
+            with self.stats.job('render'):
+                with self.metrics.stage('render', 'tag_write'):
+                    written = await asyncio.wrap_future(job)
+                if not written:
+                    self._remove_file(render_path)
+                    return
+                with self.metrics.stage('render', 'upload'):
+                    input_file = await self.client.upload_file(render_path, file_name=output_filename)
+        except asyncio.CancelledError:
+            # The copy may still be running in its thread; clean up once it ends
+            job.add_done_callback(lambda _: self._remove_file(render_path))
+            raise
+        except Exception as e:
+            logger.error(f"Error rendering output in background: {e}")
+            self._remove_file(render_path)
+            return
+        
+        session['rendered'] = {'key': key, 'path': render_path, 'input_file': input_file}
+        logger.info(f"Background render for {user_id} ready in {time.perf_counter() - started:.2f}s")
+    
+    async def take_render(self, session: Dict, output_filename: str) -> Optional[Dict]:
+        """برگرداندن خروجی آماده (در صورت نیاز با انتظار برای کار در جریان)"""
+        task = session.pop('render_task', None)
+        if task and not task.done():
+            if not session.get('render_started'):
+                # Still debouncing: rendering now in the foreground is just as fast
+                task.cancel()
+            else:
+                try:
+                    # Already copying or uploading: finishing it beats starting over
+                    await task
+                except Exception as e:
+                    logger.error(f"Error waiting for background render: {e}")
+        
+        rendered = session.pop('rendered', None)
+        if not rendered:
+            return None
+        if rendered['key'] != self._render_key(session, output_filename):
+            self._remove_file(rendered['path'])
+            return None
+        return rendered
+    
+    def _record_save_latency(self, clicked: float, path: str):
+        """ثبت فاصله کلیک ذخیره تا ارسال اولین بایت"""
+        latency = time.perf_counter() - clicked
+        self.save_latencies.append((path, latency))
+        self.stats.cache('render').record(path == 'speculative')
+        logger.info(f"Save latency ({path}): {latency * 1000:.0f} ms to first upload byte")
+    
+    def _remove_file(self, path: str):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            logger.error(f"Error removing {path}: {e}")
+    
     async def handle_cancel_callback(self, event):
         """پردازش لغو از طریق callback"""
         user_id = event.sender_id
         
-        if user_id in self.user_sessions:
-            session = self.user_sessions[user_id]
-            if 'temp_file' in session and os.path.exists(session['temp_file']):
-                os.remove(session['temp_file'])
-            del self.user_sessions[user_id]
+        self._close_session(user_id)
         
         await event.edit("✅ عملیات لغو شد.")
     
@@ -594,43 +1865,176 @@ class MusicBot:
         session = self.user_sessions[user_id]
         
         # Check if user is waiting for cover
-        if session.get('editing_state') != 'waiting_cover':
+        if not session['state'].accepts('photo'):
             await event.respond("❌ شما در حال انتظار برای کاور نیستید. لطفاً از منو گزینه ویرایش کاور را انتخاب کنید.")
             return
         
+        processing_msg = None
+        temp_cover_path = os.path.join(self.config.TEMP_DIR, f"temp_cover_{user_id}.jpg")
         try:
             # Send processing message
-            processing_msg = await event.respond("⏳ در حال پردازش کاور...")
+            processing_msg = await self.show_status(event, "⏳ در حال پردازش کاور...")
             
             # Download photo
-            temp_cover_path = os.path.join(self.config.TEMP_DIR, f"temp_cover_{user_id}.jpg")
-            await self.client.download_media(event.photo, temp_cover_path)
+            with self.metrics.stage('photo', 'download'), tracing.span('cover_download'):
+                await self.client.download_media(event.photo, temp_cover_path)
             
-            # Get the action from session
-            action = session.get('cover_action', 'add')
+            # Get the action from session (the cover_ callback payload)
+            action = session.get('cover_action', 'cover_add')
             temp_file = session['temp_file']
+            session['state'].to(MAIN_MENU)
             
-            if action in ['add', 'replace']:
+            if action in ('cover_add', 'cover_replace'):
                 # Add/replace cover
-                success = self.audio_editor.add_cover_art(temp_file, temp_cover_path)
+                loop = asyncio.get_running_loop()
+                with self.metrics.stage('photo', 'cover_write'):
+                    success = await loop.run_in_executor(
+                        None, tracing.bind(self.audio_editor.add_cover_art), temp_file, temp_cover_path
+                    )
                 
                 if success:
                     # Update metadata
-                    session['metadata'] = self.audio_editor.get_metadata(temp_file)
-                    session['editing_state'] = 'main_menu'
-                    
-                    await processing_msg.edit("✅ کاور با موفقیت اضافه شد!")
-                    await self.show_main_menu(event)
+                    with self.metrics.stage('photo', 'parse'):
+                        session['metadata'] = await loop.run_in_executor(
+                            None, tracing.bind(self.audio_editor.get_metadata), temp_file
+                        )
+                    self.schedule_render(user_id)
+                    notice = "✅ کاور با موفقیت اضافه شد!"
                 else:
-                    await processing_msg.edit("❌ خطا در افزودن کاور. لطفاً دوباره تلاش کنید.")
+                    notice = "❌ خطا در افزودن کاور. لطفاً دوباره تلاش کنید."
+            else:
+                logger.error(f"Unknown cover action {action!r} for {user_id}")
+                notice = "❌ عملیات کاور نامعتبر است. لطفاً دوباره از منوی کاور شروع کنید."
             
-            # Clean up temp cover file
-            if os.path.exists(temp_cover_path):
-                os.remove(temp_cover_path)
+            # The status replaced the menu, so every outcome brings the menu back
+            await self.show_main_menu(event, processing_msg, notice=notice)
                 
         except Exception as e:
             logger.error(f"Error processing cover: {e}")
-            await event.respond("❌ خطا در پردازش کاور. لطفاً دوباره تلاش کنید.")
+            if user_id in self.user_sessions:
+                session['state'].to(MAIN_MENU)
+                await self.show_main_menu(event, processing_msg, notice="❌ خطا در پردازش کاور. لطفاً دوباره تلاش کنید.")
+            else:
+                await event.respond("❌ خطا در پردازش کاور. لطفاً دوباره تلاش کنید.")
+        finally:
+            # Clean up temp cover file
+            self._remove_file(temp_cover_path)
+    
+    async def shutdown(self, timeout: float = None):
+        """خاموش کردن تدریجی: رد فایل‌های جدید، صبر برای کارهای در جریان و ذخیره وضعیت
+        
+        Uploads and tag writes that are already running get up to `timeout` seconds
+        (SHUTDOWN_TIMEOUT) to finish. Whatever is still running then is cancelled; its job stays
+        in the queue with the files it needs, and resume_jobs continues it after the restart.
+        """
+        if self.draining:
+            logger.info("Shutdown already in progress")
+            return
+        self.draining = True
+        timeout = self.config.SHUTDOWN_TIMEOUT if timeout is None else timeout
+        logger.info(f"Shutting down: waiting up to {timeout:.0f}s for {len(self.inflight)} running handlers")
+        
+        # Background work nobody waits for
+        for session in self.user_sessions.values():
+            self.discard_render(session)
+            self._cancel_suggestions(session)
+        for task in (self.profile_task, self.session_sweep_task, self.disk_usage_task, self.autocomplete_task):
+            if task:
+                task.cancel()
+        
+        # Handlers started while draining (a click on a button already shown) are waited for too
+        deadline = time.monotonic() + timeout
+        current = asyncio.current_task()
+        while True:
+            running = {task for task in self.inflight if task is not current and not task.done()}
+            if self.resume_task and not self.resume_task.done():
+                running.add(self.resume_task)
+            remaining = deadline - time.monotonic()
+            if not running or remaining <= 0:
+                break
+            await asyncio.wait(running, timeout=remaining)
+        
+        if running:
+            logger.warning(f"Cancelling {len(running)} handlers still running after {timeout:.0f}s; "
+                           f"their jobs resume after the restart")
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+        
+        await self._flush_state()
+        await self.client.disconnect()
+    
+    async def _flush_state(self):
+        """ذخیره متریک‌ها، جلسه‌های باز و صف کارها و حذف فایل‌های خود ربات که کاری به آن‌ها نیاز ندارد"""
+        loop = asyncio.get_running_loop()
+        if self.config.METRICS_TEXTFILE:
+            try:
+                await loop.run_in_executor(None, self._write_metrics_textfile, self.config.METRICS_TEXTFILE)
+            except OSError as e:
+                logger.error(f"Error writing metrics to {self.config.METRICS_TEXTFILE}: {e}")
+        
+        # Open sessions wait in the job queue like unfinished saves; their files are kept for resume_jobs
+        for user_id, session in self.user_sessions.items():
+            self.discard_render(session)
+            self._persist_session(user_id, session)
+        self.user_sessions.clear()
+        await loop.run_in_executor(None, self.render_pool.shutdown, True)
+        keep = self.jobs.files()
+        for directory in (self.config.TEMP_DIR, self.config.OUTPUT_DIR):
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.abspath(os.path.join(directory, name))
+                if path not in keep and self._bot_file(name) and os.path.isfile(path):
+                    self._remove_file(path)
+        if keep:
+            logger.info(f"{len(self.jobs)} unfinished jobs and sessions kept for the next start")
+        
+        if self.autocomplete.dirty:
+            await loop.run_in_executor(None, self.autocomplete.save)
+        self.jobs.close()
+        self.fingerprint_index.close()
+    
+    def _persist_session(self, user_id: int, session: Dict):
+        """ثبت جلسه باز در صف کارها تا پس از راه‌اندازی مجدد از منوی اصلی ادامه پیدا کند"""
+        # A save that was cut off has a job of its own
+        if session['state'].name == SAVING or not os.path.exists(session['temp_file']):
+            return
+        data = {key: session[key] for key in PERSISTED_SESSION_KEYS if key in session}
+        self.jobs.add('session', user_id, session.get('chat_id', user_id), 'menu', **data)
+    
+    @staticmethod
+    def _bot_file(name: str) -> bool:
+        """آیا فایل با این نام را خود ربات در TEMP_DIR یا OUTPUT_DIR ساخته است"""
+        # temp_{user}_…, temp_cover_{user}.jpg, cover_{user}.jpg, .render_{user}_…, {user}_{output name}
+        if name.startswith(('temp_', 'cover_', '.render_')):
+            return True
+        user_id, _, rest = name.partition('_')
+        return user_id.isdigit() and bool(rest)
+    
+    def _write_metrics_textfile(self, path: str):
+        # Written next to the target and renamed, so a collector never reads half a file
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.metrics.render())
+        os.replace(temp_path, path)
+    
+    def _on_signal(self):
+        if self.shutdown_task is None:
+            self.shutdown_task = asyncio.create_task(self.shutdown())
+    
+    def _install_signal_handlers(self):
+        """SIGTERM و SIGINT به جای قطع فوری، خاموش کردن تدریجی را شروع می‌کنند"""
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(signum, self._on_signal)
+            except (NotImplementedError, RuntimeError):
+                # Windows event loops and non-main threads cannot take signal handlers
+                logger.warning(f"Graceful shutdown on {signal.Signals(signum).name} is unavailable here")
     
     async def start(self):
         """شروع ربات"""
@@ -638,16 +2042,47 @@ class MusicBot:
             await self.client.start(bot_token=self.config.BOT_TOKEN)
             logger.info("🎵 Music Bot started successfully!")
             
+            if self.config.METRICS_PORT:
+                try:
+                    await self.metrics.serve(self.config.METRICS_HOST, self.config.METRICS_PORT)
+                except OSError as e:
+                    logger.error(f"Error starting metrics endpoint: {e}")
+            
+            if self.config.LOOP_LAG_THRESHOLD:
+                self.lag_monitor.start()
+            self.disk_usage_task = asyncio.create_task(self._refresh_disk_usage())
+            if self.config.AUTOCOMPLETE_SAVE_INTERVAL:
+                self.autocomplete_task = asyncio.create_task(self._save_autocomplete())
+            if self.config.SESSION_TTL:
+                self.session_sweep_task = asyncio.create_task(self._expire_sessions())
+            
             # Get bot info
             me = await self.client.get_me()
             logger.info(f"Bot username: @{me.username}")
             
+            # Work cut off by the last shutdown or crash, continued without new transfers where possible
+            self.resume_task = asyncio.create_task(self.resume_jobs())
+            self._install_signal_handlers()
+            
             # Keep the bot running
             await self.client.run_until_disconnected()
             
         except Exception as e:
             logger.error(f"Error starting bot: {e}")
             raise
+        finally:
+            await self.metadata_lookup.close()
+            await self.lag_monitor.stop()
+            if self.disk_usage_task:
+                self.disk_usage_task.cancel()
+            if self.autocomplete_task:
+                self.autocomplete_task.cancel()
+            # Disconnected without shutdown(): keep what was typed since the last periodic save
+            if self.autocomplete.dirty:
+                self.autocomplete.save()
+            if self.session_sweep_task:
+                self.session_sweep_task.cancel()
+            await self.metrics.close()
 
 async def main():
     """تابع اصلی"""
@@ -0,0 +1,83 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Tuple
+
+DEFAULT_INTERVAL = 0.01     # 100 samples per second per thread
+MAX_DURATION = 300
+
+# Leaf frames of threads that are waiting rather than working (idle selector, idle pool workers)
+IDLE_LEAVES = {
+    ('selectors.py', 'select'),
+    ('threading.py', 'wait'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """پروفایلر نمونه‌بردار برای ربات در حال اجرا
+
+    A helper thread reads the stack of every other thread with sys._current_frames() every
+    `interval` seconds. Nothing is installed in the profiled threads, so the only cost is the
+    sampler briefly holding the GIL; stacks are aggregated as "thread;outer;...;leaf" keys.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, skip_idle: bool = True,
+                 clock: Callable[[], float] = time.monotonic):
+        self.interval = interval
+        self.skip_idle = skip_idle
+        self.clock = clock
+        self.samples = 0
+        self.stacks: Counter = Counter()
+
+    def sample(self, ignore: Tuple[int, ...] = ()):
+        """خواندن یک نمونه از stack همه رشته‌ها"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident in ignore:
+                continue
+            code = frame.f_code
+            if self.skip_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[';'.join(reversed(labels))] += 1
+        self.samples += 1
+
+    def run(self, duration: float) -> Dict[str, int]:
+        """نمونه‌برداری به مدت duration ثانیه (در رشته جداگانه اجرا شود)"""
+        own = threading.get_ident()
+        deadline = self.clock() + min(duration, MAX_DURATION)
+        next_sample = self.clock()
+        while next_sample < deadline:
+            self.sample(ignore=(own,))
+            next_sample += self.interval
+            delay = next_sample - self.clock()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # The sampler fell behind (GIL contention); skip ahead instead of bursting
+                next_sample = self.clock()
+        return dict(self.stacks)
+
+    def collapsed(self) -> str:
+        """خروجی collapsed-stack سازگار با flamegraph.pl و speedscope"""
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+    def top(self, limit: int = 5):
+        """پرتکرارترین توابع انتهای stack (زمان مستقیم)"""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return leaves.most_common(limit)
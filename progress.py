@@ -0,0 +1,149 @@
+import asyncio
+import time
+from typing import Callable, Optional
+from telethon.errors import FloodWaitError, MessageNotModifiedError
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Edits of one message are spaced at least this far apart, and never further than the maximum
+MIN_INTERVAL = 2.0
+MAX_INTERVAL = 30.0
+
+# Weight of the newest sample in the smoothed transfer speed
+SPEED_SMOOTHING = 0.3
+
+BAR_WIDTH = 10
+
+
+def format_size(size: float) -> str:
+    """نمایش خوانای حجم"""
+    if size < 1024:
+        return f"{int(size)} B"
+    for unit in ('KB', 'MB'):
+        size /= 1024
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+    return f"{size / 1024:.2f} GB"
+
+
+def format_eta(seconds: float) -> str:
+    """نمایش زمان باقی‌مانده به صورت دقیقه:ثانیه"""
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+class ProgressReporter:
+    """نمایش پیشرفت دانلود/آپلود با ویرایش پیام وضعیت
+
+    `update` is meant to be passed as Telethon's `progress_callback`. It only records the latest
+    numbers; a single background task edits the message, so any number of callbacks between two
+    edits collapse into one API call.
+    """
+
+    def __init__(self, message, title: str, min_interval: float = MIN_INTERVAL,
+                 max_interval: float = MAX_INTERVAL, allow: Callable[[], bool] = None,
+                 clock=time.monotonic):
+        self.message = message
+        self.title = title
+        self.allow = allow
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.clock = clock
+        self.api_calls = 0
+        self.flood_waits = 0
+
+        self.current = 0
+        self.total = 0
+        self.speed: Optional[float] = None
+        self._started = clock()
+        self._sample = None         # (time, bytes) of the previous callback
+        self._next_edit = self._started + min_interval
+        self._last_text = None
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+
+    def update(self, current: int, total: int):
+        """ثبت پیشرفت جدید (callback انتقال تلگرام)"""
+        now = self.clock()
+        if self._sample and now > self._sample[0]:
+            instant = (current - self._sample[1]) / (now - self._sample[0])
+            self.speed = instant if self.speed is None else (
+                SPEED_SMOOTHING * instant + (1 - SPEED_SMOOTHING) * self.speed
+            )
+        self._sample = (now, current)
+        self.current, self.total = current, total
+        self._dirty = True
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._flush())
+
+    def render(self) -> str:
+        """متن پیام وضعیت برای آخرین پیشرفت ثبت شده"""
+        if not self.total:
+            return f"{self.title}\n📦 {format_size(self.current)}"
+
+        fraction = min(self.current / self.total, 1.0)
+        filled = int(fraction * BAR_WIDTH)
+        lines = [
+            self.title,
+            f"{'█' * filled}{'░' * (BAR_WIDTH - filled)} {fraction * 100:.0f}%",
+            f"📦 {format_size(self.current)} / {format_size(self.total)}",
+        ]
+        if self.speed:
+            eta = max(self.total - self.current, 0) / self.speed
+            lines.append(f"🚀 {format_size(self.speed)}/s  ⏱️ {format_eta(eta)}")
+        return '\n'.join(lines)
+
+    async def _flush(self):
+        """ویرایش پیام در فواصل مجاز تا زمانی که پیشرفت جدیدی باقی نمانده باشد"""
+        while self._dirty:
+            wait = self._next_edit - self.clock()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            # Everything reported while waiting goes out in this one edit
+            self._dirty = False
+            text = self.render()
+            if text == self._last_text:
+                continue
+
+            # Progress is optional; a chat that is over its call budget just sees it less often
+            if self.allow and not self.allow():
+                self._dirty = True
+                self._next_edit = self.clock() + self.interval
+                continue
+
+            try:
+                self.api_calls += 1
+                await self.message.edit(text)
+                self._last_text = text
+                # Edits that go through let the pace drift back towards the minimum
+                self.interval = max(self.min_interval, self.interval * 0.8)
+            except FloodWaitError as e:
+                self.flood_waits += 1
+                self.interval = min(self.max_interval, max(self.interval * 2, e.seconds))
+                self._next_edit = self.clock() + max(e.seconds, self.interval)
+                self._dirty = True
+                logger.error(f"Progress edits rate limited, waiting {e.seconds}s")
+                continue
+            except MessageNotModifiedError:
+                self._last_text = text
+            except Exception as e:
+                logger.error(f"Error editing progress message: {e}")
+                return
+
+            self._next_edit = self.clock() + self.interval
+
+    async def finish(self) -> int:
+        """توقف ویرایش‌های در انتظار؛ تعداد درخواست‌های API مصرف شده را برمی‌گرداند"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        return self.api_calls
@@ -0,0 +1,89 @@
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[..., Awaitable[Any]]
+
+MESSAGE_KINDS = ('document', 'photo', 'text')
+
+
+def message_kind(event) -> Optional[str]:
+    """نوع پیام: document، photo، command یا text"""
+    if event.document:
+        return 'document'
+    if event.photo:
+        return 'photo'
+    text = event.text
+    if not text:
+        return None
+    return 'command' if text.startswith('/') else 'text'
+
+
+class Router:
+    """مسیریابی جدولی callbackها و پیام‌ها به handlerها
+
+    Callback payloads are looked up exactly first, then by their prefix up to and including the
+    first underscore ("edit_" for "edit_title"); both are single dict lookups. Exact handlers
+    receive the event, prefix handlers the event and the full payload.
+    """
+
+    def __init__(self):
+        self._callbacks: Dict[str, Handler] = {}
+        self._prefixes: Dict[str, Handler] = {}
+        self._commands: Dict[str, Handler] = {}
+        self._messages: Dict[str, Handler] = {}
+
+    def callback(self, payload: str, handler: Handler):
+        self._callbacks[payload] = handler
+
+    def callback_prefix(self, prefix: str, handler: Handler):
+        if not prefix.endswith('_') or '_' in prefix[:-1]:
+            raise ValueError(f"Callback prefix must be one word followed by '_': {prefix!r}")
+        self._prefixes[prefix] = handler
+
+    def command(self, name: str, handler: Handler):
+        self._commands[name.lower()] = handler
+
+    def message(self, kind: str, handler: Handler):
+        if kind not in MESSAGE_KINDS:
+            raise ValueError(f"Unknown message kind: {kind!r}")
+        self._messages[kind] = handler
+
+    def resolve_callback(self, data: str) -> Optional[Tuple[Handler, tuple]]:
+        """یافتن handler و آرگومان‌های یک payload"""
+        handler = self._callbacks.get(data)
+        if handler is not None:
+            return handler, ()
+        cut = data.find('_')
+        if cut > 0:
+            handler = self._prefixes.get(data[:cut + 1])
+            if handler is not None:
+                return handler, (data,)
+        return None
+
+    def resolve_message(self, event) -> Optional[Handler]:
+        """یافتن handler یک پیام بر اساس نوع آن"""
+        kind = message_kind(event)
+        if kind == 'command':
+            # "/start@MyBot args" -> "/start"
+            return self._commands.get(event.text.split(maxsplit=1)[0].split('@', 1)[0].lower())
+        return self._messages.get(kind) if kind else None
+
+    async def dispatch_callback(self, event, data: str) -> bool:
+        """اجرای handler یک callback؛ False اگر payload ناشناخته باشد"""
+        route = self.resolve_callback(data)
+        if route is None:
+            logger.error(f"Unknown callback payload: {data!r}")
+            return False
+        handler, args = route
+        await handler(event, *args)
+        return True
+
+    async def dispatch_message(self, event) -> bool:
+        """اجرای handler یک پیام؛ False اگر پیام مسیری نداشته باشد"""
+        handler = self.resolve_message(event)
+        if handler is None:
+            return False
+        await handler(event)
+        return True
@@ -0,0 +1,83 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Hashable, List
+
+# Repeats of the same button on the same message within this many seconds are dropped
+DUPLICATE_WINDOW = 2.0
+
+
+class SessionLocks:
+    """قفل async جداگانه برای هر کاربر تا handlerهای یک جلسه پشت سر هم اجرا شوند"""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, List] = {}     # key -> [lock, holders and waiters]
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable):
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            # Idle users do not keep a lock around
+            if not entry[1]:
+                del self._locks[key]
+
+    def waiting(self) -> int:
+        """تعداد handlerهایی که پشت قفل کاربرشان منتظرند"""
+        return sum(entry[1] - 1 for entry in self._locks.values() if entry[1] > 1)
+
+    def locked(self, key: Hashable) -> bool:
+        entry = self._locks.get(key)
+        return bool(entry and entry[0].locked())
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+class DuplicateFilter:
+    """حذف لمس‌های تکراری یک دکمه که هنوز در حال اجرا هستند یا همین حالا اجرا شده‌اند
+
+    `scope` identifies where the tap came from (user and message), `payload` the button. A tap is
+    a duplicate while the same payload is running in that scope, or when it repeats the last
+    successful payload of the scope within the window; any other button in between, or a failure
+    of the last one, makes it a new request.
+    """
+
+    def __init__(self, window: float = DUPLICATE_WINDOW, clock=time.monotonic):
+        self.window = window
+        self.clock = clock
+        self._in_flight = set()
+        self._last: Dict[Hashable, tuple] = OrderedDict()   # scope -> (payload, finished at), oldest first
+        self.dropped: Dict[str, int] = {}           # payload -> duplicates not executed
+
+    def claim(self, scope: Hashable, payload: str) -> bool:
+        """True اگر این لمس باید اجرا شود؛ در غیر این صورت تکراری ثبت می‌شود"""
+        last = self._last.get(scope)
+        repeated = last is not None and last[0] == payload and self.clock() - last[1] < self.window
+        if (scope, payload) in self._in_flight or repeated:
+            self.dropped[payload] = self.dropped.get(payload, 0) + 1
+            return False
+        self._in_flight.add((scope, payload))
+        return True
+
+    def release(self, scope: Hashable, payload: str, succeeded: bool = True):
+        """پایان اجرای یک لمس؛ لمس ناموفق را می‌توان بلافاصله تکرار کرد"""
+        self._in_flight.discard((scope, payload))
+        if not succeeded:
+            self._last.pop(scope, None)
+            return
+        now = self.clock()
+        self._last[scope] = (payload, now)
+        self._last.move_to_end(scope)
+        # Scopes are messages, so old ones never come back; forget them once the window has passed
+        while self._last and now - next(iter(self._last.values()))[1] >= self.window:
+            self._last.popitem(last=False)
+
+    @property
+    def total_dropped(self) -> int:
+        return sum(self.dropped.values())
@@ -0,0 +1,61 @@
+from typing import Dict, FrozenSet, Optional
+
+# Session states
+MAIN_MENU = 'main_menu'
+EDITING_FIELD = 'editing_field'             # waiting for the text of one metadata field
+EDITING_FILENAME = 'editing_filename'       # waiting for a filename or template
+WAITING_TRACKLIST = 'waiting_tracklist'     # waiting for a CUE sheet or timestamp list
+WAITING_COVER = 'waiting_cover'             # waiting for a cover photo
+SAVING = 'saving'                           # output being written and sent
+
+# A prompt can always be abandoned for the menu or another prompt
+PROMPTS = frozenset({EDITING_FIELD, EDITING_FILENAME, WAITING_TRACKLIST, WAITING_COVER})
+
+TRANSITIONS: Dict[str, FrozenSet[str]] = {
+    MAIN_MENU: PROMPTS | {SAVING},
+    EDITING_FIELD: PROMPTS | {MAIN_MENU, SAVING},
+    EDITING_FILENAME: PROMPTS | {MAIN_MENU, SAVING},
+    WAITING_TRACKLIST: PROMPTS | {MAIN_MENU, SAVING},
+    WAITING_COVER: PROMPTS | {MAIN_MENU, SAVING},
+    # Only a failed save returns; a successful one ends the session
+    SAVING: frozenset({MAIN_MENU}),
+}
+
+# Kinds of user input each state consumes
+ACCEPTS: Dict[str, FrozenSet[str]] = {
+    MAIN_MENU: frozenset(),
+    EDITING_FIELD: frozenset({'text'}),
+    EDITING_FILENAME: frozenset({'text'}),
+    WAITING_TRACKLIST: frozenset({'text', 'tracklist'}),
+    WAITING_COVER: frozenset({'photo'}),
+    SAVING: frozenset(),
+}
+
+
+class InvalidTransition(ValueError):
+    """انتقال غیرمجاز بین وضعیت‌های جلسه"""
+
+
+class SessionState:
+    """وضعیت ویرایش یک جلسه با انتقال‌های مجاز مشخص"""
+
+    __slots__ = ('name', 'field')
+
+    def __init__(self, name: str = MAIN_MENU, field: Optional[str] = None):
+        self.name = name
+        self.field = field          # metadata field being edited in EDITING_FIELD
+
+    def to(self, name: str, field: Optional[str] = None):
+        """انتقال به وضعیت جدید؛ در صورت غیرمجاز بودن InvalidTransition"""
+        # Staying in the menu is a no-op rather than a transition
+        if not name == self.name == MAIN_MENU and name not in TRANSITIONS[self.name]:
+            raise InvalidTransition(f"{self.name} -> {name}")
+        self.name = name
+        self.field = field
+
+    def accepts(self, kind: str) -> bool:
+        """آیا این وضعیت ورودی از این نوع (text/photo/tracklist) را می‌پذیرد"""
+        return kind in ACCEPTS[self.name]
+
+    def __repr__(self) -> str:
+        return f"SessionState({self.name!r}, {self.field!r})" if self.field else f"SessionState({self.name!r})"
@@ -0,0 +1,101 @@
+import math
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from pcm_reader import PcmReader
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Level below which a window counts as silent (dBFS RMS)
+SILENCE_THRESHOLD_DB = -60.0
+
+# Length of each RMS window
+WINDOW_SECONDS = 0.05
+
+
+def analyze_silence(file_path: str, threshold_db: float = SILENCE_THRESHOLD_DB,
+                    min_duration: float = 0.5, ffmpeg_binary: str = 'ffmpeg') -> Dict[str, Any]:
+    """یافتن بازه‌های سکوت و محدوده شنیدنی فایل با RMS پنجره‌ای"""
+    reader = PcmReader(file_path, ffmpeg_binary=ffmpeg_binary)
+    window = max(int(round(reader.sample_rate * WINDOW_SECONDS)), 1)
+    window_seconds = window / reader.sample_rate
+    # Compare mean squares directly instead of taking a log per window
+    threshold = 10 ** (threshold_db / 10)
+
+    regions: List[Tuple[float, float]] = []
+    pending = np.zeros((0, reader.channels), dtype=np.float32)
+    window_index = 0
+    total_samples = 0
+    run_start = None          # first window of the current silent run
+    first_audible = None
+    last_audible = None
+
+    for block in reader.blocks(window * 200):
+        total_samples += len(block)
+        samples = np.concatenate([pending, block]) if len(pending) else block
+        complete = len(samples) // window * window
+        pending = samples[complete:]
+        if not complete:
+            continue
+
+        energy = (samples[:complete].astype(np.float64) ** 2).reshape(-1, window * reader.channels).mean(axis=1)
+        silent = energy < threshold
+        count = len(silent)
+
+        audible = np.flatnonzero(~silent)
+        if len(audible):
+            if first_audible is None:
+                first_audible = window_index + audible[0]
+            last_audible = window_index + audible[-1]
+
+        # Silent runs are where consecutive windows flip state
+        edges = np.flatnonzero(np.diff(silent.astype(np.int8))) + 1
+        bounds = np.r_[0, edges, count]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if silent[start]:
+                if run_start is None:
+                    run_start = window_index + start
+            elif run_start is not None:
+                regions.append((run_start, window_index + start))
+                run_start = None
+
+        window_index += count
+
+    # The tail shorter than one window is measured on its own
+    if len(pending):
+        silent_tail = float((pending.astype(np.float64) ** 2).mean()) < threshold
+        if not silent_tail:
+            if first_audible is None:
+                first_audible = window_index
+            last_audible = window_index
+            if run_start is not None:
+                regions.append((run_start, window_index))
+                run_start = None
+        elif run_start is None:
+            run_start = window_index
+        window_index += 1
+
+    duration = total_samples / reader.sample_rate
+    if run_start is not None:
+        regions.append((run_start, window_index))
+
+    def seconds(index: int) -> float:
+        return float(min(index * window_seconds, duration))
+
+    return {
+        'duration': duration,
+        'regions': [(seconds(start), seconds(end)) for start, end in regions
+                    if (end - start) * window_seconds >= min_duration],
+        'audible': None if first_audible is None else (seconds(first_audible), seconds(last_audible + 1)),
+    }
+
+
+def trim_bounds(analysis: Dict[str, Any], padding: float = 0.1) -> Tuple[float, float]:
+    """بازه نگه‌داشتنی پس از حذف سکوت ابتدا و انتها (با کمی حاشیه)"""
+    audible = analysis['audible']
+    if audible is None:
+        return 0.0, 0.0
+    start = max(audible[0] - padding, 0.0)
+    end = min(audible[1] + padding, analysis['duration'])
+    # Round outward to the millisecond so repeated trims are stable
+    return math.floor(start * 1000) / 1000, math.ceil(end * 1000) / 1000
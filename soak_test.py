@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+تست soak حافظه: چرخاندن هزاران جلسه در handlerهای MusicBot و مقایسه snapshotهای tracemalloc
+
+The same stream of users is replayed round after round on one bot instance, with part of the
+users walking away mid-session. After every round idle sessions are expired, garbage is
+collected and a tracemalloc snapshot is taken; memory retained after the warm-up rounds has
+to stay flat, whatever the number of sessions that went through.
+
+Usage: python soak_test.py [--rounds 10] [--users 500] [--abandon 0.2] [--format mp3-cbr]
+                           [--frames 1] [--top 10]
+"""
+
+import argparse
+import asyncio
+import gc
+import linecache
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+from benchmark_audio_editor import FORMATS, SIZES, build_cover, build_fixture
+from load_test import FakeClient, LoadTest, load_test_config, synthesize
+from music_bot import MusicBot
+
+# Growth tolerated between the first and last measured round: bytes per session, plus room for
+# bounded structures (stall log, rolling windows, duplicate-tap filter) that are still filling up
+LEAK_PER_SESSION = 64
+SETTLE_SLACK = 128 * 1024
+
+# Allocations of the harness itself are not the bot's; linecache keeps the source of files shown
+# in logged stacks (the stall log), which is bounded by the size of the code base
+_HARNESS_FILES = [tracemalloc.Filter(False, tracemalloc.__file__),
+                  tracemalloc.Filter(False, linecache.__file__),
+                  tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                  tracemalloc.Filter(False, '<unknown>')]
+
+
+def abandon_sessions(updates: List[Dict], fraction: float, seed: int = 1) -> List[Dict]:
+    """حذف ادامه جریان برای بخشی از کاربران پس از دریافت منوی اصلی"""
+    rng = random.Random(seed)
+    users = sorted({update['user'] for update in updates})
+    leaving = set(rng.sample(users, int(len(users) * fraction)))
+    kept, left = [], set()
+    for update in updates:
+        if update['user'] in left:
+            continue
+        kept.append(update)
+        if update['user'] in leaving and update['kind'] == 'document':
+            left.add(update['user'])
+    return kept
+
+
+def retained(snapshot: tracemalloc.Snapshot) -> int:
+    return sum(stat.size for stat in snapshot.statistics('filename'))
+
+
+async def soak(rounds: int, users: int, workspace: str, abandon: float = 0.2, warmup: int = 2,
+               fmt: str = 'mp3-cbr', size: str = '64k', seed: int = 1, frames: int = 1) -> Dict:
+    """اجرای دورهای پیاپی روی یک نمونه ربات و اندازه‌گیری حافظه باقی‌مانده بعد از هر دور"""
+    fixtures = os.path.join(workspace, 'fixtures')
+    os.makedirs(fixtures, exist_ok=True)
+    document_path = build_fixture(fixtures, fmt, size)
+    cover_path = build_cover(fixtures, 300)
+    updates = abandon_sessions(synthesize(users, seed, think=0.0, ramp=0.0), abandon, seed)
+
+    client = FakeClient(latency=0.0, download_bandwidth=0, upload_bandwidth=0)
+    bot = MusicBot(client=client, config=load_test_config(workspace))
+    rounds_report = []
+    snapshots = []
+    tracemalloc.start(frames)
+    try:
+        for index in range(rounds):
+            started = time.perf_counter()
+            report = await LoadTest(bot, client, document_path, cover_path).run(updates)
+            # Users who walked away are idle for good; their sessions expire
+            open_sessions = len(bot.user_sessions)
+            expired = bot.expire_sessions(now=time.monotonic() + bot.config.SESSION_TTL + 1)
+            # Chat history lives on Telegram's side, not in the bot
+            client.messages.clear()
+            client.menus.clear()
+            client.received.clear()
+
+            gc.collect()
+            snapshot = tracemalloc.take_snapshot().filter_traces(_HARNESS_FILES)
+            if index >= warmup - 1:
+                snapshots.append(snapshot)
+            rounds_report.append({
+                'round': index + 1,
+                'seconds': round(time.perf_counter() - started, 2),
+                'updates': report['updates'],
+                'exceptions': report['exceptions'],
+                'failed_steps': report['failed_steps'],
+                'covers_applied': report['covers_applied'],
+                'error_replies': report['error_replies'],
+                'open_sessions': open_sessions,
+                'expired': expired,
+                'sessions_left': len(bot.user_sessions),
+                'temp_files_left': len(os.listdir(bot.config.TEMP_DIR)),
+                'output_files_left': len(os.listdir(bot.config.OUTPUT_DIR)),
+                'retained': retained(snapshot),
+            })
+    finally:
+        tracemalloc.stop()
+        bot.render_pool.shutdown(wait=True)
+        await bot.metadata_lookup.close()
+        bot.fingerprint_index.close()
+        bot.jobs.close()
+
+    growth = snapshots[-1].compare_to(snapshots[0], 'lineno') if len(snapshots) > 1 else []
+    sessions = users * (len(snapshots) - 1)
+    return {
+        'rounds': rounds_report,
+        'sessions': users * rounds,
+        'growth': rounds_report[-1]['retained'] - rounds_report[warmup - 1]['retained'],
+        'allowed_growth': SETTLE_SLACK + LEAK_PER_SESSION * sessions,
+        'top_growth': [stat for stat in growth if stat.size_diff > 0],
+        'memory_budget_peak': bot.audio_editor.memory_budget.peak,
+    }
+
+
+def print_report(report: Dict, top: int = 10):
+    for row in report['rounds']:
+        print(f"🔁 round {row['round']:>3}: {row['updates']} updates in {row['seconds']} s, "
+              f"retained {row['retained'] / 1024:.0f} KiB, {row['covers_applied']} covers applied, "
+              f"{sum(row['failed_steps'].values())} failed steps, {row['expired']} idle sessions expired, "
+              f"{row['sessions_left']} sessions / {row['temp_files_left']} temp / "
+              f"{row['output_files_left']} output files left")
+    print(f"📈 growth after warm-up: {report['growth'] / 1024:.1f} KiB over {report['sessions']} sessions "
+          f"(allowed {report['allowed_growth'] / 1024:.1f} KiB)")
+    print(f"🧠 memory budget peak: {report['memory_budget_peak'] / 1024:.0f} KiB")
+    for stat in report['top_growth'][:top]:
+        print(f"   +{stat.size_diff / 1024:.1f} KiB ({stat.count_diff:+d} blocks) {stat.traceback}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--users', type=int, default=500, help="sessions per round")
+    parser.add_argument('--abandon', type=float, default=0.2, help="share of users who walk away mid-session")
+    parser.add_argument('--warmup', type=int, default=2, help="rounds before the baseline snapshot")
+    parser.add_argument('--format', default='mp3-cbr', choices=list(FORMATS))
+    parser.add_argument('--size', default='64k', choices=list(SIZES))
+    parser.add_argument('--frames', type=int, default=1, help="traceback depth kept by tracemalloc")
+    parser.add_argument('--top', type=int, default=10, help="allocation sites listed by growth")
+    parser.add_argument('--verbose', action='store_true', help="keep the bot's own log output")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as workspace:
+        report = asyncio.run(soak(args.rounds, args.users, workspace, args.abandon, args.warmup,
+                                  args.format, args.size, frames=args.frames))
+    print_report(report, args.top)
+    failed_steps = any(row['failed_steps'] for row in report['rounds'])
+    return 0 if report['growth'] <= report['allowed_growth'] and not failed_steps else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import heapq
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# Stages timed by Metrics.stage, grouped into what /stats reports
+STAGE_GROUPS = {
+    ('document', 'download'): 'download',
+    ('save', 'tag_write'): 'edit',
+    ('render', 'tag_write'): 'edit',
+    ('photo', 'cover_write'): 'edit',
+    ('save', 'upload'): 'upload',
+    ('render', 'upload'): 'upload',
+}
+
+# Users kept in the per-user byte counts; the smallest are dropped beyond twice this many
+TRACKED_USERS = 10000
+
+
+class RollingWindow:
+    """آخرین N مقدار ثبت شده برای محاسبه صدک‌ها"""
+
+    def __init__(self, size: int = 500):
+        self.values = deque(maxlen=size)
+
+    def add(self, value: float):
+        self.values.append(value)
+
+    def percentile(self, q: float) -> float:
+        if not self.values:
+            return 0.0
+        ordered = sorted(self.values)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class HitRatio:
+    """شمارش برخورد و عدم برخورد یک کش"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    @property
+    def ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class LiveStats:
+    """آمار لحظه‌ای ربات برای /stats
+
+    Every counter is updated where the work happens, so a report reads a few deques and dicts
+    instead of walking sessions or directories.
+    """
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self.latencies: Dict[str, RollingWindow] = {}
+        self.caches: Dict[str, HitRatio] = {}
+        self.user_bytes: Counter = Counter()
+        self.running: Counter = Counter()
+        self.disk_usage: Dict = {}
+        self.disk_checked = 0.0
+        self.started = time.time()
+
+    def observe(self, group: str, seconds: float):
+        window = self.latencies.get(group)
+        if window is None:
+            window = self.latencies[group] = RollingWindow(self.window)
+        window.add(seconds)
+
+    def observe_stage(self, handler: str, stage: str, seconds: float):
+        """شنونده Metrics.stage"""
+        group = STAGE_GROUPS.get((handler, stage))
+        if group:
+            self.observe(group, seconds)
+
+    def cache(self, name: str) -> HitRatio:
+        ratio = self.caches.get(name)
+        if ratio is None:
+            ratio = self.caches[name] = HitRatio()
+        return ratio
+
+    def processed(self, user_id: int, size: int):
+        self.user_bytes[user_id] += size
+        if len(self.user_bytes) > 2 * TRACKED_USERS:
+            self.user_bytes = Counter(dict(self.user_bytes.most_common(TRACKED_USERS)))
+
+    def top_users(self, limit: int = 5) -> List[Tuple[int, int]]:
+        return heapq.nlargest(limit, self.user_bytes.items(), key=lambda item: item[1])
+
+    @contextmanager
+    def job(self, kind: str):
+        """شمارش کارهای در حال اجرا از یک نوع"""
+        self.running[kind] += 1
+        try:
+            yield
+        finally:
+            self.running[kind] -= 1
+
+    def set_disk_usage(self, usage: Dict):
+        self.disk_usage = usage
+        self.disk_checked = time.time()
+
+    def disk_bytes(self, directory: str) -> int:
+        return self.disk_usage.get((('dir', directory),), 0)
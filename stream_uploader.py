@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import os
+from typing import AsyncIterator, Union
+from telethon.tl.functions.upload import SaveBigFilePartRequest, SaveFilePartRequest
+from telethon.tl.types import InputFile, InputFileBig
+import logging
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Telegram requires a fixed part size for every part except the last one
+PART_SIZE = 512 * 1024
+
+# Files above this size must use the "big file" upload API
+BIG_FILE_THRESHOLD = 10 * 1024 * 1024
+
+
+class StreamUploader:
+    """آپلود جریانی داده‌ها در تلگرام بدون دانستن حجم نهایی"""
+
+    def __init__(self, client, parallel_parts: int = 3):
+        self.client = client
+        self.parallel_parts = parallel_parts
+
+    async def upload(self, chunks: AsyncIterator[bytes], file_name: str) -> Union[InputFile, InputFileBig]:
+        """آپلود خروجی یک جریان و برگرداندن فایل قابل ارسال"""
+        file_id = int.from_bytes(os.urandom(8), 'little', signed=True)
+        buffer = bytearray()
+        iterator = chunks.__aiter__()
+
+        try:
+            # Small outputs go through the regular API, which needs the full size up front
+            while len(buffer) <= BIG_FILE_THRESHOLD:
+                try:
+                    buffer.extend(await iterator.__anext__())
+                except StopAsyncIteration:
+                    return await self._upload_small(file_id, bytes(buffer), file_name)
+
+            return await self._upload_big(file_id, buffer, iterator, file_name)
+
+        finally:
+            # A failed upload leaves the producer (an ffmpeg process) mid-stream; stop it now
+            # rather than whenever the generator happens to be collected
+            if hasattr(iterator, 'aclose'):
+                await iterator.aclose()
+
+    async def _upload_small(self, file_id: int, data: bytes, file_name: str) -> InputFile:
+        """آپلود فایل کوچک (زیر ۱۰ مگابایت) با حجم مشخص"""
+        parts = max((len(data) + PART_SIZE - 1) // PART_SIZE, 1)
+        for index in range(parts):
+            part = data[index * PART_SIZE:(index + 1) * PART_SIZE]
+            with tracing.span('upload.part', part=index, bytes=len(part)):
+                uploaded = await self.client(SaveFilePartRequest(file_id, index, part))
+            if not uploaded:
+                raise RuntimeError(f"Failed to upload part {index} of {file_name}")
+        return InputFile(file_id, parts, file_name, hashlib.md5(data).hexdigest())
+
+    async def _upload_big(self, file_id: int, buffer: bytearray, iterator, file_name: str) -> InputFileBig:
+        """آپلود جریانی فایل بزرگ؛ تعداد کل بخش‌ها فقط در بخش آخر مشخص می‌شود"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.parallel_parts * 2)
+        errors = []
+
+        async def sender():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                index, part = item
+                # Keep draining after a failure so the producer never blocks on a full queue
+                if errors:
+                    continue
+                try:
+                    # -1 marks a streamed upload whose total is not known yet
+                    with tracing.span('upload.part', part=index, bytes=len(part)):
+                        uploaded = await self.client(SaveBigFilePartRequest(file_id, index, -1, part))
+                    if not uploaded:
+                        raise RuntimeError(f"Failed to upload part {index} of {file_name}")
+                except Exception as e:
+                    errors.append(e)
+
+        senders = [asyncio.create_task(sender()) for _ in range(self.parallel_parts)]
+        index = 0
+        try:
+            while True:
+                # Keep at least one byte back so the last part is sent with the real total
+                while len(buffer) > PART_SIZE:
+                    if errors:
+                        raise errors[0]
+                    await queue.put((index, bytes(buffer[:PART_SIZE])))
+                    del buffer[:PART_SIZE]
+                    index += 1
+                try:
+                    buffer.extend(await iterator.__anext__())
+                except StopAsyncIteration:
+                    break
+
+            for _ in senders:
+                await queue.put(None)
+            await asyncio.gather(*senders)
+            if errors:
+                raise errors[0]
+
+            total = index + 1
+            with tracing.span('upload.part', part=index, bytes=len(buffer)):
+                uploaded = await self.client(SaveBigFilePartRequest(file_id, index, total, bytes(buffer)))
+            if not uploaded:
+                raise RuntimeError(f"Failed to upload last part of {file_name}")
+            return InputFileBig(file_id, total, file_name)
+
+        finally:
+            for task in senders:
+                task.cancel()
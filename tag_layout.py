@@ -0,0 +1,237 @@
+import os
+import struct
+from typing import BinaryIO, Iterator, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the start of an APIC frame to find where the image begins
+_APIC_HEADER_LIMIT = 4096
+
+# ID3v2 frame format flags that change the stored bytes (grouping, compression, encryption,
+# unsynchronisation, data length indicator); such covers are left to mutagen
+_ID3_TRANSFORM_FLAGS = {3: 0x00E0, 4: 0x004F}
+
+_FLAC_PADDING = 1
+_FLAC_PICTURE = 6
+
+# Path from the top of an MP4 file to its iTunes tag list
+_ILST_PATH = (b'moov', b'udta', b'meta', b'ilst')
+
+
+def _syncsafe(data: bytes) -> int:
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _id3_tag(f: BinaryIO, base: int) -> Optional[Tuple[int, int, int]]:
+    """نسخه، پرچم‌ها و اندازه کامل تگ ID3v2 در موقعیت base"""
+    f.seek(base)
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b'ID3':
+        return None
+    size = 10 + _syncsafe(header[6:10]) + (10 if header[5] & 0x10 else 0)
+    return header[3], header[5], size
+
+
+def _apic_data_start(head: bytes) -> Optional[int]:
+    """فاصله شروع داده تصویر از ابتدای بدنه فریم APIC"""
+    mime_end = head.find(b'\x00', 1)
+    if mime_end < 0:
+        return None
+    # Picture type byte, then the description up to its terminator
+    start = mime_end + 2
+    if head[0] in (1, 2):
+        # UTF-16 descriptions end with an aligned double zero
+        for index in range(start, len(head) - 1, 2):
+            if head[index:index + 2] == b'\x00\x00':
+                return index + 2
+        return None
+    end = head.find(b'\x00', start)
+    return None if end < 0 else end + 1
+
+
+def _id3_cover(f: BinaryIO, base: int) -> Optional[Tuple[int, int]]:
+    tag = _id3_tag(f, base)
+    if tag is None:
+        return None
+    version, flags, _ = tag
+    # v2.2 uses three-letter frame ids; a tag-wide unsynchronisation rewrites the image bytes
+    if version not in (3, 4) or flags & 0x80:
+        return None
+
+    f.seek(base + 6)
+    end = base + 10 + _syncsafe(f.read(4))
+    position = base + 10
+    if flags & 0x40:
+        raw = f.read(4)
+        position += _syncsafe(raw) if version == 4 else struct.unpack('>I', raw)[0] + 4
+
+    while position + 10 <= end:
+        f.seek(position)
+        header = f.read(10)
+        if len(header) < 10 or header[:1] == b'\x00':
+            # Padding
+            return None
+        size = _syncsafe(header[4:8]) if version == 4 else struct.unpack('>I', header[4:8])[0]
+        if header[:4] == b'APIC':
+            if struct.unpack('>H', header[8:10])[0] & _ID3_TRANSFORM_FLAGS[version]:
+                return None
+            start = _apic_data_start(f.read(min(size, _APIC_HEADER_LIMIT)))
+            if start is None or start > size:
+                return None
+            return position + 10 + start, size - start
+        position += 10 + size
+    return None
+
+
+def _flac_blocks(f: BinaryIO, base: int) -> Iterator[Tuple[int, int, int]]:
+    """بلوک‌های متادیتای FLAC به صورت (نوع، شروع بدنه، طول)"""
+    f.seek(base)
+    if f.read(4) != b'fLaC':
+        return
+    position = base + 4
+    while True:
+        f.seek(position)
+        header = f.read(4)
+        if len(header) < 4:
+            return
+        length = int.from_bytes(header[1:4], 'big')
+        yield header[0] & 0x7F, position + 4, length
+        if header[0] & 0x80:
+            return
+        position += 4 + length
+
+
+def _flac_cover(f: BinaryIO, base: int) -> Optional[Tuple[int, int]]:
+    for block_type, body, _ in _flac_blocks(f, base):
+        if block_type != _FLAC_PICTURE:
+            continue
+        # Picture type, then length-prefixed mime type and description, then four 32-bit fields
+        f.seek(body + 4)
+        f.seek(struct.unpack('>I', f.read(4))[0], os.SEEK_CUR)
+        f.seek(struct.unpack('>I', f.read(4))[0] + 16, os.SEEK_CUR)
+        length = struct.unpack('>I', f.read(4))[0]
+        return f.tell(), length
+    return None
+
+
+def _atoms(f: BinaryIO, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """اتم‌های MP4 بین start و end به صورت (نام، شروع بدنه، پایان)"""
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, name = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - position
+        if size < header_size:
+            return
+        yield name, position + header_size, position + size
+        position += size
+
+
+def _find_atom(f: BinaryIO, path: Tuple[bytes, ...], start: int, end: int) -> Optional[Tuple[int, int]]:
+    for name in path:
+        for atom, body, atom_end in _atoms(f, start, end):
+            if atom == name:
+                # 'meta' is a full atom: version and flags come before its children
+                start, end = body + (4 if name == b'meta' else 0), atom_end
+                break
+        else:
+            return None
+    return start, end
+
+
+def _mp4_cover(f: BinaryIO, size: int) -> Optional[Tuple[int, int]]:
+    ilst = _find_atom(f, _ILST_PATH, 0, size)
+    data = ilst and _find_atom(f, (b'covr', b'data'), *ilst)
+    if not data:
+        return None
+    # Type indicator and locale precede the image
+    return data[0] + 8, data[1] - data[0] - 8
+
+
+def _riff_id3(f: BinaryIO, size: int) -> Optional[Tuple[int, int]]:
+    """بازه تکه ID3 در فایل WAV"""
+    position = 12
+    while position + 8 <= size:
+        f.seek(position)
+        chunk_id, length = struct.unpack('<4sI', f.read(8))
+        if chunk_id in (b'id3 ', b'ID3 '):
+            return position + 8, length
+        position += 8 + length + (length & 1)
+    return None
+
+
+def _layout(f: BinaryIO, size: int) -> Tuple[str, int]:
+    """نوع چیدمان تگ و موقعیت شروع آن"""
+    f.seek(0)
+    head = f.read(12)
+    if head[:3] == b'ID3':
+        tag = _id3_tag(f, 0)
+        f.seek(tag[2])
+        # Some FLAC files carry a stray ID3 tag in front of the stream marker
+        return ('flac', tag[2]) if f.read(4) == b'fLaC' else ('id3', 0)
+    if head[:4] == b'fLaC':
+        return 'flac', 0
+    if head[4:8] == b'ftyp':
+        return 'mp4', 0
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        chunk = _riff_id3(f, size)
+        if chunk:
+            return 'id3', chunk[0]
+    return '', 0
+
+
+def locate_cover(file_path: str) -> Optional[Tuple[int, int]]:
+    """موقعیت و طول تصویر کاور اول داخل فایل، بدون خواندن خود تصویر
+
+    Works for ID3v2.3/2.4 (MP3 and WAV), FLAC pictures and MP4 covr atoms. Returns None when
+    there is no cover or its bytes are stored transformed; callers then fall back to mutagen.
+    """
+    try:
+        size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            kind, base = _layout(f, size)
+            if kind == 'id3':
+                return _id3_cover(f, base)
+            if kind == 'flac':
+                return _flac_cover(f, base)
+            if kind == 'mp4':
+                return _mp4_cover(f, size)
+    except FileNotFoundError:
+        return None
+    except (OSError, struct.error, TypeError) as e:
+        logger.error(f"Error locating cover in {file_path}: {e}")
+    return None
+
+
+def tag_size(file_path: str) -> int:
+    """حجم تگ‌هایی که mutagen هنگام بارگذاری فایل در حافظه نگه می‌دارد (تخمینی)"""
+    try:
+        size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            kind, base = _layout(f, size)
+            total = 0
+            if base or kind == 'id3':
+                tag = _id3_tag(f, 0 if kind == 'flac' else base)
+                total += tag[2] if tag else 0
+            if kind == 'flac':
+                total += sum(4 + length for block_type, _, length in _flac_blocks(f, base)
+                             if block_type != _FLAC_PADDING)
+            elif kind == 'mp4':
+                ilst = _find_atom(f, _ILST_PATH, 0, size)
+                total += ilst[1] - ilst[0] if ilst else 0
+            # Other layouts (Ogg, raw AAC) are not accounted
+            return total
+    except FileNotFoundError:
+        return 0
+    except (OSError, struct.error, TypeError) as e:
+        logger.error(f"Error measuring tags of {file_path}: {e}")
+        return 0
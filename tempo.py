@@ -0,0 +1,109 @@
+import math
+from typing import Optional
+import numpy as np
+from pcm_reader import PcmReader
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Onset analysis runs on a low-rate mono decode
+SAMPLE_RATE = 11025
+FFT_SIZE = 1024
+HOP_SIZE = 128
+FRAME_RATE = SAMPLE_RATE / HOP_SIZE
+
+MIN_BPM = 60.0
+MAX_BPM = 200.0
+
+# Tempo prior: log-normal around 120 BPM; keeps half/double tempo errors rare
+PRIOR_BPM = 120.0
+PRIOR_OCTAVES = 0.6
+
+# Envelope frames per autocorrelation block (~24 s)
+ACF_BLOCK = 2048
+
+# A beat period is scored together with its multiples (bar-level repetition)
+HARMONICS = (1, 2, 4)
+
+
+def _block_autocorrelation(envelope: np.ndarray, max_lag: int) -> np.ndarray:
+    """خودهمبستگی یک بلوک پوش onset با FFT"""
+    centered = envelope - envelope.mean()
+    size = 1 << int(math.ceil(math.log2(len(centered) + max_lag + 1)))
+    spectrum = np.fft.rfft(centered, size)
+    return np.fft.irfft(spectrum * np.conj(spectrum), size)[:max_lag + 1]
+
+
+def _harmonic_peaks(acf: np.ndarray, beat_lag: int, harmonic: int) -> np.ndarray:
+    """بیشینه خودهمبستگی در اطراف مضرب‌های هر تأخیر"""
+    # A fractional beat period drifts by up to half a frame per multiple
+    reach = harmonic // 2
+    padded = np.pad(np.maximum(acf, 0), (reach, reach))
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * reach + 1)
+    return windows[np.arange(beat_lag + 1) * harmonic].max(axis=1)
+
+
+def estimate_bpm(file_path: str, ffmpeg_binary: str = 'ffmpeg') -> Optional[float]:
+    """تخمین تمپو (BPM) از خودهمبستگی پوش onset"""
+    reader = PcmReader(file_path, sample_rate=SAMPLE_RATE, mono=True, ffmpeg_binary=ffmpeg_binary)
+    window = np.hanning(FFT_SIZE).astype(np.float32)
+    beat_lag = int(math.ceil(FRAME_RATE * 60 / MIN_BPM)) + 1
+    max_lag = beat_lag * HARMONICS[-1]
+
+    pending = np.zeros(0, dtype=np.float32)
+    previous = None             # log spectrum of the last frame of the previous block
+    envelope = np.zeros(0)
+    acf = np.zeros(max_lag + 1)
+    blocks = 0
+
+    for block in reader.blocks(SAMPLE_RATE * 10):
+        pending = np.concatenate([pending, block[:, 0]])
+        frames = (len(pending) - FFT_SIZE) // HOP_SIZE + 1 if len(pending) >= FFT_SIZE else 0
+        if not frames:
+            continue
+
+        windows = np.lib.stride_tricks.sliding_window_view(pending, FFT_SIZE)[::HOP_SIZE][:frames]
+        spectra = np.log1p(100 * np.abs(np.fft.rfft(windows * window, axis=1)))
+        pending = pending[frames * HOP_SIZE:]
+
+        # Spectral flux: energy that appears from one frame to the next
+        if previous is not None:
+            spectra = np.concatenate([previous[None, :], spectra])
+        flux = np.maximum(np.diff(spectra, axis=0), 0).sum(axis=1)
+        previous = spectra[-1]
+        envelope = np.concatenate([envelope, flux])
+
+        while len(envelope) >= ACF_BLOCK:
+            acf += _block_autocorrelation(envelope[:ACF_BLOCK], max_lag)
+            # Blocks overlap by the longest lag so no beat pair is lost at the seams
+            envelope = envelope[ACF_BLOCK - max_lag:]
+            blocks += 1
+
+    if len(envelope) > max_lag * 2:
+        acf += _block_autocorrelation(envelope, max_lag)
+        blocks += 1
+    if not blocks or acf[0] <= 0:
+        return None
+
+    acf /= acf[0]
+    lags = np.arange(beat_lag + 1, dtype=np.float64)
+    lags[0] = 1.0
+    bpm = 60 * FRAME_RATE / lags
+    in_range = (bpm >= MIN_BPM) & (bpm <= MAX_BPM)
+    prior = np.exp(-0.5 * (np.log2(bpm / PRIOR_BPM) / PRIOR_OCTAVES) ** 2)
+    pulse = sum(_harmonic_peaks(acf, beat_lag, harmonic) / harmonic for harmonic in HARMONICS)
+    score = np.where(in_range, pulse * prior, -np.inf)
+
+    best = int(np.argmax(score))
+    if not np.isfinite(score[best]) or acf[best] <= 0:
+        return None
+
+    # Parabolic interpolation between neighbouring lags for sub-frame precision
+    lag = float(best)
+    if 0 < best < len(acf) - 1:
+        left, center, right = acf[best - 1], acf[best], acf[best + 1]
+        curvature = left - 2 * center + right
+        if curvature < 0:
+            lag += 0.5 * (left - right) / curvature
+
+    return round(60 * FRAME_RATE / lag, 1)
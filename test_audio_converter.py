@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+تست ساخت آرگومان‌های ffmpeg و اجرای جریانی آن
+"""
+
+import asyncio
+import os
+import stat
+import sys
+import tempfile
+from audio_converter import AudioConverter, FFmpegError, FFmpegRunner
+
+
+def fake_ffmpeg(directory: str, body: str) -> str:
+    """اسکریپت جایگزین ffmpeg با رفتار مشخص"""
+    path = os.path.join(directory, 'ffmpeg')
+    with open(path, 'w') as f:
+        f.write(f"#!/bin/sh\n{body}\n")
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return path
+
+
+def test_build_args():
+    """تست آرگومان‌ها برای ورودی pipe و مسیر، تگ‌ها، کاور و بیت‌ریت"""
+    print("🧾 تست آرگومان‌های ffmpeg...")
+    converter = AudioConverter()
+    metadata = {'title': 'آهنگ', 'artist': 'Artist', 'year': '2020', 'album': ''}
+
+    args, feed = converter.build_args('temp/a.flac', 'mp3', metadata)
+    assert feed == 'temp/a.flac'
+    assert args[:4] == ['-i', 'pipe:0', '-map', '0:a:0']
+    assert args[args.index('-c:a') + 1] == 'libmp3lame' and args[args.index('-b:a') + 1] == '320k'
+    assert '-disposition:v' in args and '-vn' not in args
+    tags = [args[index + 1] for index, arg in enumerate(args) if arg == '-metadata']
+    assert tags == ['title=آهنگ', 'artist=Artist', 'date=2020']
+    assert args[-5:] == ['-id3v2_version', '3', '-f', 'mp3', 'pipe:1']
+
+    # MP4 is read by path; Ogg carries the cover as a comment instead of a stream
+    args, feed = converter.build_args('temp/a.m4a', 'opus', {}, bitrate='96k', cover_data=b'\x89PNG' + b'\0' * 16)
+    assert feed is None and args[1] == 'temp/a.m4a'
+    assert '-vn' in args and args[args.index('-b:a') + 1] == '96k'
+    assert any(arg.startswith('METADATA_BLOCK_PICTURE=') for arg in args)
+    assert args[-3:] == ['-f', 'ogg', 'pipe:1']
+
+    args, _ = converter.build_args('temp/a.mp3', 'flac', {})
+    assert '-b:a' not in args and '-id3v2_version' not in args
+
+
+def test_runner_failure_and_cleanup():
+    """تست گزارش stderr هنگام خطا و کشتن پردازه وقتی خروجی نیمه‌کاره رها می‌شود"""
+    print("💥 تست خطا و پاکسازی ffmpeg...")
+
+    async def scenario(directory: str):
+        failing = FFmpegRunner(fake_ffmpeg(directory, "echo \"Unknown encoder 'libfoo'\" >&2; exit 1"), 1)
+        try:
+            async for _ in failing.stream(['-f', 'mp3', 'pipe:1']):
+                pass
+            raise AssertionError("ffmpeg failure was not raised")
+        except FFmpegError as e:
+            assert "Unknown encoder 'libfoo'" in str(e)
+        assert failing.active == 0
+
+        pid_path = os.path.join(directory, 'pid')
+        endless = FFmpegRunner(fake_ffmpeg(directory, f"echo $$ > {pid_path}; exec cat /dev/zero"), 1)
+        input_path = os.path.join(directory, 'input.mp3')
+        with open(input_path, 'wb') as f:
+            f.write(b'\0' * 1024)
+        converter = AudioConverter(runner=endless)
+        stream = converter.convert_stream(input_path, 'flac', {})
+        assert len(await stream.__anext__()) > 0
+        await stream.aclose()
+        assert endless.active == 0
+        with open(pid_path) as f:
+            pid = int(f.read())
+        # Killed and reaped: the pid no longer exists
+        try:
+            os.kill(pid, 0)
+            raise AssertionError("ffmpeg is still running")
+        except ProcessLookupError:
+            pass
+        # The slot was released
+        assert not endless._slots.locked()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        asyncio.run(scenario(temp_dir))
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_build_args, test_runner_failure_and_cleanup]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+تست پیشنهاد خودکار مقادیر فیلدها
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from autocomplete import AutocompleteIndex, normalize
+from benchmark_audio_editor import build_fixture
+from load_test import FakeClient, FakeEvent, FakeMedia, load_test_config
+from music_bot import MusicBot
+
+
+def test_normalize():
+    """تست یکسان‌سازی متن فارسی و لاتین"""
+    print("🔤 تست یکسان‌سازی متن...")
+
+    assert normalize("علي‌رضا  كريمي") == "علی رضا کریمی"
+    assert normalize("Beyoncé") == "beyonce"
+    assert normalize("  The   BEATLES ") == "the beatles"
+    assert normalize("۱۳۹۹") == "1399"
+
+
+def test_suggest_ranking():
+    """تست پیشنهاد بر اساس پیشوند کلمه‌ها و تعداد تکرار"""
+    print("✨ تست رتبه‌بندی پیشنهادها...")
+
+    index = AutocompleteIndex()
+    index.record('artist', 'The Beatles', 5)
+    index.record('artist', 'the beatles')
+    index.record('artist', 'Beach Boys', 2)
+    index.record('artist', 'محسن چاوشی', 3)
+    index.record('artist', 'محسن يگانه')
+    index.record('title', 'ignored')
+
+    assert index.suggest('artist', 'bea') == ['The Beatles', 'Beach Boys']
+    assert index.suggest('artist', 'BEATL') == ['The Beatles']
+    assert index.suggest('artist', 'محسن') == ['محسن چاوشی', 'محسن يگانه']
+    assert index.suggest('artist', 'یگ') == ['محسن يگانه']
+    assert index.suggest('artist', limit=1) == ['The Beatles']
+    assert index.suggest('title', 'ig') == []
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        index.suggest('artist', 'bea')
+    assert (time.perf_counter() - start) / 1000 < 0.001
+
+
+def test_persistence():
+    """تست ذخیره و بارگذاری ایندکس"""
+    print("💾 تست ذخیره ایندکس...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "autocomplete.json")
+        index = AutocompleteIndex(path)
+        index.record_metadata([{'artist': 'Queen', 'album': 'A Night at the Opera', 'genre': 'Rock'}] * 3)
+        index.record('genre', 'Pop')
+        assert index.save()
+
+        loaded = AutocompleteIndex(path)
+        assert len(loaded) == 4
+        assert loaded.suggest('album', 'opera') == ['A Night at the Opera']
+        assert loaded.suggest('genre') == ['Rock', 'Pop']
+
+
+def test_saved_in_batches():
+    """تست اینکه ویرایش فیلدها فایل ایندکس را بازنویسی نمی‌کند و مقادیر هنگام خاموش شدن ذخیره می‌شوند"""
+    print("🗂️ تست ذخیره دسته‌ای ایندکس...")
+
+    async def scenario(workspace):
+        client = FakeClient(latency=0.0, download_bandwidth=0, upload_bandwidth=0)
+        bot = MusicBot(client=client, config=load_test_config(workspace))
+        document = FakeMedia(1, build_fixture(workspace, 'mp3-cbr', '64k'), 'one.mp3')
+        await client.dispatch('message', FakeEvent(client, 1, document=document, message_id=1))
+        for artist in ('Queen', 'Queen', 'Muse'):
+            for data in (b'edit_metadata', b'edit_artist'):
+                await client.dispatch('callback', FakeEvent(client, 1, data=data, message_id=client.menus[1]))
+            await client.dispatch('message', FakeEvent(client, 1, text=artist))
+        assert not os.path.exists(bot.autocomplete.path)
+        assert bot.autocomplete.dirty and bot.autocomplete.suggest('artist', 'q') == ['Queen']
+
+        await bot.shutdown(0)
+        assert not bot.autocomplete.dirty
+        return bot.autocomplete.path
+
+    with tempfile.TemporaryDirectory() as workspace:
+        path = asyncio.run(scenario(workspace))
+        assert AutocompleteIndex(path).suggest('artist') == ['Queen', 'Muse']
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_normalize, test_suggest_ranking, test_persistence, test_saved_in_batches]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+تست فایل‌های تست بنچمارک و مقایسه با baseline
+"""
+
+import json
+import os
+import sys
+import tempfile
+from mutagen import File as MutagenFile
+from benchmark_audio_editor import FORMATS, SIZES, build_fixture, compare, main as run_benchmark
+
+
+def test_fixtures():
+    """تست ساخت فایل‌های قطعی، sparse و قابل خواندن برای هر فرمت"""
+    print("🎼 تست فایل‌های تست بنچمارک...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for fmt in FORMATS:
+            path = build_fixture(temp_dir, fmt, '8m')
+            assert os.path.getsize(path) == SIZES['8m'], fmt
+            # Everything after the first megabyte is a hole (when the filesystem supports it)
+            assert os.stat(path).st_blocks * 512 < SIZES['8m'] / 2, fmt
+
+            audio = MutagenFile(path, easy=True)
+            assert audio.info.length > 60, fmt
+            assert audio['title'] == ['Benchmark Track'], fmt
+
+            with open(path, 'rb') as f:
+                first = f.read()
+            os.remove(path)
+            with open(build_fixture(temp_dir, fmt, '8m'), 'rb') as f:
+                assert f.read() == first, f"{fmt} fixture is not deterministic"
+
+
+def test_compare():
+    """تست تشخیص افت زمان، حافظه و I/O با در نظر گرفتن نویز"""
+    print("📏 تست مقایسه با baseline...")
+    base = {'seconds': 0.100, 'peak_rss': 40 << 20, 'read_bytes': 8 << 20, 'written_bytes': 8 << 20}
+    baseline = {'update_metadata/flac/8m': base, 'generate_filename': {**base, 'seconds': 0.00001}}
+
+    same = {'update_metadata/flac/8m': {**base, 'seconds': 0.110},
+            'generate_filename': {**base, 'seconds': 0.00003},
+            'get_metadata/ogg/8m': base}
+    assert compare(same, baseline) == []
+
+    slower = {'update_metadata/flac/8m': {**base, 'seconds': 0.140, 'written_bytes': 16 << 20}}
+    regressions = compare(slower, baseline)
+    assert len(regressions) == 2
+    assert 'written_bytes' in regressions[1]
+
+    # Without /proc the I/O counters are unknown and skipped
+    assert compare({'update_metadata/flac/8m': {**base, 'read_bytes': None}}, baseline) == []
+
+
+def test_exit_codes():
+    """تست خطا بدون baseline و کد خروج 1 هنگام افت نسبت به baseline ذخیره شده"""
+    print("🚦 تست کد خروج بنچمارک...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        baseline_path = os.path.join(temp_dir, 'baseline.json')
+        fixtures = os.path.join(temp_dir, 'fixtures')
+        args = ['--sizes', '64k', '--formats', 'mp3-cbr', '--repeat', '1',
+                '--fixtures', fixtures, '--baseline', baseline_path]
+
+        # Refused before any fixture is built
+        assert run_benchmark(args) == 2
+        assert not os.path.exists(fixtures)
+        assert run_benchmark(args + ['--no-compare']) == 0
+
+        assert run_benchmark(args + ['--save-baseline']) == 0
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        assert baseline['machine']['python'] and 'update_metadata/mp3-cbr/64k' in baseline['results']
+
+        # A baseline far faster than anything possible turns every case into a regression
+        for result in baseline['results'].values():
+            result.update(seconds=1e-9, written_bytes=0)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f)
+        assert run_benchmark(args) == 1
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_fixtures, test_compare, test_exit_codes]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
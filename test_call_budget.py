@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+تست بودجه درخواست‌های خروجی هر چت
+"""
+
+import sys
+from call_budget import CallBudget
+from fake_clock import FakeClock
+
+
+def test_optional_calls_limited():
+    """تست رد درخواست‌های اختیاری پس از اتمام بودجه و پر شدن دوباره آن"""
+    print("🪣 تست سطل توکن...")
+    clock = FakeClock()
+    budget = CallBudget(per_minute=60, burst=5, clock=clock)
+
+    assert [budget.allow(1) for _ in range(7)] == [True] * 5 + [False] * 2
+    assert budget.skipped == 2
+    # Another chat has its own budget
+    assert budget.allow(2)
+
+    clock.now += 2
+    assert budget.allow(1) and budget.allow(1) and not budget.allow(1)
+    assert budget.calls[1] == 7
+
+
+def test_essential_calls_borrow():
+    """تست اینکه درخواست‌های ضروری همیشه ثبت می‌شوند و بودجه اختیاری را مصرف می‌کنند"""
+    print("📨 تست درخواست‌های ضروری...")
+    clock = FakeClock()
+    budget = CallBudget(per_minute=60, burst=3, clock=clock)
+
+    for _ in range(5):
+        budget.spend(1)
+    assert budget.calls[1] == 5
+    assert not budget.allow(1)
+
+    # Two calls of debt plus one for the optional call itself
+    clock.now += 2.5
+    assert not budget.allow(1)
+    clock.now += 0.5
+    assert budget.allow(1)
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_optional_calls_limited, test_essential_calls_borrow]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+تست جریان افزودن کاور: ارسال عکس پس از انتخاب افزودن/جایگزینی کاور
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from benchmark_audio_editor import build_cover, build_fixture
+from load_test import FakeClient, FakeEvent, FakeMedia, load_test_config
+from music_bot import MusicBot
+from session_state import MAIN_MENU
+
+
+async def send_cover(workspace: str, photo_path: str, action: bytes = b'cover_add'):
+    """باز کردن فایل، انتخاب عملیات کاور و ارسال عکس"""
+    document_path = build_fixture(workspace, 'mp3-cbr', '64k')
+    client = FakeClient(latency=0.0, download_bandwidth=0, upload_bandwidth=0)
+    bot = MusicBot(client=client, config=load_test_config(workspace))
+    try:
+        await client.dispatch('message', FakeEvent(client, 1, document=FakeMedia(1, document_path, 'one.mp3'),
+                                                   message_id=1))
+        for data in (b'edit_cover', action):
+            await client.dispatch('callback', FakeEvent(client, 1, data=data, message_id=client.menus[1]))
+        await client.dispatch('message', FakeEvent(client, 1, photo=FakeMedia(2, photo_path)))
+        session = bot.user_sessions[1]
+        cover = bot.audio_editor.get_cover_data(session['temp_file'])
+        return client, session, cover
+    finally:
+        for session in bot.user_sessions.values():
+            bot.discard_render(session)
+        bot.render_pool.shutdown(wait=True)
+        bot.jobs.close()
+
+
+def test_cover_written():
+    """تست نوشته شدن کاور و بازگشت به منوی اصلی پس از ارسال عکس"""
+    print("🖼️ تست افزودن کاور...")
+    with tempfile.TemporaryDirectory() as workspace:
+        cover_path = build_cover(workspace, 300)
+        for action in (b'cover_add', b'cover_replace'):
+            client, session, cover = asyncio.run(send_cover(workspace, cover_path, action))
+
+            assert session['state'].name == MAIN_MENU
+            assert session['metadata']['has_cover'] and cover
+            menu = client.messages[(1, client.menus[1])]
+            assert menu.buttons and '✅ کاور' in menu.text
+            assert client.error_replies == 0
+
+
+def test_bad_photo_restores_menu():
+    """تست بازگشت منو همراه با پیام خطا وقتی عکس قابل استفاده نیست"""
+    print("🚫 تست عکس نامعتبر...")
+    with tempfile.TemporaryDirectory() as workspace:
+        photo_path = os.path.join(workspace, 'broken.jpg')
+        with open(photo_path, 'wb') as f:
+            f.write(b'not an image')
+        client, session, _ = asyncio.run(send_cover(workspace, photo_path))
+
+        assert session['state'].name == MAIN_MENU
+        menu = client.messages[(1, client.menus[1])]
+        assert menu.buttons and menu.text.lstrip().startswith('❌')
+        assert not os.path.exists(os.path.join(os.path.dirname(session['temp_file']), 'temp_cover_1.jpg'))
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_cover_written, test_bad_photo_restores_menu]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
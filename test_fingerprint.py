@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+تست اثرانگشت صوتی و ایندکس ترک‌های تکراری
+"""
+
+import os
+import sys
+import tempfile
+import wave
+import numpy as np
+from fingerprint import FingerprintIndex, fingerprint
+
+
+def create_song(path, seed, sample_rate=22050, seconds=30, skip=0.0, gain=1.0, noise=0.0):
+    """ایجاد WAV با آکوردهای تصادفی (هر آکورد 250 میلی‌ثانیه)"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sample_rate * 0.25)) / sample_rate
+    chords = []
+    for notes in rng.integers(40, 90, size=(seconds * 4, 3)):
+        chords.append(sum(np.sin(2 * np.pi * 440 * 2 ** ((note - 69) / 12) * t) for note in notes) / 3)
+    signal = np.concatenate(chords)[int(skip * sample_rate):] * 0.5 * gain
+    signal += noise * np.random.default_rng(0).standard_normal(len(signal))
+    with wave.open(path, 'w') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes((np.clip(signal, -1, 1) * 32767).astype('<i2').tobytes())
+
+
+def test_fingerprint_hashes():
+    """تست پایداری هش‌ها"""
+    print("🔑 تست ساخت اثرانگشت...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "song.wav")
+        create_song(path, 1)
+
+        hashes, offsets = fingerprint(path)
+        assert len(hashes) == len(offsets) > 100
+        again, _ = fingerprint(path)
+        assert np.array_equal(hashes, again)
+
+
+def test_match_variant():
+    """تست شناسایی نسخه دیگر همان ضبط و رد ضبط متفاوت"""
+    print("🔁 تست شناسایی ترک تکراری...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index = FingerprintIndex(os.path.join(temp_dir, "index.db"))
+        for seed in range(1, 4):
+            path = os.path.join(temp_dir, f"{seed}.wav")
+            create_song(path, seed, sample_rate=44100)
+            index.add(*fingerprint(path), {'title': f"Song {seed}"})
+        assert len(index) == 3
+
+        # Different rate, level, noise and a shifted start
+        variant = os.path.join(temp_dir, "variant.wav")
+        create_song(variant, 2, sample_rate=22050, skip=1.3, gain=0.6, noise=0.02)
+        match = index.match(*fingerprint(variant))
+        assert match and match['metadata']['title'] == "Song 2"
+
+        index.update_metadata(match['track_id'], {'title': "Curated"})
+        assert index.match(*fingerprint(variant))['metadata']['title'] == "Curated"
+
+        other = os.path.join(temp_dir, "other.wav")
+        create_song(other, 9)
+        assert index.match(*fingerprint(other)) is None
+        index.close()
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_fingerprint_hashes, test_match_variant]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
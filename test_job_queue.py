@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+تست صف پایدار کارها و ادامه آن‌ها پس از راه‌اندازی مجدد
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from job_queue import MAX_ATTEMPTS, JobQueue
+from load_test import FakeClient, FakeEvent, FakeMedia, load_test_config
+from benchmark_audio_editor import build_fixture
+from music_bot import MusicBot
+
+
+def test_checkpoints_survive_reopen():
+    """تست ماندگاری مرحله و داده‌های کار پس از باز کردن دوباره پایگاه داده"""
+    print("💾 تست ماندگاری کارها...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'jobs.db')
+        queue = JobQueue(path)
+        save = queue.add('save', 7, 70, 'tag_write', temp_file='temp/a.mp3', metadata={'title': 'آهنگ'})
+        done = queue.add('document', 8, 80, 'download', message_id=5)
+        assert queue.checkpoint(save, 'upload', output_path='output/a.mp3')
+        assert queue.finish(done)
+        assert not queue.checkpoint(done, 'parse')
+        queue.close()
+
+        queue = JobQueue(path)
+        jobs = queue.claim_pending()
+        assert len(jobs) == 1
+        job = jobs[0]
+        assert (job['kind'], job['user_id'], job['chat_id'], job['stage']) == ('save', 7, 70, 'upload')
+        assert job['data'] == {'temp_file': 'temp/a.mp3', 'metadata': {'title': 'آهنگ'},
+                               'output_path': 'output/a.mp3'}
+        assert job['attempts'] == 1
+
+        # A job that keeps failing to resume is eventually given up
+        for _ in range(MAX_ATTEMPTS - 1):
+            assert queue.claim_pending()
+        assert queue.claim_pending() == []
+        assert len(queue) == 0
+        queue.close()
+
+
+async def crash_and_restart(workspace: str, document_path: str):
+    config = load_test_config(workspace)
+    client = FakeClient(latency=0.0, download_bandwidth=0, upload_bandwidth=16 * 1024, chunk_size=4096)
+    bot = MusicBot(client=client, config=config)
+    size = os.path.getsize(document_path)
+
+    # User 1 has a file open and saves it; the bot dies during the upload
+    await client.dispatch('message', FakeEvent(client, 1, document=FakeMedia(1, document_path, 'one.mp3'),
+                                               message_id=1))
+    save = asyncio.create_task(client.dispatch(
+        'callback', FakeEvent(client, 1, data=b'save_download', message_id=client.menus[1])))
+    # User 2's file is still downloading when it dies
+    client.download_bandwidth = 16 * 1024
+    receive = asyncio.create_task(client.dispatch(
+        'message', FakeEvent(client, 2, document=FakeMedia(2, document_path, 'two.mp3'), message_id=2)))
+    await asyncio.sleep(0.5)
+    save.cancel()
+    receive.cancel()
+    await asyncio.gather(save, receive, return_exceptions=True)
+    assert client.files_sent == 0
+    assert client.transferred['download'] == size
+    bot.render_pool.shutdown(wait=True)
+    bot.jobs.close()
+
+    # The restarted bot talks to the same chats, with the same messages on Telegram's side
+    restarted_client = FakeClient(latency=0.0, download_bandwidth=0, upload_bandwidth=0)
+    restarted_client.received = client.received
+    restarted = MusicBot(client=restarted_client, config=config)
+    try:
+        await restarted.resume_jobs()
+        return restarted_client, restarted, size
+    finally:
+        restarted.render_pool.shutdown(wait=True)
+
+
+def test_resume_after_crash():
+    """تست ادامه ذخیره و دریافت قطع شده بدون انتقال دوباره فایل‌های موجود روی دیسک"""
+    print("♻️ تست ادامه کارها پس از راه‌اندازی مجدد...")
+    with tempfile.TemporaryDirectory() as workspace:
+        document_path = build_fixture(workspace, 'mp3-cbr', '64k')
+        client, bot, size = asyncio.run(crash_and_restart(workspace, document_path))
+
+        # The save resumed from the tagged output; only user 2's file was downloaded again
+        assert client.files_sent == 1
+        assert client.transferred['download'] == size
+        assert len(bot.jobs) == 0
+        assert 1 not in bot.user_sessions and 2 in bot.user_sessions
+        assert client.menus.get(2)
+        assert os.listdir(bot.config.OUTPUT_DIR) == []
+        assert os.listdir(bot.config.TEMP_DIR) == ['temp_2_two.mp3']
+        bot.jobs.close()
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_checkpoints_survive_reopen, test_resume_after_crash]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
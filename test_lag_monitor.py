@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+تست اندازه‌گیری تأخیر event loop و تشخیص فراخوانی‌های مسدودکننده
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from benchmark_audio_editor import build_cover, build_fixture
+from lag_monitor import LagMonitor
+from load_test import FakeClient, FakeEvent, FakeMedia, load_test_config
+from metrics import Metrics
+from music_bot import MusicBot
+
+
+def write_tags_blocking():
+    time.sleep(0.3)
+
+
+async def handle_save():
+    await asyncio.sleep(0.05)
+    write_tags_blocking()
+
+
+def test_blocking_call_is_located():
+    """تست ثبت handler و خط مسدودکننده از stack رشته loop"""
+    print("🐢 تست تشخیص فراخوانی مسدودکننده...")
+    metrics = Metrics()
+    monitor = LagMonitor(interval=0.02, threshold=0.1)
+    monitor.register(metrics)
+
+    async def scenario():
+        monitor.start()
+        try:
+            # Telethon runs each handler as its own task
+            await asyncio.create_task(handle_save())
+            await asyncio.sleep(0.05)
+        finally:
+            await monitor.stop()
+
+    asyncio.run(scenario())
+
+    assert len(monitor.stalls) == 1
+    stall = monitor.stalls[0]
+    assert stall['handler'] == 'handle_save'
+    assert 'write_tags_blocking' in stall['location']
+    assert monitor.max_lag >= 0.2
+    text = metrics.render()
+    assert 'musicbot_event_loop_stalls_total 1' in text
+    assert 'musicbot_event_loop_lag_seconds_bucket{le="0.5"}' in text
+
+
+def test_idle_loop_percentiles():
+    """تست صدک‌های تأخیر برای loop بدون کار مسدودکننده"""
+    print("📉 تست صدک‌های تأخیر...")
+    monitor = LagMonitor(interval=0.01, threshold=0.1)
+
+    async def scenario():
+        monitor.start()
+        await asyncio.sleep(0.2)
+        await monitor.stop()
+
+    asyncio.run(scenario())
+
+    assert len(monitor.samples) >= 5
+    assert monitor.percentile(0.5) < 0.05
+    assert monitor.percentile(0.5) <= monitor.percentile(0.99) == max(monitor.samples)
+    assert not monitor.stalls
+
+
+def slowed(function, seconds: float = 0.3):
+    def run(*args, **kwargs):
+        time.sleep(seconds)
+        return function(*args, **kwargs)
+    return run
+
+
+async def edit_cover_and_save(workspace: str) -> LagMonitor:
+    """افزودن کاور و ذخیره سرد با عملیات کند AudioEditor و اندازه‌گیری تأخیر loop"""
+    config = load_test_config(workspace)
+    # No speculative render: the save writes the tags itself
+    config.RENDER_DEBOUNCE = 60
+    client = FakeClient(latency=0.0, download_bandwidth=0, upload_bandwidth=0)
+    bot = MusicBot(client=client, config=config)
+    editor = bot.audio_editor
+    for name in ('get_metadata', 'add_cover_art', 'update_metadata'):
+        setattr(editor, name, slowed(getattr(editor, name)))
+
+    monitor = LagMonitor(interval=0.02, threshold=0.1)
+    monitor.start()
+    try:
+        document = FakeMedia(1, build_fixture(workspace, 'mp3-cbr', '64k'), 'one.mp3')
+        await client.dispatch('message', FakeEvent(client, 1, document=document, message_id=1))
+        for data in (b'edit_cover', b'cover_add'):
+            await client.dispatch('callback', FakeEvent(client, 1, data=data, message_id=client.menus[1]))
+        await client.dispatch('message', FakeEvent(client, 1, photo=FakeMedia(2, build_cover(workspace, 300))))
+        await client.dispatch('callback', FakeEvent(client, 1, data=b'save_download', message_id=client.menus[1]))
+    finally:
+        await monitor.stop()
+        bot.render_pool.shutdown(wait=True)
+        bot.jobs.close()
+    assert client.files_sent == 1
+    return monitor
+
+
+def test_handlers_keep_loop_free():
+    """تست اجرای خواندن تگ، نوشتن کاور و نوشتن تگ‌ها بیرون از رشته loop"""
+    print("🧵 تست اجرای کارهای کند در executor...")
+    with tempfile.TemporaryDirectory() as workspace:
+        monitor = asyncio.run(edit_cover_and_save(workspace))
+        assert not monitor.stalls, monitor.stalls
+        assert monitor.max_lag < 0.25
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_blocking_call_is_located, test_idle_loop_percentiles, test_handlers_keep_loop_free]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+تست ابزار تست بار با کلاینت شبیه‌سازی شده
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from load_test import FLOWS, read_stream, run_load_test, synthesize, write_stream
+
+
+def test_stream_record_replay():
+    """تست قطعی بودن جریان ساختگی و ذخیره/بازخوانی JSONL"""
+    print("📝 تست ضبط و بازپخش جریان...")
+    updates = synthesize(30, seed=7)
+    assert updates == synthesize(30, seed=7)
+    assert updates != synthesize(30, seed=8)
+    assert len({update['user'] for update in updates}) == 30
+    assert all(update['delay'] >= 0 for update in updates)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'stream.jsonl')
+        write_stream(path, updates)
+        assert read_stream(path) == updates
+
+
+def test_concurrent_users():
+    """تست اجرای جریان‌های کامل ویرایش برای کاربران همزمان"""
+    print("👥 تست کاربران همزمان...")
+    updates = synthesize(20, seed=3, think=0.01, ramp=0.1)
+    saving_users = {update['user'] for update in updates if update['flow'] != 'browse_cancel'}
+
+    with tempfile.TemporaryDirectory() as workspace:
+        report = asyncio.run(run_load_test(updates, workspace, latency=0.0,
+                                           download_bandwidth=1e9, upload_bandwidth=1e9))
+
+    assert report['updates'] == len(updates)
+    assert report['exceptions'] == {}
+    assert report['error_replies'] == 0 and report['alerts'] == 0
+    # Cover photos were written, not just handled without raising
+    assert report['failed_steps'] == {}
+    assert report['covers_applied'] == sum(update['kind'] == 'photo' for update in updates) > 0
+    # Every session that saved got its file, and nothing is left behind
+    assert report['files_sent'] == len(saving_users)
+    assert report['open_sessions'] == 0
+    assert report['temp_files_left'] == 0
+    assert report['latency']['document']['count'] == 20
+    assert set(report['latency']) <= {'document', 'callback', 'text', 'photo', 'command'}
+    assert all(flow in FLOWS for flow in {update['flow'] for update in updates})
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_stream_record_replay, test_concurrent_users]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+تست اندازه‌گیری بلندی صدا و تگ‌های ReplayGain
+"""
+
+import os
+import sys
+import tempfile
+import wave
+import numpy as np
+from audio_editor import AudioEditor
+from loudness import analyze_file, k_weighting_coefficients
+
+
+def create_sine(path, amplitude, sample_rate=48000, seconds=10):
+    """ایجاد فایل WAV استریو با موج سینوسی 997 هرتز"""
+    t = np.arange(sample_rate * seconds) / sample_rate
+    samples = (amplitude * np.sin(2 * np.pi * 997 * t) * 32767).astype('<i2')
+    with wave.open(path, 'w') as wav_file:
+        wav_file.setnchannels(2)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(np.stack([samples, samples], axis=1).tobytes())
+
+
+def test_k_weighting_coefficients():
+    """تست ضرایب فیلتر با مقادیر مرجع BS.1770 در 48 کیلوهرتز"""
+    print("🔍 تست ضرایب K-weighting...")
+
+    (shelf_b, shelf_a), (pass_b, pass_a) = k_weighting_coefficients(48000)
+    assert np.allclose(shelf_b, [1.53512485958697, -2.69169618940638, 1.19839281085285])
+    assert np.allclose(shelf_a, [1.0, -1.69065929318241, 0.73248077421585])
+    assert np.allclose(pass_a, [1.0, -1.99004745483398, 0.99007225036621])
+
+
+def test_sine_loudness():
+    """تست بلندی موج سینوسی تمام مقیاس (حدود 0 LUFS)"""
+    print("🔊 تست بلندی موج سینوسی...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        full = os.path.join(temp_dir, "full.wav")
+        half = os.path.join(temp_dir, "half.wav")
+        create_sine(full, 1.0)
+        create_sine(half, 0.5, sample_rate=44100)
+
+        assert abs(analyze_file(full)['loudness']) < 0.1
+        result = analyze_file(half)
+        assert abs(result['loudness'] + 6.02) < 0.1
+        assert abs(result['gain'] + 11.98) < 0.1
+        assert abs(result['peak'] - 0.5) < 0.001
+
+
+def test_write_replaygain():
+    """تست نوشتن تگ‌های ReplayGain ترک و آلبوم"""
+    print("📝 تست نوشتن تگ‌های ReplayGain...")
+
+    editor = AudioEditor()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = [os.path.join(temp_dir, f"{index}.wav") for index in range(2)]
+        create_sine(paths[0], 1.0, seconds=3)
+        create_sine(paths[1], 0.5, seconds=3)
+
+        assert editor.write_replaygain(paths, max_workers=2)
+        tags = editor.load_file(paths[1]).tags
+        assert str(tags['TXXX:REPLAYGAIN_TRACK_GAIN']) == '-11.98 dB'
+        assert str(tags['TXXX:REPLAYGAIN_ALBUM_PEAK']).startswith('0.99')
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_k_weighting_coefficients, test_sine_loudness, test_write_replaygain]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+تست بودجه حافظه و استخراج کاور مستقیم از فایل
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from mutagen.id3 import ID3, APIC
+from audio_editor import AudioEditor
+from benchmark_audio_editor import build_cover, build_fixture
+from memory_budget import MemoryBudget, MemoryBudgetExceeded
+from tag_layout import locate_cover, tag_size
+
+
+def test_cover_located_in_file():
+    """تست یافتن بازه تصویر کاور در ID3، FLAC و MP4 و کپی مستقیم آن"""
+    print("🖼️ تست موقعیت کاور در فایل...")
+    editor = AudioEditor()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cover_path = build_cover(temp_dir, 300)
+        with open(cover_path, 'rb') as f:
+            cover = f.read()
+        output_path = os.path.join(temp_dir, 'cover.jpg')
+
+        for fmt in ('mp3-cbr', 'flac', 'm4a'):
+            path = build_fixture(temp_dir, fmt, '64k')
+            assert locate_cover(path) is None, fmt
+            bare = tag_size(path)
+            assert editor.add_cover_art(path, cover_path), fmt
+
+            offset, length = locate_cover(path)
+            assert length == len(cover), fmt
+            assert tag_size(path) >= bare + len(cover), fmt
+            assert editor.extract_cover_art(path, output_path), fmt
+            with open(output_path, 'rb') as f:
+                assert f.read() == cover, fmt
+            assert editor.get_cover_data(path) == cover, fmt
+            os.remove(path)
+
+        # UTF-16 description in an ID3v2.3 tag
+        path = build_fixture(temp_dir, 'mp3-cbr', '64k')
+        tags = ID3(path)
+        tags.add(APIC(encoding=1, mime='image/jpeg', type=3, desc='کاور', data=cover))
+        tags.save(v2_version=3)
+        assert editor.get_cover_data(path) == cover
+
+
+def test_budget_reservations():
+    """تست انتظار برای آزاد شدن بودجه و رد payload بزرگ‌تر از کل بودجه"""
+    print("🧠 تست رزرو بودجه حافظه...")
+    budget = MemoryBudget(limit=100, timeout=2.0)
+    order = []
+
+    def second():
+        with budget.reserve(60):
+            order.append('second')
+
+    with budget.reserve(60):
+        worker = threading.Thread(target=second)
+        worker.start()
+        time.sleep(0.1)
+        # The second reservation does not fit next to the first one
+        assert budget.in_use == 60 and order == []
+        order.append('first')
+    worker.join()
+    assert order == ['first', 'second']
+    assert budget.in_use == 0 and budget.peak == 60 and budget.waits == 1
+
+    try:
+        with budget.reserve(101):
+            pass
+        assert False, "payload larger than the budget was accepted"
+    except MemoryBudgetExceeded:
+        pass
+
+    # Operations on a file whose tags exceed the budget fail cleanly instead of loading them
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = build_fixture(temp_dir, 'flac', '64k')
+        editor = AudioEditor(MemoryBudget(limit=16))
+        assert editor.get_metadata(path) == {}
+        assert not editor.update_metadata(path, {'title': 'x'})
+        assert editor.memory_budget.in_use == 0
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_cover_located_in_file, test_budget_reservations]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+تست کلاینت سرویس پیشنهاد متادیتا با یک سرور محلی
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from aiohttp import web
+from benchmark_audio_editor import build_fixture
+from load_test import FakeClient, FakeEvent, FakeMedia, load_test_config
+from metadata_lookup import MetadataLookup
+from music_bot import MusicBot
+
+
+async def start_server(calls, delay: float = 0.1):
+    """راه‌اندازی سرور محلی جایگزین سرویس متادیتا"""
+    async def search(request):
+        calls.append(dict(request.query))
+        # Slow enough for concurrent queries to overlap
+        await asyncio.sleep(delay)
+        return web.json_response({'results': [
+            {'artist': request.query['artist'], 'title': request.query['title'].title(),
+             'album': 'Album', 'year': 2001, 'unknown': 'x'}
+        ]})
+
+    async def by_fingerprint(request):
+        body = await request.json()
+        calls.append({'hashes': len(body['hashes'])})
+        return web.json_response({'results': [{'title': 'From Fingerprint'}]})
+
+    app = web.Application()
+    app.router.add_get('/search', search)
+    app.router.add_post('/fingerprint', by_fingerprint)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def test_search_coalesce_and_cache():
+    """تست ادغام درخواست‌های همزمان و کش دیسکی"""
+    print("🌐 تست جستجو، ادغام و کش...")
+
+    async def scenario(cache_dir):
+        calls = []
+        runner, url = await start_server(calls)
+        try:
+            lookup = MetadataLookup(url, cache_dir)
+            results = await asyncio.gather(*[lookup.search('Artist', 'song') for _ in range(5)])
+            assert all(result == results[0] for result in results)
+            assert results[0] == [{'title': 'Song', 'artist': 'Artist', 'album': 'Album', 'year': '2001'}]
+            assert len(calls) == 1
+
+            hashes = np.arange(100, dtype=np.int64)
+            assert (await lookup.search_fingerprint(hashes))[0]['title'] == 'From Fingerprint'
+            await lookup.close()
+
+            # A new client is served from the disk cache
+            lookup = MetadataLookup(url, cache_dir)
+            assert await lookup.search('Artist', 'song') == results[0]
+            assert lookup.requests == 0 and len(calls) == 2
+
+            # Expired entries are fetched again
+            expired = MetadataLookup(url, cache_dir, ttl=-1)
+            await expired.search('Artist', 'song')
+            assert len(calls) == 3
+            await lookup.close()
+            await expired.close()
+        finally:
+            await runner.cleanup()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        asyncio.run(scenario(os.path.join(temp_dir, "metadata")))
+
+
+def test_unavailable_service():
+    """تست رفتار در صورت در دسترس نبودن سرویس"""
+    print("🔌 تست سرویس غیرفعال یا خاموش...")
+
+    async def scenario(cache_dir):
+        assert await MetadataLookup('', cache_dir).search('Artist', 'Song') == []
+        lookup = MetadataLookup('http://127.0.0.1:9', cache_dir, timeout=2)
+        assert await lookup.search('Artist', 'Song') == []
+        await lookup.close()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        asyncio.run(scenario(temp_dir))
+
+
+def test_menu_does_not_wait():
+    """تست نمایش فوری منوی متادیتا، افزودن پیشنهادها پس از پاسخ و استفاده دوباره از آن‌ها"""
+    print("💡 تست پیشنهادها در منوی متادیتا...")
+
+    async def scenario(workspace):
+        calls = []
+        runner, url = await start_server(calls, delay=0.5)
+        client = FakeClient(latency=0.0, download_bandwidth=0, upload_bandwidth=0)
+        bot = MusicBot(client=client, config=load_test_config(workspace))
+        bot.metadata_lookup = MetadataLookup(url, os.path.join(workspace, 'metadata'))
+
+        async def tap(data):
+            await client.dispatch('callback', FakeEvent(client, 1, data=data, message_id=client.menus[1]))
+            return client.messages[(1, client.menus[1])]
+
+        try:
+            document = FakeMedia(1, build_fixture(workspace, 'mp3-cbr', '64k'), 'one.mp3')
+            await client.dispatch('message', FakeEvent(client, 1, document=document, message_id=1))
+            session = bot.user_sessions[1]
+            session['metadata'].update(artist='Artist', title='song')
+
+            started = time.perf_counter()
+            menu = await tap(b'edit_metadata')
+            assert time.perf_counter() - started < 0.25
+            assert '✏️' in menu.text and '💡' not in menu.text
+            await session['suggest_task']
+            assert '💡' in menu.text and menu.buttons[0][0].text.startswith('💡 Artist')
+
+            # Shown again without asking the service
+            await tap(b'back_main')
+            menu = await tap(b'edit_metadata')
+            assert '💡' in menu.text and 'suggest_task' not in session
+            assert len(calls) == 1
+
+            # A new title needs a new lookup; leaving the menu abandons it
+            session['metadata']['title'] = 'other'
+            await tap(b'back_main')
+            menu = await tap(b'edit_metadata')
+            task = session['suggest_task']
+            assert '💡' not in menu.text
+            await tap(b'back_main')
+            await asyncio.sleep(0)
+            assert task.cancelled()
+        finally:
+            await bot.metadata_lookup.close()
+            await runner.cleanup()
+            bot.render_pool.shutdown(wait=True)
+            bot.jobs.close()
+
+    with tempfile.TemporaryDirectory() as workspace:
+        asyncio.run(scenario(workspace))
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_search_coalesce_and_cache, test_unavailable_service, test_menu_does_not_wait]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
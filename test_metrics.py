@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+تست متریک‌ها و endpoint با قالب Prometheus
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from metrics import Metrics, directory_usage
+
+
+def test_stage_histogram():
+    """تست زمان‌سنجی مراحل و خروجی هیستوگرام"""
+    print("⏱️ تست هیستوگرام مراحل...")
+    metrics = Metrics()
+
+    with metrics.stage('save', 'tag_write'):
+        time.sleep(0.02)
+    try:
+        with metrics.stage('save', 'upload'):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    metrics.transfer('upload', 4 * 1024 * 1024, 2.0)
+    metrics.gauge('musicbot_active_sessions', 'Open editing sessions', lambda: 3)
+
+    text = metrics.render()
+    assert '# TYPE musicbot_stage_seconds histogram' in text
+    assert 'musicbot_stage_seconds_bucket{handler="save",stage="tag_write",le="0.01"} 0' in text
+    assert 'musicbot_stage_seconds_bucket{handler="save",stage="tag_write",le="0.025"} 1' in text
+    assert 'musicbot_stage_seconds_bucket{handler="save",stage="tag_write",le="+Inf"} 1' in text
+    assert 'musicbot_stage_seconds_count{handler="save",stage="upload"} 1' in text
+    assert 'musicbot_stage_errors_total{handler="save",stage="upload"} 1' in text
+    assert 'musicbot_transfer_bytes_total{direction="upload"} 4194304' in text
+    assert 'musicbot_transfer_bytes_per_second_bucket{direction="upload",le="4194304"} 1' in text
+    assert 'musicbot_active_sessions 3' in text
+
+
+def test_endpoint_and_disk_usage():
+    """تست endpoint محلی و محاسبه حجم پوشه‌ها"""
+    print("🌐 تست endpoint متریک‌ها...")
+
+    async def fetch(port, path):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        response = await reader.read()
+        writer.close()
+        return response.decode()
+
+    async def scenario(temp_dir):
+        metrics = Metrics()
+        metrics.labelled_gauge('musicbot_disk_usage_bytes', 'Size of working directories',
+                               lambda: directory_usage([temp_dir]))
+        server = await metrics.serve('127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            response = await fetch(port, '/metrics')
+            assert response.startswith('HTTP/1.1 200 OK')
+            assert 'text/plain; version=0.0.4' in response
+            name = os.path.basename(temp_dir)
+            assert f'musicbot_disk_usage_bytes{{dir="{name}"}} 1500' in response
+            assert (await fetch(port, '/other')).startswith('HTTP/1.1 404')
+        finally:
+            await metrics.close()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.makedirs(os.path.join(temp_dir, 'split'))
+        with open(os.path.join(temp_dir, 'a.mp3'), 'wb') as f:
+            f.write(b'\0' * 1000)
+        with open(os.path.join(temp_dir, 'split', 'b.mp3'), 'wb') as f:
+            f.write(b'\0' * 500)
+        asyncio.run(scenario(temp_dir))
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_stage_histogram, test_endpoint_and_disk_usage]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+تست تغییر بلندی MP3 بدون کدگذاری مجدد
+"""
+
+import os
+import sys
+import tempfile
+from audio_editor import AudioEditor
+from memory_budget import MemoryBudget
+from mp3_frames import audio_start_offset, iter_frames
+from mp3_gain import crc16, format_undo, gain_bit_offsets, parse_undo
+
+
+def create_mp3(path, frames=200):
+    """ایجاد فایل MP3 ساختگی با فریم‌های 128kbps، یک در میان با CRC"""
+    with open(path, 'wb') as f:
+        for index in range(frames):
+            if index % 2:
+                checksum = crc16(b'\x90\x00' + b'\x00' * 32).to_bytes(2, 'big')
+                f.write(b'\xff\xfa\x90\x00' + checksum + b'\x00' * 411)
+            else:
+                f.write(b'\xff\xfb\x90\x00' + b'\x00' * 413)
+
+
+def read_gains(path):
+    """خواندن مقادیر global_gain همه گرانول‌ها"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    gains = []
+    for offset, header in iter_frames(path):
+        side_start = offset + 4 + (2 if header.protected else 0)
+        for bit in gain_bit_offsets(header):
+            position = side_start * 8 + bit
+            word = (data[position >> 3] << 8) | data[(position >> 3) + 1]
+            gains.append((word >> (8 - (position & 7))) & 0xFF)
+    return gains
+
+
+def test_undo_format():
+    """تست قالب تگ MP3GAIN_UNDO"""
+    print("🏷️ تست قالب تگ بازگردانی...")
+
+    assert format_undo(-2) == '-002,-002,N'
+    assert parse_undo(format_undo(5)) == 5
+    assert crc16(b'') == 0xFFFF
+
+
+def test_adjust_and_undo():
+    """تست اعمال بهره و بازگردانی آن"""
+    print("🎚️ تست اعمال و بازگردانی بهره...")
+
+    editor = AudioEditor()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "song.mp3")
+        create_mp3(path)
+        with open(path, 'rb') as f:
+            original = f.read()
+
+        assert editor.adjust_mp3_gain(path, 3.2) == 3.0
+        assert set(read_gains(path)) == {2}
+        assert str(editor.load_file(path).tags['TXXX:MP3GAIN_UNDO']) == '-002,-002,N'
+
+        # Protected frames carry a checksum over header and side info
+        for offset, header in iter_frames(path):
+            if header.protected:
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    frame = f.read(38)
+                assert crc16(frame[2:4] + frame[6:38]) == int.from_bytes(frame[4:6], 'big')
+                break
+
+        assert editor.undo_mp3_gain(path)
+        assert set(read_gains(path)) == {0}
+        assert 'TXXX:MP3GAIN_UNDO' not in editor.load_file(path).tags
+        with open(path, 'rb') as f:
+            data = f.read()
+        assert data[audio_start_offset(path):] == original
+
+
+def test_gain_limited_to_avoid_clipping():
+    """تست محدود شدن بهره به بازه 0..255 تا بازگردانی دقیق بماند"""
+    print("📏 تست جلوگیری از کلیپ...")
+
+    editor = AudioEditor(MemoryBudget())
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "song.mp3")
+        create_mp3(path)
+        with open(path, 'rb') as f:
+            original = f.read()
+
+        # Every granule is already at 0: nothing can be taken away
+        assert editor.adjust_mp3_gain(path, -3.0) == 0.0
+        with open(path, 'rb') as f:
+            assert f.read() == original
+
+        # Asking for more than fits applies only what fits, and records exactly that
+        assert editor.adjust_mp3_gain(path, 400.0) == 255 * 1.5
+        assert set(read_gains(path)) == {255}
+        assert str(editor.load_file(path).tags['TXXX:MP3GAIN_UNDO']) == '-255,-255,N'
+        assert editor.adjust_mp3_gain(path, 3.0) == 0.0
+
+        assert editor.undo_mp3_gain(path)
+        assert set(read_gains(path)) == {0}
+        with open(path, 'rb') as f:
+            assert f.read()[audio_start_offset(path):] == original
+        # Tags were loaded under the memory budget
+        assert editor.memory_budget.peak > 0 and editor.memory_budget.in_use == 0
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_undo_format, test_adjust_and_undo, test_gain_limited_to_avoid_clipping]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
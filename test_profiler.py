@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+تست پروفایلر نمونه‌بردار و خروجی collapsed-stack
+"""
+
+import sys
+import threading
+from profiler import SamplingProfiler
+
+
+def crunch(stop):
+    total = 0
+    while not stop.is_set():
+        total += sum(range(1000))
+    return total
+
+
+def test_samples_busy_threads():
+    """تست نمونه‌برداری از رشته مشغول و رد کردن رشته‌های بیکار"""
+    print("🔬 تست نمونه‌برداری...")
+    stop = threading.Event()
+    busy = threading.Thread(target=crunch, args=(stop,), name='encoder-0')
+    idle = threading.Thread(target=stop.wait, name='idle-worker')
+    busy.start()
+    idle.start()
+    try:
+        profiler = SamplingProfiler(interval=0.005)
+        profiler.run(0.2)
+    finally:
+        stop.set()
+        busy.join()
+        idle.join()
+
+    assert profiler.samples >= 10
+    busy_stacks = [stack for stack in profiler.stacks if stack.startswith('encoder-0;')]
+    assert busy_stacks
+    assert all('crunch (test_profiler.py:' in stack for stack in busy_stacks)
+    assert not any(stack.startswith('idle-worker;') for stack in profiler.stacks)
+
+
+def test_collapsed_output():
+    """تست قالب خروجی flamegraph و توابع پرتکرار"""
+    print("🔥 تست خروجی collapsed-stack...")
+    profiler = SamplingProfiler()
+    profiler.stacks.update({
+        'MainThread;run (base_events.py:1);save (music_bot.py:10);copy2 (shutil.py:5)': 3,
+        'MainThread;run (base_events.py:1);save (music_bot.py:10)': 1,
+        'encoder-0;_worker (thread.py:1);trim (audio_editor.py:7)': 2,
+    })
+
+    lines = profiler.collapsed().splitlines()
+    assert len(lines) == 3
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0 and ';' in stack
+    assert profiler.top(2) == [('copy2 (shutil.py:5)', 3), ('trim (audio_editor.py:7)', 2)]
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_samples_busy_threads, test_collapsed_output]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
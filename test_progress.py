@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+تست گزارش پیشرفت دانلود/آپلود
+"""
+
+import asyncio
+import sys
+from telethon.errors import FloodWaitError
+from progress import ProgressReporter, format_eta, format_size
+
+
+class FakeMessage:
+    """پیام جایگزین که ویرایش‌ها را ثبت می‌کند"""
+
+    def __init__(self, flood_waits=0):
+        self.edits = []
+        self.flood_waits = flood_waits
+
+    async def edit(self, text):
+        if self.flood_waits:
+            self.flood_waits -= 1
+            raise FloodWaitError(request=None, capture=0)
+        self.edits.append(text)
+
+
+def test_coalesced_updates():
+    """تست ادغام callbackهای پشت سر هم در تعداد محدودی ویرایش"""
+    print("📶 تست ادغام و محدودسازی ویرایش‌ها...")
+
+    async def scenario():
+        message = FakeMessage()
+        reporter = ProgressReporter(message, "⏳ دانلود", min_interval=0.05)
+        total = 10 * 1024 * 1024
+        # 200 callbacks over ~0.2 s
+        for step in range(1, 201):
+            reporter.update(step * total // 200, total)
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.15)
+        calls = await reporter.finish()
+
+        assert 1 <= len(message.edits) <= 8
+        assert calls == len(message.edits)
+        assert '100%' in message.edits[-1]
+        assert '10.0 MB / 10.0 MB' in message.edits[-1]
+
+    asyncio.run(scenario())
+
+
+def test_flood_wait_backoff():
+    """تست عقب‌نشینی پس از FloodWaitError"""
+    print("🌊 تست FloodWait...")
+
+    async def scenario():
+        message = FakeMessage(flood_waits=2)
+        reporter = ProgressReporter(message, "⏳ آپلود", min_interval=0.01, max_interval=0.5)
+        reporter.update(50, 100)
+        await asyncio.sleep(0.3)
+        await reporter.finish()
+
+        assert reporter.flood_waits == 2
+        assert reporter.api_calls == 3
+        assert reporter.interval >= 0.02
+        assert message.edits and '50%' in message.edits[-1]
+
+    asyncio.run(scenario())
+
+
+def test_formatting():
+    """تست نمایش حجم و زمان باقی‌مانده"""
+    print("🔤 تست قالب‌بندی...")
+    assert format_size(512) == "512 B"
+    assert format_size(1536) == "1.5 KB"
+    assert format_size(3 * 1024 ** 3) == "3.00 GB"
+    assert format_eta(75) == "1:15"
+    assert format_eta(3725) == "1:02:05"
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_coalesced_updates, test_flood_wait_backoff, test_formatting]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
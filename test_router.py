@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+تست مسیریابی callbackها و ماشین وضعیت جلسه
+"""
+
+import asyncio
+import sys
+from router import Router
+from session_state import (
+    SessionState, InvalidTransition, MAIN_MENU, EDITING_FIELD, WAITING_COVER, SAVING
+)
+
+
+class FakeEvent:
+    """پیام جایگزین با فیلدهای مورد نیاز مسیریاب"""
+
+    def __init__(self, text='', document=None, photo=None):
+        self.text = text
+        self.document = document
+        self.photo = photo
+
+
+def test_callback_routing():
+    """تست مسیریابی دقیق، پیشوندی و ناشناخته"""
+    print("🧭 تست مسیریابی callback...")
+    calls = []
+
+    async def exact(event):
+        calls.append(('exact', event))
+
+    async def prefixed(event, data):
+        calls.append(('prefix', data))
+
+    router = Router()
+    router.callback('edit_metadata', exact)
+    router.callback_prefix('edit_', prefixed)
+
+    async def scenario():
+        assert await router.dispatch_callback('e1', 'edit_metadata')
+        assert await router.dispatch_callback('e2', 'edit_title')
+        assert not await router.dispatch_callback('e3', 'unknown')
+        assert not await router.dispatch_callback('e4', 'editx')
+
+    asyncio.run(scenario())
+    assert calls == [('exact', 'e1'), ('prefix', 'edit_title')]
+
+    try:
+        router.callback_prefix('edit', prefixed)
+        assert False, "prefix without underscore accepted"
+    except ValueError:
+        pass
+
+
+def test_message_routing():
+    """تست مسیریابی دستورها و انواع پیام"""
+    print("📨 تست مسیریابی پیام...")
+
+    async def start(event):
+        pass
+
+    async def text(event):
+        pass
+
+    async def document(event):
+        pass
+
+    router = Router()
+    router.command('/start', start)
+    router.message('text', text)
+    router.message('document', document)
+
+    assert router.resolve_message(FakeEvent('/start')) is start
+    assert router.resolve_message(FakeEvent('/START@MusicBot now')) is start
+    assert router.resolve_message(FakeEvent('/unknown')) is None
+    assert router.resolve_message(FakeEvent('hello')) is text
+    # A caption does not turn a file into a text message
+    assert router.resolve_message(FakeEvent('caption', document=object())) is document
+    assert router.resolve_message(FakeEvent('', photo=object())) is None
+
+
+def test_state_machine():
+    """تست انتقال‌های مجاز و غیرمجاز"""
+    print("🔀 تست ماشین وضعیت...")
+    state = SessionState()
+    state.to(MAIN_MENU)
+    state.to(EDITING_FIELD, 'title')
+    assert state.accepts('text') and not state.accepts('photo')
+    assert state.field == 'title'
+
+    state.to(WAITING_COVER)
+    assert state.accepts('photo') and state.field is None
+
+    state.to(SAVING)
+    assert not state.accepts('text')
+    for target in (SAVING, EDITING_FIELD, WAITING_COVER):
+        try:
+            state.to(target)
+            assert False, f"saving -> {target} accepted"
+        except InvalidTransition:
+            pass
+    assert state.name == SAVING
+    state.to(MAIN_MENU)
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_callback_routing, test_message_routing, test_state_machine]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+تست قفل جلسه‌ها و حذف لمس‌های تکراری
+"""
+
+import asyncio
+import sys
+import tempfile
+from benchmark_audio_editor import build_fixture
+from fake_clock import FakeClock
+from load_test import FakeClient, FakeEvent, FakeMedia, load_test_config
+from music_bot import MusicBot
+from session_guard import DuplicateFilter, SessionLocks
+
+
+def test_session_locks():
+    """تست اجرای پشت سر هم handlerهای یک کاربر و موازی کاربران مختلف"""
+    print("🔒 تست قفل جلسه...")
+    locks = SessionLocks()
+    events = []
+
+    async def handler(user, name):
+        async with locks.hold(user):
+            events.append(('start', name))
+            await asyncio.sleep(0.01)
+            events.append(('end', name))
+
+    async def scenario():
+        await asyncio.gather(handler(1, 'save'), handler(1, 'photo'), handler(2, 'other'))
+
+    asyncio.run(scenario())
+    # User 1's handlers never overlap; user 2 is not held up behind them
+    first = events.index(('end', 'save'))
+    assert events.index(('start', 'photo')) > first
+    assert events.index(('start', 'other')) < first
+    assert len(locks) == 0
+
+
+def test_duplicate_clicks():
+    """تست حذف لمس‌های تکراری در حال اجرا و داخل پنجره زمانی"""
+    print("👆 تست لمس‌های تکراری...")
+    clock = FakeClock()
+    clicks = DuplicateFilter(window=2.0, clock=clock)
+    scope = (1, 100)
+
+    assert clicks.claim(scope, 'save_download')
+    # Double tap while the save is still running
+    assert not clicks.claim(scope, 'save_download')
+    clicks.release(scope, 'save_download')
+    clock.now += 1
+    assert not clicks.claim(scope, 'save_download')
+    assert clicks.dropped == {'save_download': 2}
+
+    # Another button in between makes the same payload a new request
+    assert clicks.claim(scope, 'back_main')
+    clicks.release(scope, 'back_main')
+    assert clicks.claim(scope, 'edit_metadata')
+    clicks.release(scope, 'edit_metadata')
+    assert clicks.claim(scope, 'back_main')
+    clicks.release(scope, 'back_main')
+
+    # Other users and later taps are unaffected
+    assert clicks.claim((2, 100), 'back_main')
+    clock.now += 3
+    assert clicks.claim(scope, 'back_main')
+    assert clicks.total_dropped == 2
+
+
+def test_failed_tap_can_be_retried():
+    """تست اجرای دوباره فوری لمسی که با خطا تمام شده است"""
+    print("🔁 تست تکرار لمس ناموفق...")
+    clock = FakeClock()
+    clicks = DuplicateFilter(window=2.0, clock=clock)
+    scope = (1, 100)
+
+    assert clicks.claim(scope, 'save_download')
+    clicks.release(scope, 'save_download', succeeded=False)
+    assert clicks.claim(scope, 'save_download')
+    clicks.release(scope, 'save_download')
+    assert not clicks.claim(scope, 'save_download')
+
+    async def scenario(workspace):
+        client = FakeClient(latency=0.0, download_bandwidth=0, upload_bandwidth=0)
+        bot = MusicBot(client=client, config=load_test_config(workspace))
+        try:
+            document = FakeMedia(1, build_fixture(workspace, 'mp3-cbr', '64k'), 'one.mp3')
+            await client.dispatch('message', FakeEvent(client, 1, document=document, message_id=1))
+            bot.discard_render(bot.user_sessions[1])
+            writes = []
+            bot.audio_editor.update_metadata = lambda *args: writes.append(args) and False
+
+            # The second tap follows the error reply at once, on the same menu message
+            for _ in range(2):
+                await client.dispatch('callback', FakeEvent(client, 1, data=b'save_download',
+                                                            message_id=client.menus[1]))
+            assert len(writes) == 2 and client.error_replies == 2
+            assert bot.duplicate_clicks.total_dropped == 0 and not bot.failed_taps
+        finally:
+            bot.render_pool.shutdown(wait=True)
+            bot.jobs.close()
+
+    with tempfile.TemporaryDirectory() as workspace:
+        asyncio.run(scenario(workspace))
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_session_locks, test_duplicate_clicks, test_failed_tap_can_be_retried]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
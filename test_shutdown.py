@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+تست خاموش کردن تدریجی: تمام شدن کارهای در جریان، رد فایل‌های جدید و ادامه جلسه‌های باز پس از راه‌اندازی مجدد
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from benchmark_audio_editor import build_fixture
+from job_queue import JobQueue
+from load_test import FakeClient, FakeEvent, FakeMedia, load_test_config
+from music_bot import MusicBot
+from session_state import MAIN_MENU
+
+
+async def save_then_shutdown(workspace: str, document_path: str, timeout: float, config=None):
+    """کاربر 1 ذخیره می‌کند و ربات وسط آپلود خاموش می‌شود؛ کاربر 2 فقط فایل باز کرده است"""
+    config = config or load_test_config(workspace)
+    client = FakeClient(latency=0.0, download_bandwidth=0, upload_bandwidth=64 * 1024, chunk_size=4096)
+    bot = MusicBot(client=client, config=config)
+
+    for user_id in (1, 2):
+        await client.dispatch('message', FakeEvent(
+            client, user_id, document=FakeMedia(user_id, document_path, f'{user_id}.mp3'), message_id=user_id))
+    bot.user_sessions[2]['metadata']['title'] = 'before restart'
+    save = asyncio.create_task(client.dispatch(
+        'callback', FakeEvent(client, 1, data=b'save_download', message_id=client.menus[1])))
+    await asyncio.sleep(0.3)
+    assert bot.inflight
+
+    shutdown = asyncio.create_task(bot.shutdown(timeout))
+    await asyncio.sleep(0)
+    # A file sent while draining is turned away without being downloaded
+    downloads = client.calls['download_media']
+    await client.dispatch('message', FakeEvent(
+        client, 3, document=FakeMedia(3, document_path, '3.mp3'), message_id=3))
+    assert client.calls['download_media'] == downloads
+    assert '🔄' in client.messages[max(client.messages)].text
+
+    await shutdown
+    await asyncio.gather(save, return_exceptions=True)
+    return client, bot
+
+
+async def restart(client: FakeClient, config):
+    """راه‌اندازی مجدد با همان گفتگوها و پیام‌های سمت تلگرام"""
+    restarted_client = FakeClient(latency=0.0, download_bandwidth=0, upload_bandwidth=0)
+    restarted_client.received = client.received
+    restarted_client.messages = client.messages
+    restarted_client._next_id = client._next_id
+    restarted = MusicBot(client=restarted_client, config=config)
+    try:
+        await restarted.resume_jobs()
+        return restarted_client, restarted
+    finally:
+        restarted.render_pool.shutdown(wait=True)
+        restarted.jobs.close()
+
+
+def temp_files(bot: MusicBot):
+    return {os.path.abspath(os.path.join(bot.config.TEMP_DIR, name)) for name in os.listdir(bot.config.TEMP_DIR)}
+
+
+def test_drain_finishes_upload():
+    """تست تمام شدن آپلود در جریان قبل از خاموش شدن و پاک شدن فایل‌های موقت"""
+    print("🛑 تست خاموش کردن تدریجی...")
+    with tempfile.TemporaryDirectory() as workspace:
+        document_path = build_fixture(workspace, 'mp3-cbr', '64k')
+        client, bot = asyncio.run(save_then_shutdown(workspace, document_path, timeout=30))
+
+        assert client.files_sent == 1
+        assert not client.connected
+        assert bot.draining and not bot.inflight
+        assert bot.user_sessions == {}
+        assert os.listdir(bot.config.OUTPUT_DIR) == []
+
+        # Only user 2's open session is left, with its file
+        jobs = JobQueue(bot.config.JOB_DB)
+        pending = jobs.claim_pending()
+        assert [(job['kind'], job['user_id']) for job in pending] == [('session', 2)]
+        assert temp_files(bot) == jobs.files() == {os.path.abspath(pending[0]['data']['temp_file'])}
+        jobs.close()
+
+
+def test_deadline_keeps_jobs():
+    """تست لغو کار طولانی پس از مهلت با نگه داشتن کار و فایل‌هایش برای ادامه"""
+    print("⏱️ تست مهلت خاموش شدن...")
+    with tempfile.TemporaryDirectory() as workspace:
+        document_path = build_fixture(workspace, 'mp3-cbr', '64k')
+        metrics_path = os.path.join(workspace, 'metrics', 'musicbot.prom')
+        config = load_test_config(workspace)
+        config.METRICS_TEXTFILE = metrics_path
+        client, bot = asyncio.run(save_then_shutdown(workspace, document_path, timeout=0.1, config=config))
+
+        assert client.files_sent == 0
+        assert not client.connected
+        # User 1's save and user 2's open session wait for the restart with their files
+        jobs = JobQueue(bot.config.JOB_DB)
+        pending = jobs.claim_pending()
+        assert [(job['kind'], job['user_id']) for job in pending] == [('save', 1), ('session', 2)]
+        save, session = (job['data'] for job in pending)
+        assert jobs.files() == {os.path.abspath(path) for path in
+                                (save['temp_file'], save['output_path'], session['temp_file'])}
+        jobs.close()
+        assert temp_files(bot) == {os.path.abspath(save['temp_file']), os.path.abspath(session['temp_file'])}
+
+        with open(metrics_path, encoding='utf-8') as f:
+            assert 'musicbot_draining 1' in f.read()
+        assert os.listdir(os.path.dirname(metrics_path)) == ['musicbot.prom']
+
+
+def test_restart_restores_session():
+    """تست ادامه جلسه باز پس از راه‌اندازی مجدد و دست نخوردن فایل‌هایی که ربات نساخته است"""
+    print("♻️ تست بازگشت جلسه پس از راه‌اندازی مجدد...")
+    with tempfile.TemporaryDirectory() as workspace:
+        document_path = build_fixture(workspace, 'mp3-cbr', '64k')
+        config = load_test_config(workspace)
+        foreign = [os.path.join(config.TEMP_DIR, 'notes.txt'), os.path.join(config.OUTPUT_DIR, 'test_output.mp3')]
+        for path in foreign:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write('not the bot\'s')
+        client, bot = asyncio.run(save_then_shutdown(workspace, document_path, timeout=30, config=config))
+        assert all(os.path.exists(path) for path in foreign)
+
+        client, restarted = asyncio.run(restart(client, config))
+        session = restarted.user_sessions[2]
+        assert session['state'].name == MAIN_MENU and os.path.exists(session['temp_file'])
+        assert session['metadata']['title'] == 'before restart'
+        # The menu from before the restart is edited in place
+        menu = client.messages[(2, session['menu_message_id'])]
+        assert menu.buttons and '♻️' in menu.text and 'before restart' in menu.text
+        assert client.calls['send_message'] == 0 and client.error_replies == 0
+        assert 1 not in restarted.user_sessions
+
+        jobs = JobQueue(config.JOB_DB)
+        assert len(jobs) == 0
+        jobs.close()
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_drain_finishes_upload, test_deadline_keeps_jobs, test_restart_restores_session]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
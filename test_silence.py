@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+تست تشخیص و حذف سکوت
+"""
+
+import os
+import sys
+import tempfile
+import wave
+import numpy as np
+from audio_editor import AudioEditor
+from silence import analyze_silence
+
+
+def create_wav(path, sample_rate=16000):
+    """ایجاد WAV با 2 ثانیه سکوت، 3 ثانیه صدا، نیم ثانیه سکوت، 3 ثانیه صدا و 3 ثانیه سکوت"""
+    tone = 0.3 * np.sin(2 * np.pi * 440 * np.arange(sample_rate * 3) / sample_rate)
+    signal = np.concatenate([
+        np.zeros(sample_rate * 2), tone, np.zeros(sample_rate // 2), tone, np.zeros(sample_rate * 3)
+    ])
+    with wave.open(path, 'w') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes((signal * 32767).astype('<i2').tobytes())
+
+
+def test_analyze_silence():
+    """تست یافتن بازه‌های سکوت"""
+    print("🔍 تست تشخیص سکوت...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "test.wav")
+        create_wav(path)
+
+        analysis = analyze_silence(path, min_duration=0.5)
+        assert abs(analysis['duration'] - 11.5) < 0.001
+        assert analysis['regions'] == [(0.0, 2.0), (5.0, 5.5), (8.5, 11.5)]
+        assert analysis['audible'] == (2.0, 8.5)
+        assert len(analyze_silence(path, min_duration=1.0)['regions']) == 2
+
+
+def test_trim_silence():
+    """تست حذف سکوت ابتدا و انتها با حفظ تگ‌ها"""
+    print("✂️ تست حذف سکوت...")
+
+    editor = AudioEditor()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "test.wav")
+        output = os.path.join(temp_dir, "trimmed.wav")
+        create_wav(path)
+        editor.update_metadata(path, {'title': 'Test', 'artist': 'Artist'})
+
+        head, tail = editor.trim_silence(path, output, padding=0.1)
+        assert abs(head - 1.9) < 0.001 and abs(tail - 2.9) < 0.001
+        metadata = editor.get_metadata(output)
+        assert metadata['title'] == 'Test'
+        assert abs(metadata['duration'] - 6.7) < 0.01
+
+        # Nothing left to trim the second time
+        assert editor.trim_silence(output) == (0.0, 0.0)
+
+
+def test_trim_silence_batch():
+    """تست حذف سکوت گروهی"""
+    print("📦 تست حذف سکوت گروهی...")
+
+    editor = AudioEditor()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = [os.path.join(temp_dir, f"{index}.wav") for index in range(3)]
+        for path in paths:
+            create_wav(path)
+        output_dir = os.path.join(temp_dir, "out")
+        os.makedirs(output_dir)
+
+        results = editor.trim_silence_batch(paths, output_dir, max_workers=2)
+        assert all(result and result[0] > 1.8 for result in results.values())
+        assert sorted(os.listdir(output_dir)) == ['0.wav', '1.wav', '2.wav']
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_analyze_silence, test_trim_silence, test_trim_silence_batch]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
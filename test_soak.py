@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+تست soak: جلسه‌های رها شده منقضی می‌شوند و حافظه باقی‌مانده ثابت می‌ماند
+"""
+
+import asyncio
+import logging
+import sys
+import tempfile
+from soak_test import abandon_sessions, soak
+from load_test import synthesize
+
+
+def test_abandoned_sessions_expire():
+    """تست بسته شدن جلسه‌های رها شده و حذف فایل‌هایشان"""
+    print("⌛ تست انقضای جلسه‌های رها شده...")
+    updates = abandon_sessions(synthesize(40, seed=2), 0.5, seed=2)
+    assert len({update['user'] for update in updates}) == 40
+    assert sum(update['kind'] == 'document' for update in updates) == 40
+
+    with tempfile.TemporaryDirectory() as workspace:
+        report = asyncio.run(soak(2, 40, workspace, abandon=0.5, warmup=1, seed=2))
+
+    for row in report['rounds']:
+        assert row['exceptions'] == {} and row['error_replies'] == 0
+        # Users who stayed through the cover flow got their cover and their menu back
+        assert row['failed_steps'] == {} and row['covers_applied'] > 0
+        assert row['open_sessions'] == row['expired'] == 20
+        assert row['sessions_left'] == row['temp_files_left'] == row['output_files_left'] == 0
+
+
+def test_retained_memory_flat():
+    """تست ثابت ماندن حافظه باقی‌مانده پس از چرخاندن صدها جلسه"""
+    print("📈 تست ثابت ماندن حافظه...")
+    # Test runners keep captured log records in memory; they are not the bot's
+    logging.disable(logging.CRITICAL)
+    try:
+        with tempfile.TemporaryDirectory() as workspace:
+            report = asyncio.run(soak(5, 150, workspace, warmup=2))
+    finally:
+        logging.disable(logging.NOTSET)
+
+    assert report['sessions'] == 750
+    assert all(row['failed_steps'] == {} for row in report['rounds'])
+    assert report['growth'] <= report['allowed_growth'], \
+        '\n'.join(str(stat) for stat in report['top_growth'][:5])
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_abandoned_sessions_expire, test_retained_memory_flat]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+تست آماده‌سازی خروجی در پس‌زمینه: debounce، لغو با ویرایش جدید و رد خروجی کهنه
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from benchmark_audio_editor import build_fixture
+from load_test import FakeClient, FakeEvent, FakeMedia, load_test_config
+from music_bot import MusicBot
+
+DEBOUNCE = 0.05
+
+
+async def open_session(workspace: str, **settings):
+    """ربات با debounce کوتاه و یک جلسه باز برای کاربر 1"""
+    config = load_test_config(workspace)
+    config.RENDER_DEBOUNCE = DEBOUNCE
+    for name, value in settings.items():
+        setattr(config, name, value)
+    client = FakeClient(latency=0.0, download_bandwidth=0, upload_bandwidth=0)
+    bot = MusicBot(client=client, config=config)
+    document = FakeMedia(1, build_fixture(workspace, 'mp3-cbr', '64k'), 'one.mp3')
+    await client.dispatch('message', FakeEvent(client, 1, document=document, message_id=1))
+    session = bot.user_sessions[1]
+    bot.discard_render(session)
+    return client, bot, session
+
+
+def close(bot: MusicBot):
+    for session in bot.user_sessions.values():
+        bot.discard_render(session)
+    bot.render_pool.shutdown(wait=True)
+    bot.jobs.close()
+
+
+def renders(bot: MusicBot):
+    return [name for name in os.listdir(bot.config.OUTPUT_DIR) if name.startswith('.render_')]
+
+
+def test_debounce_and_size_limit():
+    """تست یک بار آماده‌سازی برای چند ویرایش پشت سر هم و صرف‌نظر از فایل‌های بزرگ"""
+    print("⏳ تست debounce آماده‌سازی...")
+
+    async def scenario(workspace: str):
+        client, bot, session = await open_session(workspace)
+        try:
+            for title in ('a', 'b', 'c'):
+                session['metadata']['title'] = title
+                bot.schedule_render(1)
+                await asyncio.sleep(DEBOUNCE / 5)
+            await session['render_task']
+            assert client.calls['upload_file'] == 1
+            assert len(renders(bot)) == 1
+            rendered = await bot.take_render(session, bot._output_filename(session))
+            assert rendered and rendered['path'].endswith('.mp3')
+            assert bot.audio_editor.get_metadata(rendered['path'])['title'] == 'c'
+            bot._remove_file(rendered['path'])
+        finally:
+            close(bot)
+
+        # Files above RENDER_MAX_SIZE are left for the save
+        client, bot, session = await open_session(workspace, RENDER_MAX_SIZE=1024)
+        try:
+            bot.schedule_render(1)
+            assert 'render_task' not in session
+            await asyncio.sleep(DEBOUNCE * 2)
+            assert client.calls['upload_file'] == 0
+        finally:
+            close(bot)
+
+    with tempfile.TemporaryDirectory() as workspace:
+        asyncio.run(scenario(workspace))
+
+
+def test_new_edit_cancels_render():
+    """تست لغو آماده‌سازی در جریان با ویرایش جدید و حذف فایل نیمه‌کاره آن"""
+    print("✋ تست لغو آماده‌سازی...")
+
+    async def scenario(workspace: str):
+        client, bot, session = await open_session(workspace)
+        write = bot.audio_editor.update_metadata
+
+        def slow_write(*args):
+            time.sleep(0.2)
+            return write(*args)
+
+        bot.audio_editor.update_metadata = slow_write
+        try:
+            bot.schedule_render(1)
+            first = session['render_task']
+            await asyncio.sleep(DEBOUNCE + 0.05)
+            assert session['render_started']
+
+            session['metadata']['title'] = 'new'
+            bot.schedule_render(1)
+            await asyncio.sleep(0)
+            assert first.cancelled()
+            await session['render_task']
+            # The cancelled copy is removed once its thread finishes
+            await asyncio.sleep(0.3)
+            assert client.calls['upload_file'] == 1
+            assert len(renders(bot)) == 1
+            rendered = await bot.take_render(session, bot._output_filename(session))
+            assert rendered and bot.audio_editor.get_metadata(rendered['path'])['title'] == 'new'
+        finally:
+            close(bot)
+
+    with tempfile.TemporaryDirectory() as workspace:
+        asyncio.run(scenario(workspace))
+
+
+def test_stale_render_rejected():
+    """تست رد خروجی آماده وقتی تگ‌ها یا خود فایل پس از آماده‌سازی تغییر کرده‌اند"""
+    print("🗑️ تست رد خروجی کهنه...")
+
+    async def scenario(workspace: str):
+        client, bot, session = await open_session(workspace)
+        try:
+            for change in ('metadata', 'file'):
+                bot.schedule_render(1)
+                await session['render_task']
+                path = session['rendered']['path']
+                if change == 'metadata':
+                    session['metadata']['album'] = 'changed without a new render'
+                else:
+                    stat = os.stat(session['temp_file'])
+                    os.utime(session['temp_file'], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+                assert await bot.take_render(session, bot._output_filename(session)) is None
+                assert not os.path.exists(path)
+            assert renders(bot) == []
+        finally:
+            close(bot)
+
+    with tempfile.TemporaryDirectory() as workspace:
+        asyncio.run(scenario(workspace))
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_debounce_and_size_limit, test_new_edit_cancels_render, test_stale_render_rejected]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+تست آمار لحظه‌ای /stats
+"""
+
+import sys
+from metrics import Metrics
+from stats import LiveStats, RollingWindow
+
+
+def test_stage_percentiles():
+    """تست گروه‌بندی مراحل و صدک‌های پنجره چرخشی"""
+    print("⏱️ تست صدک‌های مراحل...")
+    window = RollingWindow(size=100)
+    for value in range(1, 201):
+        window.add(value / 100)
+    # Only the last 100 values (1.01 .. 2.00) are kept
+    assert len(window) == 100
+    assert window.percentile(0.5) == 1.51
+    assert window.percentile(0.95) == 1.96
+
+    stats = LiveStats()
+    metrics = Metrics()
+    metrics.stage_listeners.append(stats.observe_stage)
+    with metrics.stage('document', 'download'):
+        pass
+    with metrics.stage('render', 'tag_write'):
+        pass
+    with metrics.stage('photo', 'cover_write'):
+        pass
+    with metrics.stage('document', 'parse'):
+        pass
+    assert len(stats.latencies['download']) == 1
+    assert len(stats.latencies['edit']) == 2
+    assert 'upload' not in stats.latencies
+
+
+def test_counters():
+    """تست کارهای در حال اجرا، نرخ کش و کاربران پرمصرف"""
+    print("📊 تست شمارنده‌ها...")
+    stats = LiveStats()
+
+    with stats.job('upload'):
+        with stats.job('upload'):
+            assert stats.running['upload'] == 2
+    assert stats.running['upload'] == 0
+
+    render = stats.cache('render')
+    for hit in (True, True, True, False):
+        render.record(hit)
+    assert render.ratio == 0.75
+    assert stats.cache('render') is render
+
+    for user_id, size in ((1, 500), (2, 2000), (3, 100), (1, 1000)):
+        stats.processed(user_id, size)
+    assert stats.top_users(2) == [(2, 2000), (1, 1500)]
+
+    stats.set_disk_usage({(('dir', 'temp'),): 4096})
+    assert stats.disk_bytes('temp') == 4096
+    assert stats.disk_bytes('output') == 0
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_stage_percentiles, test_counters]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
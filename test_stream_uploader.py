@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+تست آپلود جریانی: مسیر فایل کوچک، فایل بزرگ با تعداد بخش نامعلوم و توقف تولیدکننده هنگام خطا
+"""
+
+import asyncio
+import hashlib
+import sys
+from telethon.tl.functions.upload import SaveBigFilePartRequest, SaveFilePartRequest
+from telethon.tl.types import InputFile, InputFileBig
+from stream_uploader import BIG_FILE_THRESHOLD, PART_SIZE, StreamUploader
+
+
+class FakeUploadClient:
+    """کلاینتی که درخواست‌های آپلود بخش‌ها را ثبت می‌کند (و در صورت نیاز روی یک بخش خطا می‌دهد)"""
+
+    def __init__(self, fail_part: int = None):
+        self.fail_part = fail_part
+        self.requests = []
+
+    async def __call__(self, request):
+        await asyncio.sleep(0)
+        if request.file_part == self.fail_part:
+            raise ConnectionError(f"part {request.file_part} lost")
+        self.requests.append(request)
+        return True
+
+
+class ChunkStream:
+    """تولیدکننده قطعه‌ها که بسته شدن خود را ثبت می‌کند"""
+
+    def __init__(self, data: bytes, chunk_size: int = 64 * 1024):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.closed = False
+
+    async def generate(self):
+        try:
+            for start in range(0, len(self.data), self.chunk_size):
+                yield self.data[start:start + self.chunk_size]
+        finally:
+            self.closed = True
+
+
+def payload(size: int) -> bytes:
+    return (bytes(range(251)) * (size // 251 + 1))[:size]
+
+
+def test_small_and_big_uploads():
+    """تست آپلود فایل کوچک با حجم مشخص و فایل بزرگ با total برابر -1 تا بخش آخر"""
+    print("📤 تست آپلود کوچک و بزرگ...")
+
+    async def scenario():
+        small = payload(PART_SIZE * 2 + 100)
+        client = FakeUploadClient()
+        uploaded = await StreamUploader(client).upload(ChunkStream(small).generate(), 'small.mp3')
+        assert isinstance(uploaded, InputFile)
+        assert uploaded.parts == 3 and uploaded.md5_checksum == hashlib.md5(small).hexdigest()
+        assert all(isinstance(request, SaveFilePartRequest) for request in client.requests)
+        assert b''.join(request.bytes for request in client.requests) == small
+
+        big = payload(BIG_FILE_THRESHOLD + PART_SIZE + 300)
+        client = FakeUploadClient()
+        uploaded = await StreamUploader(client, parallel_parts=3).upload(ChunkStream(big).generate(), 'big.flac')
+        assert isinstance(uploaded, InputFileBig)
+        requests = sorted(client.requests, key=lambda request: request.file_part)
+        assert all(isinstance(request, SaveBigFilePartRequest) for request in requests)
+        assert [request.file_part for request in requests] == list(range(uploaded.parts))
+        assert all(request.file_total_parts == -1 for request in requests[:-1])
+        assert requests[-1].file_total_parts == uploaded.parts
+        assert all(len(request.bytes) == PART_SIZE for request in requests[:-1])
+        assert b''.join(request.bytes for request in requests) == big
+
+    asyncio.run(scenario())
+
+
+def test_failed_upload_closes_stream():
+    """تست بسته شدن جریان ورودی وقتی یکی از بخش‌ها آپلود نمی‌شود"""
+    print("🧯 تست خطای آپلود...")
+
+    async def scenario():
+        stream = ChunkStream(payload(BIG_FILE_THRESHOLD * 2))
+        client = FakeUploadClient(fail_part=3)
+        try:
+            await StreamUploader(client).upload(stream.generate(), 'broken.flac')
+            raise AssertionError("upload failure was not raised")
+        except ConnectionError:
+            pass
+        assert stream.closed
+
+    asyncio.run(scenario())
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_small_and_big_uploads, test_failed_upload_closes_stream]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+تست tracing درخواست‌ها و خروجی JSON lines
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import tracing
+
+
+def read_traces(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_nested_spans():
+    """تست spanهای تو در تو، اجرای موازی و بخش‌های آپلود"""
+    print("🧵 تست spanهای تو در تو...")
+
+    @tracing.traced('tag_write.id3')
+    def write_tags():
+        time.sleep(0.005)
+        return tracing.current_trace_id()
+
+    async def handler():
+        with tracing.trace('callback', user=42, payload='save_download') as root:
+            with tracing.span('download', bytes=1000):
+                await asyncio.sleep(0.01)
+            loop = asyncio.get_running_loop()
+            with ThreadPoolExecutor(1) as pool:
+                trace_id = await loop.run_in_executor(pool, tracing.bind(write_tags))
+            parts = tracing.PartTimer('upload.part')
+            for sent in (512, 1024, 1100):
+                parts(sent, 1100)
+            return root.trace.trace_id, trace_id
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'logs', 'traces.jsonl')
+        tracer = tracing.configure(path, sample_rate=1.0)
+        try:
+            root_id, thread_id = asyncio.run(handler())
+        finally:
+            tracer.close()
+
+        assert root_id == thread_id
+        traces = read_traces(path)
+        assert len(traces) == 1
+        spans = {span['name']: span for span in traces[0]['spans']}
+        assert traces[0]['trace_id'] == root_id
+        assert spans['callback']['attrs'] == {'user': 42, 'payload': 'save_download'}
+        assert spans['download']['parent'] == spans['callback']['id']
+        assert spans['download']['duration_ms'] >= 9
+        assert spans['tag_write.id3']['parent'] == spans['callback']['id']
+        parts = [span for span in traces[0]['spans'] if span['name'] == 'upload.part']
+        assert [part['attrs']['bytes'] for part in parts] == [512, 512, 76]
+
+
+def test_sampling():
+    """تست نمونه‌برداری: کند یا ناموفق همیشه، بقیه بر اساس نرخ"""
+    print("🎲 تست نمونه‌برداری...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'traces.jsonl')
+        tracer = tracing.configure(path, sample_rate=0.0, slow_seconds=0.02)
+        try:
+            with tracing.trace('fast'):
+                pass
+            with tracing.trace('slow'):
+                time.sleep(0.03)
+            try:
+                with tracing.trace('failed'):
+                    raise ValueError("bad tag")
+            except ValueError:
+                pass
+            # Outside a trace spans cost nothing and record nothing
+            with tracing.span('orphan') as orphan:
+                assert orphan is None
+        finally:
+            tracer.close()
+
+        traces = read_traces(path)
+        assert [trace['name'] for trace in traces] == ['slow', 'failed']
+        assert 'bad tag' in traces[1]['error']
+        assert tracer.exported == 2 and tracer.dropped == 1
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_nested_spans, test_sampling]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+تست تقسیم فایل‌های بلند با شیت CUE و لیست زمان‌بندی
+"""
+
+import os
+import sys
+import tempfile
+import wave
+from audio_editor import AudioEditor
+from cue_parser import parse_track_list
+from mp3_frames import FrameIndex
+
+# MPEG1 Layer III, 128 kbps, 44.1 kHz, stereo: 417 bytes per frame
+SILENT_FRAME = b'\xff\xfb\x90\x00' + b'\x00' * 413
+FRAME_SECONDS = 1152 / 44100
+
+CUE_SHEET = """PERFORMER "Test DJ"
+TITLE "Test Mix"
+REM DATE 2024
+FILE "mix.mp3" MP3
+  TRACK 01 AUDIO
+    TITLE "Intro"
+    INDEX 01 00:00:00
+  TRACK 02 AUDIO
+    TITLE "Middle"
+    PERFORMER "Guest"
+    INDEX 00 00:19:00
+    INDEX 01 00:20:00
+  TRACK 03 AUDIO
+    TITLE "Outro"
+    INDEX 01 00:45:00
+"""
+
+
+def create_mix(path, seconds=60):
+    """ایجاد فایل MP3 ساختگی با فریم‌های سکوت"""
+    with open(path, 'wb') as f:
+        f.write(SILENT_FRAME * int(seconds / FRAME_SECONDS))
+
+
+def test_parse_cue():
+    """تست تجزیه شیت CUE"""
+    print("🔍 تست تجزیه شیت CUE...")
+
+    tracks = parse_track_list(CUE_SHEET)
+    assert [track['title'] for track in tracks] == ['Intro', 'Middle', 'Outro']
+    assert tracks[1]['start'] == 20.0 and tracks[1]['artist'] == 'Guest'
+    assert tracks[0]['artist'] == 'Test DJ' and tracks[0]['album'] == 'Test Mix'
+    assert tracks[0]['end'] == 20.0 and tracks[2]['end'] is None
+
+
+def test_parse_timestamps():
+    """تست تجزیه لیست زمان‌بندی متنی"""
+    print("🔍 تست تجزیه لیست زمان‌بندی...")
+
+    tracks = parse_track_list("01. 00:00 Artist - First\n02. 3:15 Second\n[1:02:03] Third")
+    assert [track['start'] for track in tracks] == [0.0, 195.0, 3723.0]
+    assert tracks[0]['artist'] == 'Artist' and tracks[0]['title'] == 'First'
+    assert tracks[2]['track'] == '3'
+
+
+def test_split_mp3():
+    """تست تقسیم MP3 در مرز فریم‌ها"""
+    print("✂️ تست تقسیم MP3...")
+
+    editor = AudioEditor()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = os.path.join(temp_dir, "mix.mp3")
+        create_mix(source)
+        total_frames = len(FrameIndex(source))
+
+        paths = editor.split_tracks(source, parse_track_list(CUE_SHEET), temp_dir)
+        assert len(paths) == 3
+
+        frames = 0
+        for path, title in zip(paths, ['Intro', 'Middle', 'Outro']):
+            metadata = editor.get_metadata(path)
+            assert metadata['title'] == title
+            assert metadata['album'] == 'Test Mix'
+            frames += len(FrameIndex(path))
+
+        # Frames are neither lost nor duplicated across tracks
+        assert frames == total_frames
+        assert abs(editor.get_metadata(paths[1])['duration'] - 25.0) < 0.1
+
+
+def test_split_wav():
+    """تست تقسیم WAV در مرز نمونه‌ها"""
+    print("✂️ تست تقسیم WAV...")
+
+    editor = AudioEditor()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = os.path.join(temp_dir, "mix.wav")
+        with wave.open(source, 'w') as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(8000)
+            wav_file.writeframes(b'\x00\x00' * 8000 * 60)
+
+        paths = editor.split_tracks(source, parse_track_list(CUE_SHEET), temp_dir)
+        assert len(paths) == 3
+
+        with wave.open(paths[1]) as wav_file:
+            assert wav_file.getnframes() == 8000 * 25
+        assert editor.get_metadata(paths[2])['title'] == 'Outro'
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_parse_cue, test_parse_timestamps, test_split_mp3, test_split_wav]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+تست رسم شکل موج و طیف‌نگار
+"""
+
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import wave
+import numpy as np
+from PIL import Image
+from benchmark_audio_editor import build_fixture
+from load_test import FakeClient, FakeEvent, FakeMedia, load_test_config
+from music_bot import MusicBot
+from waveform import CLIP_COLOR, ThumbnailCache, payload_hash, render_spectrogram, waveform_peaks
+
+
+def create_wav(path, sample_rate=8000):
+    """ایجاد WAV مونو: یک ثانیه موج 1 کیلوهرتز، یک ثانیه سکوت، یک ثانیه کلیپ شده"""
+    t = np.arange(sample_rate) / sample_rate
+    tone = 0.5 * np.sin(2 * np.pi * 1000 * t)
+    clipped = np.clip(2 * np.sin(2 * np.pi * 1000 * t), -1, 1)
+    signal = np.concatenate([tone, np.zeros(sample_rate), clipped])
+    with wave.open(path, 'w') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes((signal * 32767).astype('<i2').tobytes())
+
+
+def test_waveform_peaks():
+    """تست کمینه و بیشینه هر ستون"""
+    print("📊 تست پیک‌های شکل موج...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "test.wav")
+        create_wav(path)
+
+        lows, highs = waveform_peaks(path, 30)
+        assert np.allclose(highs[:10], 0.5, atol=0.01)
+        assert np.allclose(lows[10:20], 0.0) and np.allclose(highs[10:20], 0.0)
+        assert np.all(highs[20:] > 0.99)
+
+
+def test_spectrogram():
+    """تست طیف‌نگار: بیشترین انرژی در ردیف 1 کیلوهرتز"""
+    print("🌈 تست طیف‌نگار...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "test.wav")
+        create_wav(path)
+
+        image = np.asarray(Image.open(io.BytesIO(render_spectrogram(path, width=30, height=100))))
+        assert image.shape == (100, 30, 3)
+        brightest = image[:, 5].sum(axis=1).argmax()
+        # 1 kHz of the 11025 Hz band, counted from the bottom row
+        assert abs((99 - brightest) - 9) <= 1
+
+
+def test_cache():
+    """تست کش تصاویر بر اساس هش محتوا"""
+    print("💾 تست کش تصاویر...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "test.wav")
+        copy = os.path.join(temp_dir, "copy.wav")
+        create_wav(path)
+        create_wav(copy)
+
+        cache = ThumbnailCache(os.path.join(temp_dir, "cache"))
+        data = cache.get(path, 'waveform')
+        assert len(os.listdir(cache.cache_dir)) == 1
+        # Same content under another name is served from the cache
+        assert cache.get(copy, 'waveform') == data
+        assert len(os.listdir(cache.cache_dir)) == 1
+
+        image = np.asarray(Image.open(io.BytesIO(data)))
+        assert tuple(image[image.shape[0] // 2, -1]) == CLIP_COLOR
+
+
+def test_cache_bounded():
+    """تست حذف تصاویری که کمتر از همه استفاده شده‌اند پس از رسیدن به سقف حجم"""
+    print("🧹 تست سقف حجم کش...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = []
+        for rate in (8000, 11025, 16000):
+            path = os.path.join(temp_dir, f"{rate}.wav")
+            create_wav(path, rate)
+            paths.append(path)
+
+        cache = ThumbnailCache(os.path.join(temp_dir, "cache"), max_bytes=1 << 20)
+        first, second = (cache.get(path, 'waveform') for path in paths[:2])
+        cache.max_bytes = len(first) + len(second)
+        # The first image was used last, so the second one goes
+        os.utime(cache.path_for(payload_hash(paths[1]), 'waveform'), (1000, 1000))
+        os.utime(cache.path_for(payload_hash(paths[0]), 'waveform'), (2000, 2000))
+        cache.get(paths[2], 'waveform')
+
+        assert cache.evictions == 1
+        assert not os.path.exists(cache.path_for(payload_hash(paths[1]), 'waveform'))
+        assert cache.get(paths[0], 'waveform') == first
+        assert cache.cache_stats.hits == 1
+
+        # A new instance measures what is already on disk
+        assert ThumbnailCache(cache.cache_dir, max_bytes=len(first)).evictions == 1
+        assert len(os.listdir(cache.cache_dir)) == 1
+
+
+async def change_gain(workspace: str):
+    client = FakeClient(latency=0.0, download_bandwidth=0, upload_bandwidth=0)
+    bot = MusicBot(client=client, config=load_test_config(workspace))
+    try:
+        document = FakeMedia(1, build_fixture(workspace, 'mp3-cbr', '64k'), 'one.mp3')
+        await client.dispatch('message', FakeEvent(client, 1, document=document, message_id=1))
+        session = bot.user_sessions[1]
+        session['metadata']['replaygain_track_gain'] = '+3.00 dB'
+        hashes = []
+        for data in (b'apply_gain', b'undo_gain'):
+            session['payload_hash'] = payload_hash(session['temp_file'])
+            await client.dispatch('callback', FakeEvent(client, 1, data=data, message_id=client.menus[1]))
+            hashes.append(session.get('payload_hash'))
+        return session, hashes
+    finally:
+        for session in bot.user_sessions.values():
+            bot.discard_render(session)
+        bot.render_pool.shutdown(wait=True)
+        bot.jobs.close()
+
+
+def test_gain_resets_cached_hash():
+    """تست اینکه تغییر بهره و بازگردانی آن هش کش شده فایل را کنار می‌گذارند"""
+    print("🎚️ تست کنار گذاشتن هش پس از تغییر بهره...")
+
+    with tempfile.TemporaryDirectory() as workspace:
+        session, hashes = asyncio.run(change_gain(workspace))
+        assert hashes == [None, None]
+        assert 'gain_applied' not in session
+
+
+def main():
+    """اجرای تمام تست‌ها"""
+    tests = [test_waveform_peaks, test_spectrogram, test_cache, test_cache_bounded, test_gain_resets_cached_hash]
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}: موفق")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: ناموفق {e}")
+
+    print(f"\nنتیجه کلی: {len(tests) - failed}/{len(tests)} تست موفق")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
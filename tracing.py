@@ -0,0 +1,219 @@
+import contextvars
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager, nullcontext
+from functools import partial, wraps
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Keep every trace slower than this, and a random sample of the rest
+SLOW_SECONDS = 10.0
+SAMPLE_RATE = 0.01
+
+MAX_FILE_BYTES = 10 * 1024 * 1024
+BACKUP_FILES = 5
+
+_current: contextvars.ContextVar = contextvars.ContextVar('trace_span', default=None)
+
+
+class Trace:
+    """یک درخواست (به‌روزرسانی) و spanهای آن"""
+
+    __slots__ = ('trace_id', 'wall_start', 'origin', 'spans', 'next_id', 'finished')
+
+    def __init__(self):
+        self.trace_id = os.urandom(8).hex()
+        self.wall_start = time.time()
+        self.origin = time.perf_counter()
+        self.spans: List['Span'] = []
+        self.next_id = 0
+        self.finished = False
+
+
+class Span:
+    """یک مرحله زمان‌دار داخل trace"""
+
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'start', 'end', 'attrs', 'error')
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[int], attrs: Dict[str, Any],
+                 start: float = None):
+        self.trace = trace
+        self.span_id = trace.next_id
+        trace.next_id += 1
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+        self.attrs = attrs
+        self.error = None
+        trace.spans.append(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        origin = self.trace.origin
+        return {
+            'id': self.span_id,
+            'parent': self.parent_id,
+            'name': self.name,
+            'start_ms': round((self.start - origin) * 1000, 3),
+            'duration_ms': round(((self.end or self.start) - self.start) * 1000, 3),
+            'attrs': self.attrs,
+            'error': self.error,
+        }
+
+
+class Tracer:
+    """ثبت traceها و نوشتن نمونه‌ای از آن‌ها به صورت JSON lines در فایل چرخشی"""
+
+    def __init__(self, path: str, sample_rate: float = SAMPLE_RATE, slow_seconds: float = SLOW_SECONDS,
+                 max_bytes: int = MAX_FILE_BYTES, backups: int = BACKUP_FILES):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.exported = 0
+        self.dropped = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # A private logger gives thread-safe writes and size-based rotation
+        self._export = logging.getLogger(f"{__name__}.export.{id(self)}")
+        self._export.propagate = False
+        self._export.setLevel(logging.INFO)
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        self._handler.setFormatter(logging.Formatter('%(message)s'))
+        self._export.addHandler(self._handler)
+
+    @contextmanager
+    def trace(self, name: str, **attrs):
+        """شروع trace جدید برای یک به‌روزرسانی"""
+        root = Span(Trace(), name, None, attrs)
+        token = _current.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.error = repr(e)
+            raise
+        finally:
+            root.end = time.perf_counter()
+            _current.reset(token)
+            self._finish(root)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """span فرزند span جاری؛ بیرون از trace کاری انجام نمی‌دهد"""
+        parent = _current.get()
+        if parent is None or parent.trace.finished:
+            yield None
+            return
+        span = Span(parent.trace, name, parent.span_id, attrs)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            span.end = time.perf_counter()
+            _current.reset(token)
+
+    def record(self, name: str, start: float, end: float, **attrs):
+        """ثبت span که زمان آن از قبل مشخص است (مثلاً یک بخش آپلود)"""
+        parent = _current.get()
+        if parent is None or parent.trace.finished:
+            return
+        span = Span(parent.trace, name, parent.span_id, attrs, start)
+        span.end = end
+
+    def _finish(self, root: Span):
+        trace = root.trace
+        trace.finished = True
+        duration = root.end - root.start
+        if not (root.error or duration >= self.slow_seconds or random.random() < self.sample_rate):
+            self.dropped += 1
+            return
+
+        record = {
+            'trace_id': trace.trace_id,
+            'name': root.name,
+            'start': trace.wall_start,
+            'duration_ms': round(duration * 1000, 3),
+            'error': root.error,
+            'spans': [span.to_dict() for span in trace.spans],
+        }
+        try:
+            self._export.info(json.dumps(record, ensure_ascii=False, default=str))
+            self.exported += 1
+        except Exception as e:
+            logger.error(f"Error exporting trace: {e}")
+
+    def close(self):
+        self._export.removeHandler(self._handler)
+        self._handler.close()
+
+
+_tracer: Optional[Tracer] = None
+
+
+def configure(path: str, **kwargs) -> Tracer:
+    """فعال‌سازی tracing برای کل برنامه"""
+    global _tracer
+    if _tracer:
+        _tracer.close()
+    _tracer = Tracer(path, **kwargs)
+    return _tracer
+
+
+def trace(name: str, **attrs):
+    return _tracer.trace(name, **attrs) if _tracer else nullcontext()
+
+
+def span(name: str, **attrs):
+    return _tracer.span(name, **attrs) if _tracer else nullcontext()
+
+
+def record(name: str, start: float, end: float, **attrs):
+    if _tracer:
+        _tracer.record(name, start, end, **attrs)
+
+
+def traced(name: str):
+    """دکوراتور برای اجرای هر فراخوانی تابع داخل یک span"""
+    def decorate(function: Callable) -> Callable:
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current.get()
+    return current.trace.trace_id if current else None
+
+
+def bind(function: Callable, *args) -> Callable:
+    """اجرای تابع در زمینه trace فعلی (برای run_in_executor که زمینه را منتقل نمی‌کند)"""
+    return partial(contextvars.copy_context().run, function, *args)
+
+
+class PartTimer:
+    """ثبت یک span برای هر بخش انتقال از روی callback پیشرفت تلگرام"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.index = 0
+        self.sent = 0
+        self.last = time.perf_counter()
+
+    def __call__(self, current: int, total: int):
+        now = time.perf_counter()
+        record(self.name, self.last, now, part=self.index, bytes=current - self.sent)
+        self.index += 1
+        self.sent = current
+        self.last = now
@@ -0,0 +1,245 @@
+import hashlib
+import io
+import os
+import threading
+from typing import Optional, Tuple
+import numpy as np
+from PIL import Image
+from pcm_reader import PcmReader
+from stats import HitRatio
+import logging
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND = (24, 26, 33)
+WAVE_COLOR = (88, 166, 255)
+CLIP_COLOR = (255, 82, 82)
+
+# Samples at or above this level are drawn as clipped
+CLIP_LEVEL = 0.999
+
+# Spectrograms only need the audible detail, so decode at a lower rate
+SPECTROGRAM_RATE = 22050
+FFT_SIZE = 1024
+
+# Dark blue -> purple -> orange -> pale yellow, indexed by level in [0, 1]
+_PALETTE_STOPS = np.array([0.0, 0.25, 0.5, 0.75, 1.0])
+_PALETTE_COLORS = np.array([
+    (0, 0, 4), (59, 15, 112), (183, 55, 121), (252, 137, 97), (252, 253, 191)
+], dtype=np.float64)
+
+
+def payload_hash(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """هش محتوای فایل برای کلید کش"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _column_reduce(values: np.ndarray, columns: np.ndarray, width: int,
+                   ufunc: np.ufunc, initial: float) -> np.ndarray:
+    """کاهش مقادیر هر ستون پیکسلی (min/max/sum) به صورت برداری"""
+    out = np.full(width, initial, dtype=np.float64)
+    if not len(values):
+        return out
+    # `columns` is non-decreasing, so each column is one contiguous run
+    starts = np.flatnonzero(np.r_[True, columns[1:] != columns[:-1]])
+    out[columns[starts]] = ufunc.reduceat(values, starts)
+    return out
+
+
+def waveform_peaks(file_path: str, width: int, ffmpeg_binary: str = 'ffmpeg') -> Tuple[np.ndarray, np.ndarray]:
+    """کمینه و بیشینه نمونه‌ها در هر ستون پیکسلی"""
+    reader = PcmReader(file_path, mono=True, ffmpeg_binary=ffmpeg_binary)
+    total = max(reader.total_frames, 1)
+    lows = np.zeros(width)
+    highs = np.zeros(width)
+    position = 0
+
+    for block in reader.blocks():
+        samples = block[:, 0]
+        # Container durations are estimates; anything past the end lands in the last column
+        columns = np.minimum((position + np.arange(len(samples))) * width // total, width - 1)
+        lows = np.minimum(lows, _column_reduce(samples, columns, width, np.minimum, 0.0))
+        highs = np.maximum(highs, _column_reduce(samples, columns, width, np.maximum, 0.0))
+        position += len(samples)
+
+    return lows, highs
+
+
+def spectrogram_columns(file_path: str, width: int, ffmpeg_binary: str = 'ffmpeg') -> np.ndarray:
+    """طیف توان (دسی‌بل) میانگین‌گیری شده برای هر ستون پیکسلی"""
+    reader = PcmReader(file_path, sample_rate=SPECTROGRAM_RATE, mono=True, ffmpeg_binary=ffmpeg_binary)
+    total_frames = max(reader.total_frames, FFT_SIZE)
+    # Aim for a few analysis frames per column, overlapping by at least half
+    hop = max(min(total_frames // (width * 4), FFT_SIZE // 2), 64)
+    window = np.hanning(FFT_SIZE).astype(np.float32)
+
+    power = np.zeros((width, FFT_SIZE // 2 + 1))
+    counts = np.zeros(width)
+    pending = np.zeros(0, dtype=np.float32)
+    frame_index = 0
+
+    for block in reader.blocks():
+        pending = np.concatenate([pending, block[:, 0]])
+        frames = (len(pending) - FFT_SIZE) // hop + 1 if len(pending) >= FFT_SIZE else 0
+        if not frames:
+            continue
+
+        windows = np.lib.stride_tricks.sliding_window_view(pending, FFT_SIZE)[::hop][:frames]
+        spectra = np.abs(np.fft.rfft(windows * window, axis=1)) ** 2
+        columns = np.minimum((frame_index + np.arange(frames)) * hop * width // total_frames, width - 1)
+        starts = np.flatnonzero(np.r_[True, columns[1:] != columns[:-1]])
+        power[columns[starts]] += np.add.reduceat(spectra, starts, axis=0)
+        counts[columns[starts]] += np.diff(np.r_[starts, frames])
+
+        pending = pending[frames * hop:]
+        frame_index += frames
+
+    power /= np.maximum(counts, 1)[:, None]
+    return 10 * np.log10(power + 1e-12)
+
+
+def render_waveform(file_path: str, width: int = 800, height: int = 200,
+                    ffmpeg_binary: str = 'ffmpeg') -> bytes:
+    """رسم شکل موج به صورت PNG"""
+    lows, highs = waveform_peaks(file_path, width, ffmpeg_binary)
+    middle = (height - 1) / 2
+    top = np.round(middle - highs * middle).astype(int)
+    bottom = np.round(middle - lows * middle).astype(int)
+
+    rows = np.arange(height)[:, None]
+    inside = (rows >= top[None, :]) & (rows <= bottom[None, :])
+    clipped = (np.maximum(highs, -lows) >= CLIP_LEVEL)[None, :]
+
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    pixels[:] = BACKGROUND
+    pixels[inside & ~clipped] = WAVE_COLOR
+    pixels[inside & clipped] = CLIP_COLOR
+    # A flat line marks silence so it is still visible
+    pixels[int(middle), :] = np.where(inside[int(middle)][:, None], pixels[int(middle), :], WAVE_COLOR)
+
+    return _encode_png(pixels)
+
+
+def render_spectrogram(file_path: str, width: int = 800, height: int = 256,
+                       ffmpeg_binary: str = 'ffmpeg') -> bytes:
+    """رسم طیف‌نگار به صورت PNG"""
+    levels = spectrogram_columns(file_path, width, ffmpeg_binary)
+
+    # Resample the frequency bins onto the image rows, low frequencies at the bottom
+    bins = np.linspace(0, levels.shape[1] - 1, height).round().astype(int)
+    image = levels[:, bins].T[::-1]
+
+    peak = image.max()
+    normalized = np.clip((image - (peak - 90)) / 90, 0, 1)
+    pixels = np.stack([
+        np.interp(normalized, _PALETTE_STOPS, _PALETTE_COLORS[:, channel]) for channel in range(3)
+    ], axis=-1).astype(np.uint8)
+
+    return _encode_png(pixels)
+
+
+def _encode_png(pixels: np.ndarray) -> bytes:
+    """کدگذاری آرایه پیکسل‌ها به PNG"""
+    output = io.BytesIO()
+    Image.fromarray(pixels, 'RGB').save(output, 'PNG', optimize=True)
+    return output.getvalue()
+
+
+class ThumbnailCache:
+    """کش تصاویر رسم شده بر اساس هش محتوای فایل
+
+    Images are kept on disk up to `max_bytes` in total; past that the least recently used
+    ones are deleted. A hit refreshes the file's mtime, which is the recency used for eviction.
+    """
+
+    RENDERERS = {
+        'waveform': render_waveform,
+        'spectrogram': render_spectrogram,
+    }
+
+    def __init__(self, cache_dir: str, ffmpeg_binary: str = 'ffmpeg', max_bytes: int = 64 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.ffmpeg_binary = ffmpeg_binary
+        self.max_bytes = max_bytes
+        self.cache_stats = HitRatio()
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(size for _, _, size in self._entries())
+        self._evict()
+    
+    def _entries(self):
+        """تصاویر کش شده به صورت (مسیر، زمان آخرین استفاده، حجم)"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.png'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+    
+    def _evict(self):
+        """حذف قدیمی‌ترین تصاویر تا رسیدن حجم کش به زیر سقف"""
+        with self._lock:
+            if not self.max_bytes or self._size <= self.max_bytes:
+                return
+            # The running total is only an estimate (concurrent renders of one image); recount
+            entries = self._entries()
+            self._size = sum(size for _, _, size in entries)
+            for path, _, size in sorted(entries, key=lambda entry: entry[1]):
+                if self._size <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                self._size -= size
+                self.evictions += 1
+
+    def path_for(self, digest: str, kind: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}_{kind}.png")
+
+    def get(self, file_path: str, kind: str, digest: str = None) -> Optional[bytes]:
+        """برگرداندن تصویر از کش یا رسم و ذخیره آن"""
+        try:
+            digest = digest or payload_hash(file_path)
+            cached_path = self.path_for(digest, kind)
+            try:
+                with open(cached_path, 'rb') as f:
+                    data = f.read()
+                # Mark as recently used
+                os.utime(cached_path)
+                self.cache_stats.record(True)
+                return data
+            except FileNotFoundError:
+                # Never rendered, or evicted meanwhile
+                self.cache_stats.record(False)
+
+            data = self.RENDERERS[kind](file_path, ffmpeg_binary=self.ffmpeg_binary)
+
+            # Write to a temporary name first so readers never see half a file
+            partial_path = f"{cached_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(partial_path, 'wb') as f:
+                f.write(data)
+            existed = os.path.exists(cached_path)
+            os.replace(partial_path, cached_path)
+            if not existed:
+                with self._lock:
+                    self._size += len(data)
+                self._evict()
+            return data
+
+        except Exception as e:
+            logger.error(f"Error rendering {kind} for {file_path}: {e}")
+            return None